@@ -0,0 +1,14 @@
+"""
+Benchmarks for the timing accuracy and overhead of the URL timing analysis program.
+
+The benchmarks run offline against a local stand-in server with deterministic delays and are run as
+modules from the root of the repository:
+
+- python -m benchmarks.accuracy: Checks the reported timing phases against the injected delays.
+- python -m benchmarks.overhead: Measures the overhead per sample and the throughput of each engine.
+- python -m benchmarks.startup: Measures the start-up cost and checks that the slow imports stay deferred.
+
+Modules:
+- harness: The helpers shared by the benchmarks to run ttfb against the stand-in server.
+- standin: The local HTTP/HTTPS stand-in server used by the benchmarks.
+"""
@@ -0,0 +1,149 @@
+"""
+Check that the timing phases reported by each engine match the delays injected by the stand-in server.
+
+Each scenario starts a stand-in server with a known set of delays and takes a number of samples with
+each engine. The median of each interval between two timing phases is compared with the delay that
+should have caused it:
+
+- connect: connect - namelookup, the TCP handshake (close to zero on loopback).
+- tls: appconnect - connect, the TLS handshake (accept and TLS delays, HTTPS only).
+- server: starttransfer - pretransfer, the wait for the first byte (the TTFB delay, plus the accept delay for HTTP).
+- transfer: total - starttransfer, the body transfer (body size / body rate).
+
+Every sample must also have opened a new connection (a connect time after the DNS lookup). The keep-alive
+scenarios use a stand-in server which ignores Connection: close, as HTTP/2 servers do, to check that the
+batched curl engine does not report a sample taken over a reused connection, which has no connect or TLS time.
+
+Any interval that differs from the expected value by more than the tolerance, or any sample taken over a reused
+connection, fails the run, so the script exits with a non-zero status when a measurement regression is introduced.
+
+Usage:
+    python -m benchmarks.accuracy [--samples N] [--tolerance MS] [--engine ENGINE ...]
+"""
+
+import argparse
+import sys
+import tempfile
+
+from typing import Optional
+
+from .harness import ENGINE_VARIANTS, available_engines, create_config, median, run_samples
+from .standin import StandInServer, create_certificate, trust_certificate
+
+INTERVALS: dict[str, tuple[str, str]] = {
+    'connect': ('namelookup', 'connect'),
+    'tls': ('connect', 'appconnect'),
+    'server': ('pretransfer', 'starttransfer'),
+    'transfer': ('starttransfer', 'total'),
+}
+
+SCENARIOS: tuple[tuple[str, bool, dict, dict[str, float]], ...] = (
+    ('http ttfb', False, {'ttfb_delay': 0.05}, {'server': 0.05}),
+    ('http accept', False, {'accept_delay': 0.03, 'ttfb_delay': 0.02}, {'server': 0.05}),
+    ('http body', False, {'body_size': 262144, 'body_rate': 1048576.0}, {'transfer': 0.25}),
+    ('https tls', True, {'tls_delay': 0.04, 'ttfb_delay': 0.03}, {'tls': 0.04, 'server': 0.03}),
+    ('https accept', True, {'accept_delay': 0.03}, {'tls': 0.03}),
+    ('http keep-alive', False, {'keep_alive': True, 'ttfb_delay': 0.02}, {'server': 0.02}),
+    ('https keep-alive', True, {'keep_alive': True, 'tls_delay': 0.02}, {'tls': 0.02}),
+)
+
+
+def compare_intervals(results: list[dict[str, float]], secure: bool, expected: dict[str, float], tolerance: float) -> list[str]:
+    """
+    Compare the median of each interval with its expected value.
+
+    Arguments:
+        results (list[dict[str, float]]): The timing phases of each sample.
+        secure (bool): Whether the samples used HTTPS.
+        expected (dict[str, float]): The expected value of each interval, intervals not listed are expected to be zero.
+        tolerance (float): The largest allowed difference in seconds.
+
+    Returns:
+        list[str]: A line describing each failed check (empty if everything passed).
+    """
+    failures: list[str] = []
+    for interval, (start, end) in INTERVALS.items():
+        if interval == 'tls' and not secure:
+            continue
+        measured: float = median([sample[end] - sample[start] for sample in results])
+        difference: float = measured - expected.get(interval, 0.0)
+        status: str = 'ok' if abs(difference) <= tolerance else 'FAIL'
+        print(f"    {interval:<10} expected {expected.get(interval, 0.0):.6f}   measured {measured:.6f}   difference {difference:+.6f}   {status}")
+        if status != 'ok':
+            failures.append(f"{interval} is {measured:.6f}s, expected {expected.get(interval, 0.0):.6f}s")
+    return failures
+
+
+def check_scenario(engine: str, scenario: tuple[str, bool, dict, dict[str, float]], certificate: Optional[tuple[str, str]],
+                   samples: int, tolerance: float) -> list[str]:
+    """
+    Run a single scenario with a single engine and compare each interval with its expected value.
+
+    Arguments:
+        engine (str): The name of the engine variant.
+        scenario (tuple[str, bool, dict, dict[str, float]]): The name of the scenario, whether it uses HTTPS, the delays to
+                                                             start the stand-in server with and the expected intervals.
+        certificate (Optional[tuple[str, str]]): The certificate and key for HTTPS scenarios.
+        samples (int): The number of samples to take.
+        tolerance (float): The largest allowed difference in seconds.
+
+    Returns:
+        list[str]: A line describing each failed check (empty if everything passed).
+    """
+    _, secure, server_options, expected = scenario
+    with StandInServer(certificate=certificate if secure else None, **server_options) as server:
+        results, errors, _ = run_samples(create_config(server.url, engine, samples))
+
+    if not results:
+        return [f"all {samples} samples failed ({errors[-1]})"]
+
+    failures: list[str] = [f"{len(errors)} of {samples} samples failed ({errors[-1]})"] if errors else []
+    reused: int = sum(1 for sample in results if sample['connect'] <= sample['namelookup'])
+    print(f"    {'new':<10} {len(results) - reused} of {len(results)} samples opened a new connection   {'FAIL' if reused else 'ok'}")
+    if reused:
+        failures.append(f"{reused} of {len(results)} samples reused a connection")
+    return failures + compare_intervals(results, secure, expected, tolerance)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run every scenario with every available engine and report the results.
+
+    Arguments:
+        argv (Optional[list[str]]): The command line arguments, or None to use sys.argv.
+
+    Returns:
+        int: The exit status, 1 if any check failed.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='python -m benchmarks.accuracy', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5, help="How many samples to take for each scenario")
+    parser.add_argument('--tolerance', type=float, default=10.0, help="The largest allowed difference in milliseconds")
+    parser.add_argument('--engine', action='append', choices=list(ENGINE_VARIANTS), help="The engine variants to check (default all)")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    failures: list[str] = []
+    with tempfile.TemporaryDirectory(prefix='ttfb-bench-') as directory:
+        certificate: Optional[tuple[str, str]] = None
+        try:
+            certificate = create_certificate(directory)
+            trust_certificate(certificate[0])
+        except RuntimeError as err:
+            print(f"Skipping the HTTPS scenarios: {err}")
+
+        for engine in available_engines(args.engine):
+            for scenario in SCENARIOS:
+                if scenario[1] and certificate is None:
+                    continue
+                print(f"{engine} - {scenario[0]}")
+                failures += [f"{engine} - {scenario[0]}: {failure}"
+                             for failure in check_scenario(engine, scenario, certificate, args.samples, args.tolerance / 1000)]
+
+    print()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    print(f"{len(failures)} failed checks")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+This module provides the helpers shared by the benchmarks to run ttfb against the stand-in server.
+
+The configuration is built by the same argument parser and configuration code as the command line, and
+the samples are taken through engine.measure_samples (as api.run_measurement does), so the benchmarks
+exercise the same measurement path as a normal run without parsing its output.
+
+Functions:
+- available_engines: Returns the engine variants to benchmark, skipping curl if it is not installed.
+- create_config: Creates a ttfb configuration from command line style arguments.
+- run_samples: Takes a number of samples and times the whole run.
+- median: Returns the median of a list of values.
+"""
+
+import shutil
+import statistics
+import time
+
+from types import SimpleNamespace
+from typing import Optional
+
+from wolfsoftware.ttfb.cli import setup_arg_parser
+from wolfsoftware.ttfb.config import create_configuration_from_arguments
+from wolfsoftware.ttfb.engine import measure_samples
+from wolfsoftware.ttfb.exceptions import MeasurementError
+
+ENGINE_VARIANTS: dict[str, list[str]] = {
+    'native': ['-e', 'native'],
+    'curl': ['-e', 'curl'],
+    'curl-no-batch': ['-e', 'curl', '--no-batch'],
+}
+
+
+def available_engines(selected: Optional[list[str]] = None) -> list[str]:
+    """
+    Return the engine variants to benchmark, skipping the curl variants if curl is not installed.
+
+    Arguments:
+        selected (Optional[list[str]]): The engine variants requested, or None for all of them.
+
+    Returns:
+        list[str]: The names of the engine variants.
+    """
+    engines: list[str] = selected or list(ENGINE_VARIANTS)
+    if shutil.which('curl') is None:
+        engines = [engine for engine in engines if not engine.startswith('curl')]
+    return engines
+
+
+def create_config(url: str, engine: str, count: int) -> SimpleNamespace:
+    """
+    Create a ttfb configuration from command line style arguments.
+
+    Arguments:
+        url (str): The URL to test.
+        engine (str): The name of the engine variant.
+        count (int): The number of samples.
+
+    Returns:
+        SimpleNamespace: The configuration object.
+    """
+    args = setup_arg_parser().parse_args(['-u', url, '-c', str(count), *ENGINE_VARIANTS[engine]])
+    return create_configuration_from_arguments(args, {'curl': shutil.which('curl')})
+
+
+def run_samples(config: SimpleNamespace) -> tuple[list[dict[str, float]], list[str], float]:
+    """
+    Take config.count samples of config.url and time the whole run.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object.
+
+    Returns:
+        tuple[list[dict[str, float]], list[str], float]: The timing phases of each successful sample, the error
+                                                         message of each failed sample and the elapsed seconds.
+    """
+    samples: list[dict[str, float]] = []
+    errors: list[str] = []
+    started: float = time.perf_counter()
+    for _, result in measure_samples(config, config.url, iter(range(config.count))):
+        if isinstance(result, MeasurementError):
+            errors.append(f"{result}")
+        else:
+            samples.append(result)
+    return samples, errors, time.perf_counter() - started
+
+
+def median(values: list[float]) -> float:
+    """
+    Return the median of a list of values.
+
+    Arguments:
+        values (list[float]): The values.
+
+    Returns:
+        float: The median, or 0.0 if there are no values.
+    """
+    return statistics.median(values) if values else 0.0
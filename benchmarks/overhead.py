@@ -0,0 +1,85 @@
+"""
+Measure the overhead per sample and the throughput of each engine against the stand-in server.
+
+The stand-in server answers immediately, so nearly all of the wall-clock time of a run is spent by ttfb
+itself rather than waiting for the server. For each engine the report shows:
+
+- samples/s: The number of samples taken per second of wall-clock time.
+- per sample: The mean wall-clock time of a sample.
+- measured: The mean total time that the engine reported for a sample.
+- overhead: The difference between the two, the time spent outside the measured request (process
+  start-up, parsing and bookkeeping).
+
+Usage:
+    python -m benchmarks.overhead [--samples N] [--engine ENGINE ...]
+"""
+
+import argparse
+import sys
+import tempfile
+
+from typing import Optional
+
+from .harness import ENGINE_VARIANTS, available_engines, create_config, run_samples
+from .standin import StandInServer, create_certificate, trust_certificate
+
+
+def report_engine(engine: str, scheme: str, url: str, count: int) -> bool:
+    """
+    Take the samples with a single engine and display its throughput and overhead.
+
+    Arguments:
+        engine (str): The name of the engine variant.
+        scheme (str): The scheme of the stand-in server, for display.
+        url (str): The URL of the stand-in server.
+        count (int): The number of samples to take.
+
+    Returns:
+        bool: True if every sample was taken successfully.
+    """
+    samples, errors, elapsed = run_samples(create_config(url, engine, count))
+    if errors:
+        print(f"{engine:<16}{scheme:<8}{len(errors)} of {count} samples failed ({errors[-1]})")
+        return False
+
+    per_sample: float = elapsed / len(samples)
+    measured: float = sum(sample['total'] for sample in samples) / len(samples)
+    print(f"{engine:<16}{scheme:<8}{len(samples) / elapsed:>12.1f}{per_sample:>14.6f}{measured:>14.6f}{per_sample - measured:>14.6f}")
+    return True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run every available engine against an HTTP and an HTTPS stand-in server and report the overhead.
+
+    Arguments:
+        argv (Optional[list[str]]): The command line arguments, or None to use sys.argv.
+
+    Returns:
+        int: The exit status, 1 if any engine failed to take every sample.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='python -m benchmarks.overhead', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=200, help="How many samples to take with each engine")
+    parser.add_argument('--engine', action='append', choices=list(ENGINE_VARIANTS), help="The engine variants to measure (default all)")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    status: int = 0
+    with tempfile.TemporaryDirectory(prefix='ttfb-bench-') as directory:
+        certificates: dict[str, Optional[tuple[str, str]]] = {'http': None}
+        try:
+            certificates['https'] = create_certificate(directory)
+            trust_certificate(certificates['https'][0])
+        except RuntimeError as err:
+            print(f"Skipping HTTPS: {err}")
+
+        print(f"{'engine':<16}{'scheme':<8}{'samples/s':>12}{'per sample':>14}{'measured':>14}{'overhead':>14}")
+        for scheme, certificate in certificates.items():
+            with StandInServer(certificate=certificate) as server:
+                for engine in available_engines(args.engine):
+                    if not report_engine(engine, scheme, server.url, args.samples):
+                        status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+This module provides the local HTTP/HTTPS stand-in server used by the benchmarks.
+
+The server answers every request with the same response after a fixed set of delays, so the timing
+phases that ttfb reports can be compared against the delays that caused them:
+
+- accept_delay: Time between accepting a connection and reading from it (before the TLS handshake).
+- tls_delay: Time between receiving the TLS ClientHello and sending the ServerHello.
+- ttfb_delay: Time between reading the request and sending the response headers.
+- body_size / body_rate: The size of the response body and the rate (bytes per second) it is sent at.
+
+Every response is sent with Connection: close, so each sample uses a new connection, unless the server is
+started with keep_alive, in which case it ignores Connection: close in the request and keeps answering
+requests on the same connection (as an HTTP/2 server does), so a client which reuses connections can be
+caught doing so. HTTPS servers use a
+throwaway self-signed certificate (for localhost and 127.0.0.1) created with openssl; trust_certificate
+points both curl and Python at it through the CURL_CA_BUNDLE and SSL_CERT_FILE environment variables, so
+nothing needs to be changed in the program to test it.
+
+Classes:
+- StandInServer: A threaded stand-in server with deterministic delays, used as a context manager.
+
+Functions:
+- create_certificate: Creates a self-signed certificate and key with openssl.
+- trust_certificate: Makes curl and the native engine trust a certificate.
+"""
+
+import os
+import shutil
+import socket
+import ssl
+import subprocess  # nosec B404
+import threading
+import time
+
+from types import TracebackType
+from typing import Optional
+
+CHUNK_SIZE: int = 16384
+READ_TIMEOUT: float = 5.0
+
+
+def create_certificate(directory: str) -> tuple[str, str]:
+    """
+    Create a self-signed certificate and key for localhost and 127.0.0.1 with openssl.
+
+    Arguments:
+        directory (str): The directory to write the certificate and key to.
+
+    Returns:
+        tuple[str, str]: The paths of the certificate and the key.
+
+    Raises:
+        RuntimeError: If openssl is not installed or fails.
+    """
+    openssl: Optional[str] = shutil.which('openssl')
+    if openssl is None:
+        raise RuntimeError("openssl is required for the HTTPS benchmarks")
+
+    certificate: str = os.path.join(directory, 'standin.pem')
+    key: str = os.path.join(directory, 'standin.key')
+    command: list[str] = [
+        openssl, 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+        '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1', '-keyout', key, '-out', certificate
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True)  # nosec B603
+    except subprocess.CalledProcessError as err:
+        raise RuntimeError(f"openssl failed: {err.stderr.decode(errors='replace').strip()}") from err
+    return certificate, key
+
+
+def trust_certificate(certificate: str) -> None:
+    """
+    Make curl and the native engine trust the given certificate.
+
+    This must be called before the native engine creates its SSL context.
+
+    Arguments:
+        certificate (str): The path of the certificate.
+    """
+    os.environ['CURL_CA_BUNDLE'] = certificate
+    os.environ['SSL_CERT_FILE'] = certificate
+
+
+class StandInServer:  # pylint: disable=too-many-instance-attributes
+    """
+    A threaded stand-in server with deterministic delays, used as a context manager.
+
+    The server listens on an ephemeral port on 127.0.0.1 and handles each connection in its own thread.
+    """
+
+    def __init__(self, accept_delay: float = 0.0, tls_delay: float = 0.0,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 ttfb_delay: float = 0.0, body_size: int = 0, body_rate: Optional[float] = None, certificate: Optional[tuple[str, str]] = None,
+                 keep_alive: bool = False) -> None:
+        """
+        Initialise the server, it starts listening when the context is entered.
+
+        Arguments:
+            accept_delay (float): Seconds to wait after accepting a connection.
+            tls_delay (float): Seconds to wait before answering the TLS ClientHello.
+            ttfb_delay (float): Seconds to wait after reading the request before sending the response.
+            body_size (int): The size of the response body in bytes.
+            body_rate (Optional[float]): The rate to send the body at in bytes per second, or None for as fast as possible.
+            certificate (Optional[tuple[str, str]]): The certificate and key paths to serve HTTPS with, or None for HTTP.
+            keep_alive (bool): Whether to keep each connection open for further requests, even when asked to close it.
+        """
+        self.accept_delay: float = accept_delay
+        self.tls_delay: float = tls_delay
+        self.ttfb_delay: float = ttfb_delay
+        self.body_size: int = body_size
+        self.body_rate: Optional[float] = body_rate
+        self.keep_alive: bool = keep_alive
+        self.context: Optional[ssl.SSLContext] = None
+        if certificate is not None:
+            self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self.context.load_cert_chain(*certificate)
+            self.context.sni_callback = self._delay_handshake
+        self.listener: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        Return the URL of the server.
+
+        Returns:
+            str: The URL, using the https scheme if the server has a certificate.
+        """
+        return f"{'https' if self.context else 'http'}://127.0.0.1:{self.listener.getsockname()[1]}/"
+
+    def __enter__(self) -> 'StandInServer':
+        """
+        Start listening and accepting connections.
+
+        Returns:
+            StandInServer: The running server.
+        """
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(128)
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type: Optional[type], exc: Optional[BaseException], traceback: Optional[TracebackType]) -> None:
+        """
+        Stop accepting connections.
+
+        Arguments:
+            exc_type (Optional[type]): The type of the exception raised in the context, if any.
+            exc (Optional[BaseException]): The exception raised in the context, if any.
+            traceback (Optional[TracebackType]): The traceback of the exception, if any.
+        """
+        self.listener.close()
+
+    def _delay_handshake(self, *_args) -> None:
+        """Delay the TLS handshake after the ClientHello has been received."""
+        time.sleep(self.tls_delay)
+
+    def _accept(self) -> None:
+        """Accept connections and hand each one to a new thread until the listener is closed."""
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection: socket.socket) -> None:
+        """
+        Answer a single request on a connection, then close it (or, with keep_alive, every request until the client closes it).
+
+        Arguments:
+            connection (socket.socket): The accepted connection.
+        """
+        try:
+            time.sleep(self.accept_delay)
+            connection.settimeout(READ_TIMEOUT)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.context is not None:
+                connection = self.context.wrap_socket(connection, server_side=True)
+
+            request: bytes = b''
+            while True:
+                while b'\r\n\r\n' not in request:
+                    data: bytes = connection.recv(CHUNK_SIZE)
+                    if not data:
+                        return
+                    request += data
+                request = request.split(b'\r\n\r\n', 1)[1]
+
+                time.sleep(self.ttfb_delay)
+                connection.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: application/octet-stream\r\n'
+                                   + f"Content-Length: {self.body_size}\r\n".encode('ascii')
+                                   + (b'\r\n' if self.keep_alive else b'Connection: close\r\n\r\n'))
+                self._send_body(connection)
+                if not self.keep_alive:
+                    return
+        except (OSError, ssl.SSLError):
+            pass
+        finally:
+            connection.close()
+
+    def _send_body(self, connection: socket.socket) -> None:
+        """
+        Send the response body, paced to the body rate if there is one.
+
+        Arguments:
+            connection (socket.socket): The connection to send the body on.
+        """
+        started: float = time.perf_counter()
+        chunk: bytes = b'x' * CHUNK_SIZE
+        sent: int = 0
+        while sent < self.body_size:
+            size: int = min(CHUNK_SIZE, self.body_size - sent)
+            if self.body_rate:
+                time.sleep(max(started + (sent + size) / self.body_rate - time.perf_counter(), 0.0))
+            connection.sendall(chunk[:size])
+            sent += size
@@ -0,0 +1,113 @@
+"""
+Measure the start-up cost of ttfb and check that the slow imports stay deferred.
+
+Each scenario runs ttfb in a fresh interpreter with -X importtime and reports the import time of
+wolfsoftware.ttfb.main, the wall-clock time of the whole process and which of the deferred modules
+were loaded. Importing wolfsoftware.drawlines, wolfsoftware.notify and wolfsoftware.prereqs (and, through
+them, colorama and importlib.metadata) costs more than the rest of the program, so they are only
+imported when they are needed. The run fails if a scenario loads a deferred module it should not
+need, or if the median import time is over the budget.
+
+Usage:
+    python -m benchmarks.startup [--runs N] [--budget MS]
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+
+from typing import Optional
+
+from .standin import StandInServer
+
+DEFERRED_MODULES: tuple[str, ...] = (
+    'asyncio', 'colorama', 'importlib.metadata', 'wolfsoftware.drawlines', 'wolfsoftware.notify', 'wolfsoftware.prereqs'
+)
+
+RUNNER: str = '''
+import json, sys
+arguments, deferred = json.loads(sys.argv[1]), json.loads(sys.argv[2])
+sys.argv = ['ttfb'] + arguments
+try:
+    from wolfsoftware.ttfb.main import main
+    if arguments:
+        main()
+except SystemExit:
+    pass
+finally:
+    sys.stderr.write('loaded: ' + json.dumps([name for name in deferred if name in sys.modules]) + '\\n')
+'''
+
+IMPORT_TIME: re.Pattern = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| wolfsoftware\.ttfb\.main$', re.M)
+
+
+def run_scenario(arguments: list[str]) -> tuple[float, float, list[str]]:
+    """
+    Run ttfb once in a fresh interpreter.
+
+    Arguments:
+        arguments (list[str]): The ttfb command line arguments (empty to only import the program).
+
+    Returns:
+        tuple[float, float, list[str]]: The import time of wolfsoftware.ttfb.main and the wall-clock time of the
+                                        process (both in seconds) and the deferred modules that were loaded.
+    """
+    started: float = time.perf_counter()
+    command: list[str] = [sys.executable, '-X', 'importtime', '-c', RUNNER, json.dumps(arguments), json.dumps(DEFERRED_MODULES)]
+    result: subprocess.CompletedProcess = subprocess.run(command, capture_output=True, text=True, check=False)  # nosec B603
+    elapsed: float = time.perf_counter() - started
+
+    match: Optional[re.Match] = IMPORT_TIME.search(result.stderr)
+    loaded: list[str] = next((json.loads(line[len('loaded: '):]) for line in result.stderr.splitlines() if line.startswith('loaded: ')), [])
+    return (int(match.group(1)) / 1000000 if match else 0.0), elapsed, loaded
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run every start-up scenario and report the results.
+
+    Arguments:
+        argv (Optional[list[str]]): The command line arguments, or None to use sys.argv.
+
+    Returns:
+        int: The exit status, 1 if a deferred module was loaded unexpectedly or the import time is over the budget.
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help="How many times to run each scenario")
+    parser.add_argument('--budget', type=float, default=75.0, help="The largest allowed median import time in milliseconds")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    failures: list[str] = []
+    with StandInServer() as server:
+        scenarios: dict[str, tuple[list[str], tuple[str, ...]]] = {
+            'import': ([], DEFERRED_MODULES),
+            '--help': (['--help'], DEFERRED_MODULES),
+            '--version': (['--version'], tuple(name for name in DEFERRED_MODULES if name != 'importlib.metadata')),
+            'native run': (['-u', server.url, '-e', 'native'], ('asyncio', 'wolfsoftware.prereqs')),
+        }
+
+        print(f"{'scenario':<14}{'import (ms)':>14}{'process (ms)':>14}   deferred modules loaded")
+        for name, (arguments, deferred) in scenarios.items():
+            runs: list[tuple[float, float, list[str]]] = [run_scenario(arguments) for _ in range(args.runs)]
+            import_time: float = statistics.median(run[0] for run in runs) * 1000
+            process_time: float = statistics.median(run[1] for run in runs) * 1000
+            loaded: list[str] = sorted({module for run in runs for module in run[2]})
+            print(f"{name:<14}{import_time:>14.1f}{process_time:>14.1f}   {', '.join(loaded) or '-'}")
+
+            failures += [f"{name} loaded {module}" for module in loaded if module in deferred]
+            if import_time > args.budget:
+                failures.append(f"{name} import time {import_time:.1f}ms is over the budget of {args.budget:.1f}ms")
+
+    print()
+    for failure in failures:
+        print(f"FAILED {failure}")
+    print(f"{len(failures)} failed checks")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
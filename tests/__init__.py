@@ -0,0 +1,14 @@
+"""
+Tests for the URL timing analysis program.
+
+The tests are known-answer and round-trip tests of the statistics, storage and parsing code, they need no network
+(the native engine is tested against a scripted server on the loopback interface) and are run with python -m pytest
+from the root of the repository.
+
+Modules:
+- test_cache: Tests of the atomic writes of the cache files.
+- test_engine: Tests of the native engine against a scripted server.
+- test_history: Round-trip tests of the binary history store.
+- test_stats: Tests of the summary statistics, quantile sketch and precision and comparison statistics.
+- test_utils: Tests of the parsing of the command line values.
+"""
@@ -0,0 +1,45 @@
+"""
+Tests for the on-disk caches of the URL timing analysis program.
+
+Functions:
+- test_write_json_file: Checks that the cache file is replaced and no temporary file is left behind.
+- test_write_json_file_failure: Checks that the temporary file is removed and the cache file kept when the write fails.
+"""
+
+import json
+import os
+
+import pytest
+
+from wolfsoftware.ttfb import cache
+from wolfsoftware.ttfb.cache import write_json_file
+
+
+def test_write_json_file(tmp_path) -> None:
+    """Check that the cache directory is created, the cache file replaced and no temporary file left behind."""
+    path: str = str(tmp_path / 'ttfb' / 'cache.json')
+    write_json_file(path, {'a': 1})
+    write_json_file(path, {'b': 2})
+    with open(path, encoding='UTF-8') as f:
+        assert json.load(f) == {'b': 2}
+    assert os.listdir(tmp_path / 'ttfb') == ['cache.json']
+
+
+def test_write_json_file_failure(tmp_path, monkeypatch) -> None:
+    """Check that when the data can not be serialised or the file can not be replaced the error is raised, the temporary file removed and the cache kept."""
+    path: str = str(tmp_path / 'cache.json')
+    write_json_file(path, {'a': 1})
+
+    with pytest.raises(TypeError):
+        write_json_file(path, {'a': object()})
+    assert os.listdir(tmp_path) == ['cache.json']
+
+    def fail_replace(_source: str, _destination: str) -> None:
+        raise OSError("Read-only file system")
+
+    monkeypatch.setattr(cache.os, 'replace', fail_replace)
+    with pytest.raises(OSError, match='Read-only file system'):
+        write_json_file(path, {'b': 2})
+    assert os.listdir(tmp_path) == ['cache.json']
+    with open(path, encoding='UTF-8') as f:
+        assert json.load(f) == {'a': 1}
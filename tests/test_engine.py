@@ -0,0 +1,291 @@
+"""
+Tests for the native engine of the URL timing analysis program, against a scripted server on the loopback interface.
+
+Classes:
+- ScriptedServer: A stand-in server (see benchmarks.standin) which answers each request target with a fixed raw response, sent in timed parts.
+
+Functions:
+- fetch: Requests a scripted response from a new server with the native engine.
+- test_chunked_body: Checks that a chunked body with chunk extensions and trailers is read to its end, however it is split.
+- test_content_length_body: Checks that a body framed by Content-Length is read exactly.
+- test_body_to_eof: Checks that a body without framing is read until the server closes the connection.
+- test_responses_without_body: Checks that HEAD, 204 and 304 responses are not read past their headers.
+- test_interim_responses: Checks that 1xx responses are skipped and the final response is returned.
+- test_status_line: Checks the version, status and reason of the status line, with and without a reason phrase.
+- test_reusable: Checks when a connection can be used again after a response.
+- test_malformed_responses: Checks that malformed and truncated responses raise MeasurementError.
+- test_body_profile_after_redirect: Checks that the body throughput after a redirect is measured from the first byte of the final response.
+- test_parse_curl_timings: Checks the timing phases parsed from the CURL_WRITE_OUT template.
+- test_parse_curl_timings_invalid: Checks that output which did not come from the template raises MeasurementError.
+- test_parse_curl_batch_line: Checks the transfer number and timings or error parsed from the CURL_BATCH_WRITE_OUT template.
+- test_measure_with_curl_batch: Checks that the stderr noise of curl between the tagged lines is ignored and missing transfers fail.
+"""
+
+import os
+import socket
+import time
+
+import pytest
+
+from benchmarks.standin import READ_TIMEOUT, StandInServer
+from wolfsoftware.ttfb.bodyprofile import BodyProfile
+from wolfsoftware.ttfb.engine import (
+    MAX_HEADER_SIZE, HttpConnection, HttpResponse, RedirectHop, _parse_curl_batch_line, measure_with_curl_batch, parse_curl_timings, trace_redirects
+)
+from wolfsoftware.ttfb.exceptions import ConnectionReusedError, MeasurementError
+from wolfsoftware.ttfb.globals import TIMING_PHASES
+
+CHUNKED_HEAD: bytes = b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+TIMINGS_OUTPUT: str = '0.001234\t0.002000\t0.000000\t0.002100\t0.000000\t0.052000\t0.060500\n'
+TIMINGS: dict[str, float] = dict(zip(TIMING_PHASES, (0.001234, 0.002, 0.0, 0.0021, 0.0, 0.052, 0.0605)))
+CHUNKED_BODY: bytes = b'5;name=value\r\nhello\r\n6 ; quoted="a;b"\r\n world\r\n0;last\r\nExpires: never\r\nX-Checksum: 1\r\n\r\n'
+
+
+class ScriptedServer(StandInServer):  # pylint: disable=too-few-public-methods
+    """
+    A server which answers each request target with a fixed raw response, used as a context manager.
+
+    Each response is a list of parts, each sent after a delay, so that malformed responses and the timing of the
+    arrival of each part can be scripted exactly. Every connection answers a single request and is then closed.
+    """
+
+    def __init__(self, responses: dict[str, list[tuple[float, bytes]]]) -> None:
+        """
+        Initialise the server, it starts listening when the context is entered.
+
+        Arguments:
+            responses (dict[str, list[tuple[float, bytes]]]): The delay (in seconds) and data of each part of the response to each request target.
+        """
+        super().__init__()
+        self.responses: dict[str, list[tuple[float, bytes]]] = responses
+
+    def _handle(self, connection: socket.socket) -> None:
+        """
+        Answer a single request with the scripted response to its target, then close the connection.
+
+        Arguments:
+            connection (socket.socket): The accepted connection.
+        """
+        try:
+            connection.settimeout(READ_TIMEOUT)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            request: bytes = b''
+            while b'\r\n\r\n' not in request:
+                data: bytes = connection.recv(4096)
+                if not data:
+                    return
+                request += data
+            target: str = request.split(b' ', 2)[1].decode('ascii')
+            for delay, part in self.responses[target]:
+                time.sleep(delay)
+                connection.sendall(part)
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+
+def fetch(parts: list[tuple[float, bytes]], method: str = 'GET', keep_alive: bool = False) -> tuple[HttpResponse, HttpConnection]:
+    """
+    Request a scripted response from a new server with the native engine.
+
+    Arguments:
+        parts (list[tuple[float, bytes]]): The delay (in seconds) and data of each part of the response.
+        method (str): The HTTP method to use.
+        keep_alive (bool): Whether to ask the server to keep the connection open.
+
+    Returns:
+        tuple[HttpResponse, HttpConnection]: The response and the (closed) connection it was read from.
+
+    Raises:
+        MeasurementError: If the response cannot be read.
+    """
+    with ScriptedServer({'/': parts}) as server:
+        connection: HttpConnection = HttpConnection.from_url(server.url, timeout=READ_TIMEOUT)
+        try:
+            connection.connect()
+            return connection.request('/', method, keep_alive), connection
+        finally:
+            connection.close()
+
+
+@pytest.mark.parametrize('split', [1, 3, 9, 14, 20, 28, 40, len(CHUNKED_BODY) - 2])
+def test_chunked_body(split: int) -> None:
+    """Check that a chunked body with chunk extensions and trailers is read to its end when it arrives in two parts split anywhere."""
+    response, connection = fetch([(0.0, CHUNKED_HEAD + CHUNKED_BODY[:split]), (0.01, CHUNKED_BODY[split:])], keep_alive=True)
+    assert response.status == 200
+    assert response.body_bytes == len(b'hello world')
+    assert connection.reusable
+
+
+def test_content_length_body() -> None:
+    """Check that a body framed by Content-Length is read exactly, even when it arrives in several parts."""
+    response, connection = fetch([(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: 70000\r\n\r\n' + b'x' * 30000), (0.01, b'x' * 40000)], keep_alive=True)
+    assert response.body_bytes == 70000
+    assert connection.reusable
+
+    response, connection = fetch([(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')], keep_alive=True)
+    assert response.body_bytes == 0
+    assert connection.reusable
+
+
+def test_body_to_eof() -> None:
+    """Check that a body without a Content-Length or chunked encoding is read until the server closes the connection."""
+    response, connection = fetch([(0.0, b'HTTP/1.1 200 OK\r\n\r\nfirst'), (0.01, b' and second')], keep_alive=True)
+    assert response.body_bytes == len(b'first and second')
+    assert not connection.reusable
+
+
+@pytest.mark.parametrize('method, status_line', [('HEAD', b'HTTP/1.1 200 OK'), ('GET', b'HTTP/1.1 204 No Content'), ('GET', b'HTTP/1.1 304 Not Modified')])
+def test_responses_without_body(method: str, status_line: bytes) -> None:
+    """Check that HEAD, 204 and 304 responses end with their headers, whatever their Content-Length, and leave the connection reusable."""
+    response, connection = fetch([(0.0, status_line + b'\r\nContent-Length: 1000\r\n\r\n')], method, keep_alive=True)
+    assert response.body_bytes == 0
+    assert connection.reusable
+
+
+def test_interim_responses() -> None:
+    """Check that 100 and 103 responses are skipped and the final response is returned."""
+    response, _connection = fetch([
+        (0.0, b'HTTP/1.1 100 Continue\r\n\r\n'),
+        (0.01, b'HTTP/1.1 103 Early Hints\r\nLink: </style.css>; rel=preload\r\n\r\n'),
+        (0.01, b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok'),
+    ])
+    assert response.status == 200
+    assert 'link' not in response.headers
+    assert response.body_bytes == 2
+
+
+@pytest.mark.parametrize('status_line, expected', [
+    (b'HTTP/1.1 200 OK', ('HTTP/1.1', 200, 'OK')),
+    (b'HTTP/1.0 404 Not Found', ('HTTP/1.0', 404, 'Not Found')),
+    (b'HTTP/1.1 200', ('HTTP/1.1', 200, '')),
+    (b'HTTP/1.1 500 ', ('HTTP/1.1', 500, '')),
+])
+def test_status_line(status_line: bytes, expected: tuple[str, int, str]) -> None:
+    """Check the version, status and reason of the status line, and that header names are lower cased with the last value kept."""
+    response, _connection = fetch([(0.0, status_line + b'\r\nX-Test: one\r\nx-test:  two \r\nContent-Length: 0\r\n\r\n')])
+    assert (response.version, response.status, response.reason) == expected
+    assert response.headers['x-test'] == 'two'
+
+
+@pytest.mark.parametrize('data, keep_alive, expected', [
+    (b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n', True, True),
+    (b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n', False, False),
+    (b'HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 0\r\n\r\n', True, False),
+    (b'HTTP/1.0 200 OK\r\nContent-Length: 0\r\n\r\n', True, False),
+    (b'HTTP/1.0 200 OK\r\nConnection: Keep-Alive\r\nContent-Length: 0\r\n\r\n', True, True),
+    (b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nokextra', True, False),
+])
+def test_reusable(data: bytes, keep_alive: bool, expected: bool) -> None:
+    """Check that a connection is reusable only when asked for, allowed by the server and the response ended where its framing said."""
+    _response, connection = fetch([(0.0, data)], keep_alive=keep_alive)
+    assert connection.reusable == expected
+
+
+@pytest.mark.parametrize('parts, message', [
+    ([(0.0, b'HTP/1.1 200 OK\r\n\r\n')], 'Malformed status line'),
+    ([(0.0, b'HTTP/1.1 OK\r\n\r\n')], 'Malformed status line'),
+    ([(0.0, b'HTTP/1.1\r\n\r\n')], 'Malformed status line'),
+    ([(0.0, b'\r\n\r\n')], 'Malformed status line'),
+    ([(0.0, b'HTTP/1.1 200 OK\r\nX-Large: ' + b'x' * (MAX_HEADER_SIZE + 1))], 'too large'),
+    ([(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: 10')], 'closed unexpectedly'),
+    ([(0.0, b'')], 'closed unexpectedly'),
+    ([(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: ten\r\n\r\n')], 'Invalid Content-Length'),
+    ([(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nshort')], 'closed unexpectedly'),
+    ([(0.0, CHUNKED_HEAD + b'zz\r\nhello\r\n0\r\n\r\n')], 'Malformed chunked response'),
+    ([(0.0, CHUNKED_HEAD + b'5\r\nhel')], 'closed unexpectedly'),
+    ([(0.0, CHUNKED_HEAD + b'5\r\nhello\r\n0\r\n')], 'closed unexpectedly'),
+    ([(0.0, CHUNKED_HEAD + b'5' * (MAX_HEADER_SIZE + 1))], 'Malformed chunked response'),
+])
+def test_malformed_responses(parts: list[tuple[float, bytes]], message: str) -> None:
+    """Check that malformed and truncated responses raise MeasurementError with the reason, instead of returning a partial response."""
+    with pytest.raises(MeasurementError, match=message):
+        fetch(parts)
+
+
+def test_body_profile_after_redirect() -> None:
+    """Check that after a redirect with a slow body the throughput is measured from the first byte of the final response, not the sum over the hops."""
+    body: bytes = b'x' * 100000
+    responses: dict[str, list[tuple[float, bytes]]] = {
+        '/start': [(0.0, b'HTTP/1.1 302 Found\r\nLocation: /final\r\nContent-Length: 5\r\n\r\n'), (0.2, b'moved')],
+        '/final': [(0.0, b'HTTP/1.1 200 OK\r\nContent-Length: 100000\r\n\r\n' + body[:50000]), (0.1, body[50000:])],
+    }
+    with ScriptedServer(responses) as server:
+        profile: BodyProfile = BodyProfile()
+        hops: list[RedirectHop] = trace_redirects(server.url + 'start', profile=profile)
+
+    assert [hop.status for hop in hops] == [302, 200]
+    metrics: dict[str, float] = profile.metrics()
+    assert metrics['bytes'] == 100000.0
+    first_byte: float = hops[-1].offset + hops[-1].timings['starttransfer']
+    assert abs((profile.responded - profile.started) / 1e9 - first_byte) < 0.001
+    assert 0.09 < metrics['bytes'] / metrics['throughput'] < 0.19
+
+
+def test_parse_curl_timings() -> None:
+    """Check the timing phases parsed from the CURL_WRITE_OUT template, with and without the trailing newline and surrounding space."""
+    assert parse_curl_timings(TIMINGS_OUTPUT) == TIMINGS
+    assert parse_curl_timings(TIMINGS_OUTPUT.strip()) == TIMINGS
+    assert parse_curl_timings(f"  {TIMINGS_OUTPUT}\n") == TIMINGS
+
+
+@pytest.mark.parametrize('output', [
+    '',
+    '\n',
+    '0.001\t0.002\n',
+    TIMINGS_OUTPUT.strip() + '\t0.07\n',
+    TIMINGS_OUTPUT.replace('0.052000', 'n/a'),
+    'curl: (6) Could not resolve host: example.invalid\n',
+])
+def test_parse_curl_timings_invalid(output: str) -> None:
+    """Check that output with too few, too many or non-numeric values raises MeasurementError."""
+    with pytest.raises(MeasurementError, match='Unable to parse curl output'):
+        parse_curl_timings(output)
+
+
+@pytest.mark.parametrize('line, number, expected', [
+    ('0\t0\t1\t0\t' + TIMINGS_OUTPUT, '0', TIMINGS),
+    ('17\t0\t3\t2\t' + TIMINGS_OUTPUT, '17', TIMINGS),
+    ('4\t6\t0\t0\t0.000000\t0.000000\t0.000000\t0.000000\t0.000000\t0.000000\t0.000000\n', '4', 'curl failed with exit code 6'),
+    ('5\t28\t1\t0\t' + TIMINGS_OUTPUT, '5', 'curl failed with exit code 28'),
+    ('2\t0\t0\t0\t' + TIMINGS_OUTPUT, '2', 'curl reused an open connection'),
+    ('3\t0\t1\t1\t' + TIMINGS_OUTPUT, '3', 'curl reused an open connection'),
+    ('6\t0\t1\t0\t0.1\t0.2\n', '6', 'Unable to parse curl output'),
+    ('curl: (7) Failed to connect to 127.0.0.1 port 1: Connection refused\n', 'curl: (7) Failed to connect to 127.0.0.1 port 1: Connection refused\n',
+     'curl failed with exit code '),
+    ('\n', '\n', 'curl failed with exit code '),
+])
+def test_parse_curl_batch_line(line: str, number: str, expected: object) -> None:
+    """Check the transfer number and the timings, curl error, reused connection (no more connections than redirects) or parse error of each line."""
+    parsed_number, result = _parse_curl_batch_line(line)
+    assert parsed_number == number
+    if isinstance(expected, dict):
+        assert result == expected
+    else:
+        assert isinstance(result, MeasurementError)
+        assert str(result).startswith(expected)
+        assert isinstance(result, ConnectionReusedError) == (expected == 'curl reused an open connection')
+
+
+def test_measure_with_curl_batch(tmp_path) -> None:
+    """Check that the noise curl writes to stderr between the tagged lines (and unknown or repeated transfers) is ignored, and transfers without a line fail."""
+    stderr: str = (
+        'curl: (6) Could not resolve host: example.invalid\n'
+        + '0\t0\t1\t0\t' + TIMINGS_OUTPUT
+        + '* some verbose output\n\n'
+        + '2\t6\t0\t0\t' + TIMINGS_OUTPUT
+        + '0\t0\t1\t0\t' + TIMINGS_OUTPUT
+        + '9\t0\t1\t0\t' + TIMINGS_OUTPUT
+    )
+    (tmp_path / 'stderr').write_text(stderr)
+    curl: str = str(tmp_path / 'curl')
+    with open(curl, 'w', encoding='UTF-8') as f:
+        f.write(f"#!/bin/sh\ncat > /dev/null\ncat '{tmp_path / 'stderr'}' >&2\nexit 7\n")
+    os.chmod(curl, 0o755)
+
+    results: list = list(measure_with_curl_batch(curl, ['http://127.0.0.1/'] * 3))
+    assert [number for number, _result in results] == [0, 2, 1]
+    assert results[0][1] == TIMINGS
+    assert str(results[1][1]) == 'curl failed with exit code 6'
+    assert str(results[2][1]) == 'curl failed with exit code 7'
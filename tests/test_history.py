@@ -0,0 +1,118 @@
+"""
+Round-trip tests for the history store of the URL timing analysis program.
+
+Functions:
+- make_timings: Returns the timing phases of a sample with a given TTFB.
+- make_block: Returns a block of records taken once a second from a start time.
+- test_record_layout: Checks the size of the fixed-width records and index entries.
+- test_append_and_query_window: Checks that the samples of a URL are read back within a time window across blocks.
+- test_error_flag_and_kind: Checks that the error flag and the kind of connection survive the round trip.
+- test_torn_trailing_record: Checks that a partially written record and index entry are ignored and then truncated.
+"""
+
+import os
+
+from typing import Optional
+
+import pytest
+
+from wolfsoftware.ttfb.globals import TIMING_PHASES
+from wolfsoftware.ttfb.history import INDEX_ENTRY, INDEX_FILE, RECORD, SAMPLES_FILE, HistoryStore
+from wolfsoftware.ttfb.stats import TimingAggregate
+
+URL: str = 'https://example.com/'
+OTHER_URL: str = 'https://example.org/'
+
+
+def make_timings(ttfb: float) -> dict[str, float]:
+    """
+    Return the timing phases of a sample with a given TTFB, each phase a fixed step after the one before.
+
+    Arguments:
+        ttfb (float): The starttransfer time in seconds.
+
+    Returns:
+        dict[str, float]: The timing phases.
+    """
+    timings: dict[str, float] = {phase: 0.001 * (position + 1) for position, phase in enumerate(TIMING_PHASES)}
+    return timings | {'starttransfer': ttfb, 'total': ttfb + 0.01}
+
+
+def make_block(start: float, count: int, kind: str = '') -> list[tuple[float, str, Optional[dict[str, float]]]]:
+    """
+    Return a block of successful records taken once a second from a start time.
+
+    Arguments:
+        start (float): The completion time of the first sample (seconds since the epoch).
+        count (int): The number of samples.
+        kind (str): The kind of connection of every sample.
+
+    Returns:
+        list[tuple[float, str, Optional[dict[str, float]]]]: The records.
+    """
+    return [(start + offset, kind, make_timings(0.1 + offset / 1000)) for offset in range(count)]
+
+
+def test_record_layout() -> None:
+    """Check the size of the fixed-width records (40 bytes per sample) and index entries."""
+    assert RECORD.size == 40
+    assert INDEX_ENTRY.size == 40
+
+
+def test_append_and_query_window(tmp_path) -> None:
+    """Check that the samples of a URL are read back, in order and within a time window, across several blocks."""
+    store: HistoryStore = HistoryStore(str(tmp_path))
+    store.append(URL, make_block(1000.0, 10))
+    store.append(OTHER_URL, make_block(1500.0, 10))
+    store.append(URL, make_block(2000.0, 10))
+
+    assert store.urls() == [URL, OTHER_URL]
+    assert len(list(store.blocks())) == 3
+    assert len(list(store.samples(URL))) == 20
+
+    window: list[tuple[float, str, Optional[dict[str, float]]]] = list(store.samples(URL, since=1005.0, until=2004.0))
+    assert [timestamp for timestamp, _, _ in window] == [1005.0 + offset for offset in range(5)] + [2000.0 + offset for offset in range(5)]
+    for (timestamp, kind, timings), (_, _, expected) in zip(window, make_block(1000.0, 10)[5:] + make_block(2000.0, 5)):
+        assert kind == ''
+        assert timings is not None and expected is not None
+        assert timings == pytest.approx(expected, rel=1e-6), timestamp
+
+    assert not list(store.samples(URL, since=1100.0, until=1900.0))
+    assert not list(store.samples('https://example.net/'))
+    assert store.aggregate(URL, since=2000.0).count == 10
+
+
+def test_error_flag_and_kind(tmp_path) -> None:
+    """Check that failed samples come back without timings and that the kind of connection survives the round trip."""
+    store: HistoryStore = HistoryStore(str(tmp_path))
+    store.append(URL, [
+        (1000.0, 'cold', make_timings(0.2)),
+        (1001.0, 'warm', make_timings(0.05)),
+        (1002.0, 'cold', None),
+        (1003.0, 'not-a-kind', make_timings(0.1)),
+    ])
+
+    samples: list[tuple[float, str, Optional[dict[str, float]]]] = list(store.samples(URL))
+    assert [(kind, timings is None) for _, kind, timings in samples] == [('cold', False), ('warm', False), ('cold', True), ('', False)]
+
+    aggregate: TimingAggregate = store.aggregate(URL)
+    assert (aggregate.count, aggregate.errors) == (3, 1)
+
+
+def test_torn_trailing_record(tmp_path) -> None:
+    """Check that a partially written record and index entry (from a killed run) are ignored, then truncated by the next append."""
+    store: HistoryStore = HistoryStore(str(tmp_path))
+    store.append(URL, make_block(1000.0, 3))
+
+    with open(os.path.join(tmp_path, SAMPLES_FILE), 'ab') as f:
+        f.write(b'\x01' * (RECORD.size // 2))
+    with open(os.path.join(tmp_path, INDEX_FILE), 'ab') as f:
+        f.write(b'\x02' * (INDEX_ENTRY.size - 1))
+
+    assert len(list(store.blocks())) == 1
+    assert len(list(store.samples(URL))) == 3
+
+    store.append(URL, make_block(2000.0, 2))
+    assert os.path.getsize(os.path.join(tmp_path, SAMPLES_FILE)) == 5 * RECORD.size
+    assert os.path.getsize(os.path.join(tmp_path, INDEX_FILE)) == 2 * INDEX_ENTRY.size
+    assert [timestamp for timestamp, _, _ in store.samples(URL)] == [1000.0, 1001.0, 1002.0, 2000.0, 2001.0]
@@ -0,0 +1,232 @@
+"""
+Known-answer tests for the statistics of the URL timing analysis program.
+
+Functions:
+- lognormal_samples: Returns a reproducible series of lognormally distributed TTFB samples.
+- test_exact_quantile: Checks the interpolated quantiles of a sorted list.
+- test_running_stats: Checks the mean and standard deviation against a textbook data set.
+- test_running_stats_merge: Checks that merged statistics match those of the combined values.
+- test_aggregate_exact_percentiles: Checks that the percentiles are exact below EXACT_SAMPLE_LIMIT.
+- test_aggregate_sketch_relative_error: Checks the relative error of the sketch after the switch from exact samples.
+- test_aggregate_merge: Checks that merged aggregates match a single aggregate of every sample.
+- test_precision_interval: Checks the order-statistic confidence interval of a percentile against hand-computed ranks.
+- test_precision_minimum_samples: Checks that the precision never converges before PRECISION_MIN_SAMPLES samples.
+- test_precision_stopping_rule: Checks that sampling stops once the interval is narrow enough, and not before.
+- test_mann_whitney_statistic: Checks U and the tie term against hand-counted pairs.
+- test_mann_whitney_p_value: Checks the p-value of the normal approximation against textbook values.
+- test_bootstrap_median_delta: Checks that the bootstrap interval contains the true difference of the medians.
+- test_bootstrap_sample_limit: Checks that samples above BOOTSTRAP_SAMPLE_LIMIT are subsampled and still bracket the difference.
+- test_two_proportion_test: Checks the p-value of the difference between two error rates against the Yates chi-squared test.
+"""
+
+import random
+
+from array import array
+
+import pytest
+
+from wolfsoftware.ttfb.stats import (
+    BOOTSTRAP_SAMPLE_LIMIT, EXACT_SAMPLE_LIMIT, PRECISION_MIN_SAMPLES, SKETCH_RELATIVE_ACCURACY, PrecisionTracker, RunningStats, TimingAggregate,
+    bootstrap_median_delta, exact_quantile, mann_whitney_statistic, mann_whitney_u, two_proportion_test
+)
+
+
+def lognormal_samples(count: int, seed: int = 1) -> list[float]:
+    """
+    Return a reproducible series of lognormally distributed TTFB samples (median around 100ms).
+
+    Arguments:
+        count (int): The number of samples.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        list[float]: The samples in seconds.
+    """
+    rng: random.Random = random.Random(seed)
+    return [rng.lognormvariate(-2.3, 0.5) for _ in range(count)]
+
+
+def test_exact_quantile() -> None:
+    """Check the interpolated quantiles of a sorted list."""
+    assert exact_quantile([], 0.5) == 0.0
+    assert exact_quantile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert exact_quantile([1.0, 2.0, 3.0, 4.0], 0.0) == 1.0
+    assert exact_quantile([1.0, 2.0, 3.0, 4.0], 1.0) == 4.0
+    assert exact_quantile([10.0, 20.0, 30.0, 40.0, 50.0], 0.9) == pytest.approx(46.0)
+
+
+def test_running_stats() -> None:
+    """Check the mean and sample standard deviation against a textbook data set."""
+    stats: RunningStats = RunningStats()
+    for value in (2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0):
+        stats.add(value)
+    assert stats.count == 8
+    assert stats.mean == pytest.approx(5.0)
+    assert stats.stddev == pytest.approx((32 / 7) ** 0.5)
+    assert (stats.minimum, stats.maximum) == (2.0, 9.0)
+
+
+def test_running_stats_merge() -> None:
+    """Check that merged statistics match those of the combined values."""
+    values: list[float] = lognormal_samples(1000)
+    combined: RunningStats = RunningStats()
+    first: RunningStats = RunningStats()
+    second: RunningStats = RunningStats()
+    for index, value in enumerate(values):
+        combined.add(value)
+        (first if index % 3 else second).add(value)
+    first.merge(second)
+    assert first.count == combined.count
+    assert first.mean == pytest.approx(combined.mean)
+    assert first.stddev == pytest.approx(combined.stddev)
+
+
+def test_aggregate_exact_percentiles() -> None:
+    """Check that the percentiles are exact while every sample is stored."""
+    aggregate: TimingAggregate = TimingAggregate(phases=('starttransfer',))
+    for value in range(1, 101):
+        aggregate.add({'starttransfer': float(value)})
+    summary: dict[str, float] = aggregate.summary('starttransfer')
+    assert aggregate.exact
+    assert summary['p50'] == pytest.approx(50.5)
+    assert summary['p90'] == pytest.approx(90.1)
+    assert summary['p99'] == pytest.approx(99.01)
+    assert (summary['min'], summary['max']) == (1.0, 100.0)
+
+
+def test_aggregate_sketch_relative_error() -> None:
+    """Check that the sketch percentiles are within SKETCH_RELATIVE_ACCURACY once the exact samples are dropped."""
+    values: list[float] = lognormal_samples(2 * EXACT_SAMPLE_LIMIT)
+    aggregate: TimingAggregate = TimingAggregate(phases=('starttransfer',))
+    for value in values:
+        aggregate.add({'starttransfer': value})
+    assert not aggregate.exact
+
+    ordered: list[float] = sorted(values)
+    summary: dict[str, float] = aggregate.summary('starttransfer')
+    for statistic, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+        assert summary[statistic] == pytest.approx(exact_quantile(ordered, q), rel=SKETCH_RELATIVE_ACCURACY)
+
+
+def test_aggregate_merge() -> None:
+    """Check that merged aggregates (exact and sketched) match a single aggregate of every sample."""
+    for count in (100, 2 * EXACT_SAMPLE_LIMIT):
+        values: list[float] = lognormal_samples(count, seed=count)
+        combined: TimingAggregate = TimingAggregate(phases=('starttransfer',))
+        parts: list[TimingAggregate] = [TimingAggregate(phases=('starttransfer',)) for _ in range(2)]
+        for index, value in enumerate(values):
+            combined.add({'starttransfer': value})
+            parts[index % 2].add({'starttransfer': value})
+        parts[1].add_error('failed')
+        parts[0].merge(parts[1])
+
+        assert parts[0].count == count
+        assert parts[0].errors == 1
+        assert parts[0].exact == combined.exact
+        for statistic, value in combined.summary('starttransfer').items():
+            assert parts[0].summary('starttransfer')[statistic] == pytest.approx(value)
+
+
+def test_precision_interval() -> None:
+    """Check the order-statistic confidence interval of a percentile against hand-computed ranks."""
+    median: PrecisionTracker = PrecisionTracker(0.05, 'p50')
+    p90: PrecisionTracker = PrecisionTracker(0.05, 'p90')
+    assert median.interval() == (0.0, 0.0, 0.0)
+    for value in range(100, 0, -1):
+        median.add({'starttransfer': float(value)})
+        p90.add({'starttransfer': float(value)})
+
+    # n = 100, q = 0.5: ranks ceil(50 -/+ 1.96 * 5) = 41 and 60.
+    assert median.interval() == (41.0, pytest.approx(50.5), 60.0)
+    assert median.achieved() == pytest.approx(9.5 / 50.5)
+    # n = 100, q = 0.9: ranks ceil(90 -/+ 1.96 * 3) = 85 and 96.
+    assert p90.interval() == (85.0, pytest.approx(90.1), 96.0)
+
+
+def test_precision_minimum_samples() -> None:
+    """Check that identical samples only converge once PRECISION_MIN_SAMPLES samples have been taken."""
+    tracker: PrecisionTracker = PrecisionTracker(0.05)
+    for _ in range(PRECISION_MIN_SAMPLES - 1):
+        tracker.add({'starttransfer': 0.1})
+    assert not tracker.converged
+    tracker.add({'starttransfer': 0.1})
+    assert tracker.converged
+    assert tracker.achieved() == 0.0
+
+
+def test_precision_stopping_rule() -> None:
+    """Check that sampling stops as soon as the relative half-width is within the target precision, and not before."""
+    values: list[float] = lognormal_samples(EXACT_SAMPLE_LIMIT, seed=7)
+    tracker: PrecisionTracker = PrecisionTracker(0.05)
+    for value in values:
+        tracker.add({'starttransfer': value})
+        if tracker.converged:
+            break
+
+    count: int = len(tracker.values)
+    assert tracker.converged
+    assert PRECISION_MIN_SAMPLES <= count < len(values)
+    assert tracker.achieved() <= 0.05
+
+    # The check before the last one was at the count which the check interval (1, or 2% over 100) takes to this one.
+    previous: int = next(checked for checked in range(count - 1, 0, -1) if checked + (checked // 50 if checked > 100 else 1) == count)
+    earlier: PrecisionTracker = PrecisionTracker(0.05, values=values[:previous])
+    assert earlier.achieved() > 0.05
+
+
+def test_mann_whitney_statistic() -> None:
+    """Check U (the pairs in which a is the larger, ties counting half) and the tie term against hand-counted values."""
+    # 3 > 2, 5 > 2 and 5 > 4.
+    assert mann_whitney_statistic([1.0, 3.0, 5.0], [2.0, 4.0, 6.0]) == (3.0, 0.0)
+    # Each 2 in a ties with the 2 in b, and one group of three tied values gives 3^3 - 3.
+    assert mann_whitney_statistic([1.0, 2.0, 2.0], [2.0, 3.0]) == (1.0, 24.0)
+    assert mann_whitney_statistic([6.0, 7.0, 8.0, 9.0], [1.0, 2.0, 3.0]) == (12.0, 0.0)
+
+    a: list[float] = lognormal_samples(30, seed=2)
+    b: list[float] = lognormal_samples(40, seed=3)
+    assert mann_whitney_statistic(a, b)[0] + mann_whitney_statistic(b, a)[0] == len(a) * len(b)  # pylint: disable=arguments-out-of-order
+
+
+def test_mann_whitney_p_value() -> None:
+    """Check the two-sided p-value of the normal approximation (with the continuity correction) against textbook values."""
+    # Complete separation of 5 and 5 values: U = 0, z = (12.5 - 0.5) / sqrt(275 / 12) = 2.5067.
+    assert mann_whitney_u([1.0, 2.0, 3.0, 4.0, 5.0], [6.0, 7.0, 8.0, 9.0, 10.0]) == pytest.approx(0.01219, abs=1e-5)
+    # Interleaved values of 10 and 10: U = 45, z = (50 - 45 - 0.5) / sqrt(175) = 0.3402.
+    evens: list[float] = [float(value) for value in range(0, 20, 2)]
+    odds: list[float] = [float(value) for value in range(1, 20, 2)]
+    assert mann_whitney_u(evens, odds) == pytest.approx(0.7337, abs=1e-4)
+    assert mann_whitney_u([1.0] * 10, [1.0] * 10) == 1.0
+    assert mann_whitney_u([], [1.0]) == 1.0
+
+
+def test_bootstrap_median_delta() -> None:
+    """Check that with a fixed seed the bootstrap interval contains the true difference of the medians (30ms), and not zero."""
+    a: list[float] = lognormal_samples(200, seed=4)
+    b: list[float] = [value + 0.030 for value in lognormal_samples(200, seed=5)]
+    low, high = bootstrap_median_delta(a, b, random.Random(42))
+    assert low < 0.030 < high
+    assert low > 0.0
+    assert bootstrap_median_delta(a, b, random.Random(42)) == (low, high)
+    assert bootstrap_median_delta([], b, random.Random(42)) == (0.0, 0.0)
+
+
+def test_bootstrap_sample_limit() -> None:
+    """Check that samples of arrays well above BOOTSTRAP_SAMPLE_LIMIT are subsampled, and the interval still contains the difference."""
+    a: array = array('d', lognormal_samples(BOOTSTRAP_SAMPLE_LIMIT * 20, seed=6))
+    b: array = array('d', (value + 0.030 for value in lognormal_samples(BOOTSTRAP_SAMPLE_LIMIT * 20, seed=7)))
+    low, high = bootstrap_median_delta(a, b, random.Random(42), resamples=200)
+    assert low < 0.030 < high
+    assert low > 0.0
+    assert len(a) == BOOTSTRAP_SAMPLE_LIMIT * 20
+
+
+def test_two_proportion_test() -> None:
+    """Check the p-value of the difference between two error rates against the chi-squared test of the 2x2 table with Yates' correction."""
+    # 0 of 30 against 6 of 30: chi^2 = 60 * (|0 * 24 - 30 * 6| - 30)^2 / (30 * 30 * 6 * 54) = 4.6296.
+    assert two_proportion_test(0, 30, 6, 30) == pytest.approx(0.03142, abs=1e-5)
+    assert two_proportion_test(6, 30, 0, 30) == two_proportion_test(0, 30, 6, 30)
+    # 0 of 30 against 2 of 30 is within the continuity correction of no difference: chi^2 = 60 * (60 - 30)^2 / (30 * 30 * 2 * 58) = 0.5172.
+    assert two_proportion_test(0, 30, 2, 30) == pytest.approx(0.4720, abs=1e-4)
+    assert two_proportion_test(3, 30, 3, 30) == 1.0
+    assert two_proportion_test(0, 30, 0, 30) == 1.0
+    assert two_proportion_test(0, 0, 1, 10) == 1.0
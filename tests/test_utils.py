@@ -0,0 +1,46 @@
+"""
+Tests for the parsing of the command line values of the URL timing analysis program.
+
+Functions:
+- test_check_duration: Checks the conversion of durations with and without a unit to seconds.
+- test_check_duration_invalid: Checks that durations which are malformed, not positive or not finite are rejected.
+- test_check_rate: Checks the conversion of rates with and without a unit to requests per second.
+- test_check_rate_invalid: Checks that rates which are malformed, not positive or not finite are rejected.
+"""
+
+import argparse
+
+import pytest
+
+from wolfsoftware.ttfb.utils import check_duration, check_rate
+
+
+def test_check_duration() -> None:
+    """Check the conversion of durations with and without a unit to seconds."""
+    assert check_duration('90') == 90.0
+    assert check_duration('90s') == 90.0
+    assert check_duration('1.5m') == 90.0
+    assert check_duration('2H') == 7200.0
+    assert check_duration('1d') == 86400.0
+
+
+@pytest.mark.parametrize('value', ['', 'x', '10x', '0', '-5s', 'nan', 'NaN', 'inf', '-inf', 'infs', 'nanm', '1e308d'])
+def test_check_duration_invalid(value: str) -> None:
+    """Check that durations which are malformed, not positive or not finite (including one which overflows) are rejected."""
+    with pytest.raises(argparse.ArgumentTypeError):
+        check_duration(value)
+
+
+def test_check_rate() -> None:
+    """Check the conversion of rates with and without a unit to requests per second."""
+    assert check_rate('50') == 50.0
+    assert check_rate('50/s') == 50.0
+    assert check_rate('600/M') == 10.0
+    assert check_rate('0.5') == 0.5
+
+
+@pytest.mark.parametrize('value', ['', 'x', '10/h', '0', '-5/s', 'nan', 'nan/s', 'inf', 'inf/s', '-inf/m'])
+def test_check_rate_invalid(value: str) -> None:
+    """Check that rates which are malformed, not positive or not finite are rejected."""
+    with pytest.raises(argparse.ArgumentTypeError):
+        check_rate(value)
@@ -0,0 +1,790 @@
+"""
+This module provides the library API of the URL timing analysis program.
+
+measure (and its asyncio variant measure_async) runs any of the single URL modes in-process and returns a
+Result holding the per-phase aggregates and, optionally, every Sample, so Python callers need neither a
+subprocess nor to parse the text output. The command line modes are thin wrappers over run_measurement,
+which does the same from a configuration object and reports each sample to a callback as it completes.
+
+Example:
+    from wolfsoftware.ttfb.api import measure
+
+    result = measure('https://example.com', count=10)
+    print(result.summary('starttransfer')['p50'])
+
+Classes:
+- Sample: The timing phases (or the error) of a single sample.
+- Result: The samples, aggregates and mode specific details of a run.
+
+Functions:
+- measure: Measures a URL in the given mode and returns the result.
+- measure_async: Measures a URL without blocking the running event loop.
+- measure_run: Measures every sample of a run, over the keep-alive connection pool when enabled.
+- hop_label: Returns the label (status, URL and target) of a hop of a redirect chain.
+- run_measurement: Measures the URL in the mode selected in a configuration object.
+
+Modules:
+- asyncio: Used (imported on first use, as it is slow to import) to run measure in a thread for measure_async.
+- contextlib: Used to make sure the connection pool and sample generators are closed.
+- config: Imports create_configuration to build the configuration object for measure.
+- bodyprofile: Imports BodyProfile to profile the arrival of the body.
+- engine: Imports measure_samples and ConnectionPool to take measurements with the configured engine, and trace_redirects
+  to time each hop of a redirect chain.
+- history: Imports open_history_writer (on first use) to save the samples to the history store.
+- sampling: Imports the sampling loops (sample_indexes, open_precision_tracker, measure_address and run_open_loop) shared with the
+  URL list mode.
+- stats: Imports TimingAggregate and RunningStats to collect the samples and calculate the summary statistics, and
+  PrecisionTracker for adaptive sampling.
+- tracing: Imports active_tracer to add the time the samples spent on the network to the trace with --trace.
+- utils: Imports is_well_formed_url to check the URL, and cache_bust_url and cache_status for the cache-split mode.
+"""
+# pylint: disable=relative-beyond-top-level,import-outside-toplevel
+
+import contextlib
+import functools
+import shutil
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional, Union
+
+from .config import create_configuration
+from .bodyprofile import BodyProfile
+from .engine import ConnectionPool, HttpConnection, RedirectHop, chain_timings, measure_samples, measure_with_native, trace_redirects
+from .exceptions import MeasurementError
+from .globals import (
+    BODY_METRICS, CACHE_SERIES, CONNECTION_KINDS, ENGINES, MAX_COUNT, MODE_BODY, MODE_CACHE_SPLIT, MODE_KEEP_ALIVE, MODE_PER_ADDRESS, MODE_RATE,
+    MODE_REDIRECTS, MODE_SEQUENTIAL, MODES, PRECISION_STATISTICS
+)
+from .sampling import measure_address, open_precision_tracker, run_open_loop, sample_indexes
+from .stats import PrecisionTracker, RunningStats, TimingAggregate
+from .tracing import Tracer, active_tracer
+from .utils import cache_bust_url, cache_status, is_well_formed_url
+
+if TYPE_CHECKING:
+    from .history import HistoryWriter
+
+
+class Sample:
+    """
+    The timing phases (or the error) of a single sample.
+
+    The timings map each of TIMING_PHASES to the number of seconds from the start of the request until the
+    end of that phase, and are None for a failed sample, in which case error holds the error message. The
+    kind is the kind of connection used in keep-alive and redirects modes (the cache status in cache-split mode)
+    and the address is the address the host was pinned to in per-address mode, both are empty otherwise. In
+    redirects mode the hops hold the timings of each request of the redirect chain when it was followed, and in
+    body mode the profile holds the size and arrival times of the body (see body), both are None otherwise.
+    """
+
+    __slots__ = ('index', 'timings', 'error', 'kind', 'address', 'hops', 'profile')
+
+    def __init__(self, index: int, timings: Optional[dict[str, float]] = None,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 error: Optional[str] = None, kind: str = '', address: str = '', hops: Optional[list[RedirectHop]] = None,
+                 profile: Optional[BodyProfile] = None) -> None:
+        """
+        Initialise a sample.
+
+        Arguments:
+            index (int): The index of the sample within the run.
+            timings (Optional[dict[str, float]]): The timing phases in seconds, or None if the sample failed.
+            error (Optional[str]): The error message if the sample failed.
+            kind (str): The kind of connection used in keep-alive and redirects modes, or the cache status in cache-split mode.
+            address (str): The address the host was pinned to in per-address mode.
+            hops (Optional[list[RedirectHop]]): The hops of the redirect chain in redirects mode.
+            profile (Optional[BodyProfile]): The profile of the body in body mode.
+        """
+        self.index: int = index
+        self.timings: Optional[dict[str, float]] = timings
+        self.error: Optional[str] = error
+        self.kind: str = kind
+        self.address: str = address
+        self.hops: Optional[list[RedirectHop]] = hops
+        self.profile: Optional[BodyProfile] = profile
+
+    @classmethod
+    def from_outcome(cls, index: int, outcome: Union[dict[str, float], MeasurementError], kind: str = '', address: str = '') -> 'Sample':
+        """
+        Create a sample from the result of a timing engine.
+
+        Arguments:
+            index (int): The index of the sample within the run.
+            outcome (Union[dict[str, float], MeasurementError]): The timing phases, or the error raised by the engine.
+            kind (str): The kind of connection used in keep-alive mode.
+            address (str): The address the host was pinned to in per-address mode.
+
+        Returns:
+            Sample: The sample.
+        """
+        if isinstance(outcome, MeasurementError):
+            return cls(index, error=f"{outcome}", kind=kind, address=address)
+        return cls(index, outcome, kind=kind, address=address)
+
+    @property
+    def ok(self) -> bool:
+        """
+        Return whether the sample succeeded.
+
+        Returns:
+            bool: True if the sample has timings.
+        """
+        return self.timings is not None
+
+    @property
+    def ttfb(self) -> Optional[float]:
+        """
+        Return the time to first byte of the sample.
+
+        Returns:
+            Optional[float]: The starttransfer phase in seconds, or None if the sample failed.
+        """
+        return self.timings['starttransfer'] if self.timings is not None else None
+
+    @property
+    def body(self) -> Optional[dict[str, float]]:
+        """
+        Return the body metrics of the sample in body mode.
+
+        Returns:
+            Optional[dict[str, float]]: The bytes, throughput (bytes per second) and time to each size of BODY_METRICS,
+                                        or None if the sample failed or the body was not profiled.
+        """
+        if self.profile is None or self.timings is None:
+            return None
+        return self.profile.metrics()
+
+    def __repr__(self) -> str:
+        """
+        Return a short description of the sample.
+
+        Returns:
+            str: The description.
+        """
+        outcome: str = f"ttfb={self.ttfb:.6f}" if self.timings is not None else f"error={self.error!r}"
+        return f"Sample(index={self.index}, {outcome}{f', kind={self.kind!r}' if self.kind else ''}{f', address={self.address!r}' if self.address else ''})"
+
+
+class Result:  # pylint: disable=too-many-instance-attributes
+    """
+    The samples, aggregates and mode specific details of a run.
+
+    The aggregates map each kind of connection (keep-alive and redirects modes), cache status (cache-split mode)
+    or address (per-address mode) to the aggregate of its samples, other modes have a single aggregate under the
+    empty key. In redirects mode the hops map each hop of the redirect chain (its status, URL and target, see
+    hop_label) to the aggregate of its own timings, and are empty in the other modes. In body mode body is the
+    aggregate of the body metrics (see Sample.body), and is None in the other modes. The samples are only kept when requested, so that long
+    runs use constant memory. The details hold the target rate, achieved rate, completed rate and schedule lag
+    (mean and max) in rate mode, the target and achieved precision and the confidence interval of the percentile
+    with adaptive sampling, the number of redirects and the median redirect overhead in redirects mode, the
+    number of samples of each cache status in each series and the origin cost in cache-split mode, and are
+    empty otherwise.
+    """
+
+    __slots__ = ('url', 'mode', 'samples', 'aggregates', 'hops', 'body', 'elapsed', 'details')
+
+    def __init__(self, url: str, mode: str) -> None:
+        """
+        Initialise an empty result.
+
+        Arguments:
+            url (str): The URL that was measured.
+            mode (str): The mode the URL was measured in, one of MODES.
+        """
+        self.url: str = url
+        self.mode: str = mode
+        self.samples: list[Sample] = []
+        self.aggregates: dict[str, TimingAggregate] = {}
+        self.hops: dict[str, TimingAggregate] = {}
+        self.body: Optional[TimingAggregate] = None
+        self.elapsed: float = 0.0
+        self.details: dict[str, float] = {}
+
+    def add(self, sample: Sample, key: str = '', keep: bool = False) -> None:
+        """
+        Add a sample to the aggregate for its key.
+
+        The hops of its redirect chain (if any) are added to the aggregate for each hop and its body metrics (if any) to the body aggregate.
+
+        Arguments:
+            sample (Sample): The sample.
+            key (str): The key of the aggregate, the kind of connection or address.
+            keep (bool): Whether to keep the sample itself in samples.
+        """
+        aggregate: TimingAggregate = self.aggregates.setdefault(key, TimingAggregate())
+        if sample.timings is not None:
+            aggregate.add(sample.timings)
+        else:
+            aggregate.add_error(sample.error or '')
+        for hop in sample.hops or ():
+            self.hops.setdefault(hop_label(hop), TimingAggregate()).add(hop.timings)
+        body: Optional[dict[str, float]] = sample.body
+        if body is not None:
+            if self.body is None:
+                self.body = TimingAggregate(BODY_METRICS)
+            self.body.add(body)
+        if keep:
+            self.samples.append(sample)
+
+    @property
+    def aggregate(self) -> TimingAggregate:
+        """
+        Return the aggregate of every sample in the run.
+
+        Returns:
+            TimingAggregate: The aggregate (merged across every kind of connection or address, if there is more than one).
+        """
+        if len(self.aggregates) == 1:
+            return next(iter(self.aggregates.values()))
+
+        merged: TimingAggregate = TimingAggregate()
+        for aggregate in self.aggregates.values():
+            merged.merge(aggregate)
+        return merged
+
+    @property
+    def count(self) -> int:
+        """
+        Return the number of successful samples.
+
+        Returns:
+            int: The number of successful samples.
+        """
+        return sum(aggregate.count for aggregate in self.aggregates.values())
+
+    @property
+    def errors(self) -> int:
+        """
+        Return the number of failed samples.
+
+        Returns:
+            int: The number of failed samples.
+        """
+        return sum(aggregate.errors for aggregate in self.aggregates.values())
+
+    def summary(self, phase: str = 'starttransfer') -> dict[str, float]:
+        """
+        Return the summary statistics of a single phase over every sample in the run.
+
+        Arguments:
+            phase (str): The name of the timing phase.
+
+        Returns:
+            dict[str, float]: The min, mean, stddev, p50, p90, p99 and max of the phase.
+        """
+        return self.aggregate.summary(phase)
+
+    def __repr__(self) -> str:
+        """
+        Return a short description of the result.
+
+        Returns:
+            str: The description.
+        """
+        return f"Result(url={self.url!r}, mode={self.mode!r}, count={self.count}, errors={self.errors}, elapsed={self.elapsed:.3f})"
+
+
+def measure_run(config: SimpleNamespace, pool: Optional[ConnectionPool],
+                tracker: Optional[PrecisionTracker] = None) -> Iterator[tuple[int, str, Union[dict[str, float], MeasurementError]]]:
+    """
+    Measure every sample of the run, over the connection pool in keep-alive mode or as separate requests otherwise.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, engine and count (or duration).
+        pool (Optional[ConnectionPool]): The connection pool used in keep-alive mode.
+        tracker (Optional[PrecisionTracker]): The precision tracker that stops the run once it converges, for adaptive sampling.
+
+    Yields:
+        tuple[int, str, Union[dict[str, float], MeasurementError]]: The index of the sample, the kind of connection used (empty
+                                                                     outside keep-alive mode) and either the timing phases or the error.
+    """
+    if pool is None:
+        for index, result in measure_samples(config, config.url, sample_indexes(config, tracker)):
+            yield index, '', result
+        return
+
+    for index in sample_indexes(config, tracker):
+        try:
+            kind, sample = pool.measure()
+        except MeasurementError as err:
+            yield index, pool.last_kind, err
+        else:
+            yield index, kind, sample
+
+
+def _measure_sequential(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], check_reachable: bool, keep_samples: bool) -> Result:
+    """
+    Measure the URL one sample after another, over a pool of persistent connections in keep-alive mode.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, engine and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with the target and achieved precision, the confidence interval of the percentile and
+                whether it converged in the details when adaptive sampling is enabled.
+
+    Raises:
+        MeasurementError: If the first sample fails and acts as the reachability check.
+    """
+    result: Result = Result(config.url, MODE_KEEP_ALIVE if config.keep_alive else MODE_SEQUENTIAL)
+    tracker: Optional[PrecisionTracker] = open_precision_tracker(config)
+    started: float = time.perf_counter()
+
+    with contextlib.ExitStack() as stack:
+        pool: Optional[ConnectionPool] = None
+        if config.keep_alive:
+            pool = stack.enter_context(ConnectionPool(config.url, config.pool_size, resolver=config.resolver))
+
+        for index, kind, outcome in stack.enter_context(contextlib.closing(measure_run(config, pool, tracker))):
+            if isinstance(outcome, MeasurementError) and index == 0 and check_reachable:
+                raise outcome
+            sample: Sample = Sample.from_outcome(index, outcome, kind)
+            result.add(sample, kind, keep_samples)
+            if tracker is not None and sample.timings is not None:
+                tracker.add(sample.timings)
+            if on_sample is not None:
+                on_sample(sample)
+
+    result.elapsed = time.perf_counter() - started
+    if pool is not None:
+        result.aggregates = {kind: result.aggregates[kind] for kind in CONNECTION_KINDS if kind in result.aggregates}
+    if tracker is not None:
+        result.details = _precision_details(tracker)
+    return result
+
+
+def _precision_details(tracker: PrecisionTracker) -> dict[str, float]:
+    """
+    Return the details of an adaptive sampling run.
+
+    Arguments:
+        tracker (PrecisionTracker): The precision tracker of the run.
+
+    Returns:
+        dict[str, float]: The target and achieved precision, the percentile and its confidence interval, and whether it converged (1.0 or 0.0).
+    """
+    low, estimate, high = tracker.interval()
+    return {
+        'target_precision': tracker.precision,
+        'precision': tracker.achieved(),
+        'interval_low': low,
+        'estimate': estimate,
+        'interval_high': high,
+        'converged': float(tracker.converged),
+    }
+
+
+def _measure_at_rate(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], keep_samples: bool) -> Result:
+    """
+    Measure the URL on a fixed schedule (open loop), see sampling.run_open_loop.
+
+    The samples are indexed in the order they complete.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, rate, count (or duration) and worker count.
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with the target, achieved and completed rates and the schedule lag in the details (the achieved
+                rate is 0 when fewer than two requests were sent, as there is no interval to measure it over).
+
+    Raises:
+        MeasurementError: If every request fails.
+    """
+    result: Result = Result(config.url, MODE_RATE)
+    lags: RunningStats = RunningStats()
+
+    def on_result(lag: float, timings: Optional[dict[str, float]], error: Optional[str]) -> None:
+        lags.add(lag)
+        sample: Sample = Sample(lags.count - 1, timings, None if timings is not None else error or '')
+        result.add(sample, keep=keep_samples)
+        if on_sample is not None:
+            on_sample(sample)
+
+    started: float = time.monotonic()
+    sent, sending_time = run_open_loop(config, on_result)
+    result.elapsed = time.monotonic() - started
+
+    if result.count == 0:
+        raise MeasurementError(f"{result.aggregate.last_error}")
+
+    result.details = {
+        'target_rate': config.rate,
+        'achieved_rate': (sent - 1) / sending_time if sent > 1 and sending_time > 0 else 0.0,
+        'completed_rate': result.count / result.elapsed,
+        'lag_mean': lags.mean,
+        'lag_max': lags.maximum,
+    }
+    return result
+
+
+def _measure_per_address(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], keep_samples: bool) -> Result:
+    """
+    Measure every address the host of the URL resolves to in parallel, see sampling.measure_address.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, engine, resolver and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called (from the worker threads) with each sample as it completes.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with an aggregate for each address.
+
+    Raises:
+        MeasurementError: If the host cannot be resolved.
+    """
+    result: Result = Result(config.url, MODE_PER_ADDRESS)
+    connection: HttpConnection = HttpConnection.from_url(config.url)
+    addresses: list[str] = config.resolver.addresses(connection.host, connection.port)
+    started: float = time.perf_counter()
+
+    def on_result(address: str, index: int, outcome: Union[dict[str, float], MeasurementError]) -> None:
+        sample: Sample = Sample.from_outcome(index, outcome, address=address)
+        if keep_samples:
+            result.samples.append(sample)
+        if on_sample is not None:
+            on_sample(sample)
+
+    with ThreadPoolExecutor(max_workers=min(len(addresses), config.concurrency)) as executor:
+        futures: dict = {address: executor.submit(measure_address, config, address, functools.partial(on_result, address)) for address in addresses}
+        result.aggregates = {address: future.result() for address, future in futures.items()}
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def hop_label(hop: RedirectHop) -> str:
+    """
+    Return the label of a hop of a redirect chain, its status, URL and (for a redirect) target.
+
+    Arguments:
+        hop (RedirectHop): The hop.
+
+    Returns:
+        str: The label, such as '301 http://example.com/ -> https://example.com/'.
+    """
+    return f"{hop.status} {hop.url}" + (f" -> {hop.location}" if hop.location else '')
+
+
+def _collect(config: SimpleNamespace, result: Result, take_sample: Callable[[int], Sample],  # pylint: disable=too-many-arguments,too-many-positional-arguments
+             on_sample: Optional[Callable[[Sample], None]], check_reachable: bool, keep_samples: bool) -> None:
+    """
+    Take every sample of a run one after another, adding each to the result, for the redirects, body and cache-split modes.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the count (or duration) and adaptive sampling settings.
+        result (Result): The result to add the samples to, keyed by their kind. Its elapsed time and, with adaptive
+                         sampling, the precision details are set at the end of the run.
+        take_sample (Callable[[int], Sample]): Takes the sample with the given index, returning a failed sample on error.
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Raises:
+        MeasurementError: If the first sample fails and acts as the reachability check.
+    """
+    tracker: Optional[PrecisionTracker] = open_precision_tracker(config)
+    started: float = time.perf_counter()
+
+    for index in sample_indexes(config, tracker):
+        sample: Sample = take_sample(index)
+        if sample.timings is None and index == 0 and check_reachable:
+            raise MeasurementError(sample.error)
+        result.add(sample, sample.kind, keep_samples)
+        if tracker is not None and sample.timings is not None:
+            tracker.add(sample.timings)
+        if on_sample is not None:
+            on_sample(sample)
+
+    result.elapsed = time.perf_counter() - started
+    if tracker is not None:
+        result.details = _precision_details(tracker)
+
+
+def _measure_redirects(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], check_reachable: bool, keep_samples: bool) -> Result:
+    """
+    Measure the URL following its redirect chain with the native engine, timing each hop separately.
+
+    Every sample follows the chain from the original URL, unless caching the redirect target is enabled, in which
+    case the chain is only followed until it succeeds once and the remaining samples measure its final target directly,
+    so the destination is measured without the redirects and the redirect overhead is reported separately.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, resolver, redirect caching setting and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with an aggregate for the samples which followed the chain (redirected) and for those that
+                measured the final target directly (direct), the aggregate of each hop, and the number of redirects and
+                the median redirect overhead in the details.
+
+    Raises:
+        MeasurementError: If the first sample fails and acts as the reachability check.
+    """
+    result: Result = Result(config.url, MODE_REDIRECTS)
+    chain: list[RedirectHop] = []
+
+    def take_sample(index: int) -> Sample:
+        target: Optional[str] = chain[-1].url if chain and config.cache_redirect else None
+        try:
+            if target is None:
+                hops: list[RedirectHop] = trace_redirects(config.url, resolver=config.resolver)
+                chain[:] = hops
+                return Sample(index, chain_timings(hops), kind='redirected', hops=hops)
+            return Sample(index, measure_with_native(target, resolver=config.resolver), kind='direct')
+        except MeasurementError as err:
+            return Sample(index, error=f"{err}", kind='redirected' if target is None else 'direct')
+
+    _collect(config, result, take_sample, on_sample, check_reachable, keep_samples)
+    result.details['redirects'] = float(len(chain) - 1 if chain else 0)
+    if 'redirected' in result.aggregates and result.aggregates['redirected'].count:
+        result.details['redirect_overhead'] = result.aggregates['redirected'].summary('redirect')['p50']
+    return result
+
+
+def _measure_body(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], check_reachable: bool, keep_samples: bool) -> Result:
+    """
+    Measure the URL with the native engine, profiling the arrival of the body as it is read.
+
+    The body is read in blocks and discarded, only its size and arrival times are recorded (see BodyProfile), so
+    memory use stays constant however large the body is.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, resolver, timeline size and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with the aggregate of the body metrics in body.
+
+    Raises:
+        MeasurementError: If the first sample fails and acts as the reachability check.
+    """
+    result: Result = Result(config.url, MODE_BODY)
+
+    def take_sample(index: int) -> Sample:
+        profile: BodyProfile = BodyProfile(config.timeline_size)
+        try:
+            return Sample(index, chain_timings(trace_redirects(config.url, resolver=config.resolver, profile=profile)), profile=profile)
+        except MeasurementError as err:
+            return Sample(index, error=f"{err}")
+
+    _collect(config, result, take_sample, on_sample, check_reachable, keep_samples)
+    return result
+
+
+def _measure_cache_split(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]], check_reachable: bool, keep_samples: bool) -> Result:
+    """
+    Measure the URL with the native engine, alternating between a warm series and a cache-busting series.
+
+    The warm series requests the URL as it is, without asking caches to revalidate, so that a CDN can serve it from
+    the edge. The cache-busting series adds a unique token to the query string of every request (see utils.cache_bust_url),
+    so that no cache can have the response. Each sample is classified as a cache hit or miss from the cache status
+    headers of its response (see utils.cache_status), whichever series it was taken in.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, resolver and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check.
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result, with an aggregate for each cache status (hit, miss and unknown), and in the details the number
+                of samples of each cache status in each series (such as warm_hit and busted_miss) and, when there are both
+                hits and misses, the origin cost (the median TTFB of the misses less that of the hits).
+
+    Raises:
+        MeasurementError: If the first sample fails and acts as the reachability check.
+    """
+    result: Result = Result(config.url, MODE_CACHE_SPLIT)
+    counts: dict[str, float] = {f"{series}_{status}": 0.0 for series in CACHE_SERIES for status in ('hit', 'miss', 'unknown')}
+
+    def take_sample(index: int) -> Sample:
+        series: str = CACHE_SERIES[index % 2]
+        try:
+            hops: list[RedirectHop] = trace_redirects(config.url if series == CACHE_SERIES[0] else cache_bust_url(config.url),
+                                                      resolver=config.resolver, no_cache=series != CACHE_SERIES[0])
+        except MeasurementError as err:
+            return Sample(index, error=f"{err}", kind='unknown')
+        status: str = cache_status(hops[-1].headers)
+        counts[f"{series}_{status}"] += 1
+        return Sample(index, chain_timings(hops), kind=status)
+
+    _collect(config, result, take_sample, on_sample, check_reachable, keep_samples)
+    result.aggregates = {kind: result.aggregates[kind] for kind in CONNECTION_KINDS if kind in result.aggregates}
+    result.details.update(counts)
+    if 'hit' in result.aggregates and 'miss' in result.aggregates:
+        result.details['origin_cost'] = result.aggregates['miss'].summary('starttransfer')['p50'] - result.aggregates['hit'].summary('starttransfer')['p50']
+    return result
+
+
+def _save_sample(history: 'HistoryWriter', url: str, on_sample: Optional[Callable[[Sample], None]], sample: Sample) -> None:
+    """
+    Save a sample to the history store and pass it on to the callback.
+
+    Arguments:
+        history (HistoryWriter): The history writer.
+        url (str): The URL the sample was taken from.
+        on_sample (Optional[Callable[[Sample], None]]): The callback.
+        sample (Sample): The sample.
+    """
+    history.add(url, sample.timings, sample.kind)
+    if on_sample is not None:
+        on_sample(sample)
+
+
+def _trace_sample(tracer: Tracer, on_sample: Optional[Callable[[Sample], None]], sample: Sample) -> None:
+    """
+    Add the total time of a sample to the network time of the tracer and pass it on to the callback.
+
+    Arguments:
+        tracer (Tracer): The tracer.
+        on_sample (Optional[Callable[[Sample], None]]): The callback.
+        sample (Sample): The sample.
+    """
+    if sample.timings is not None:
+        tracer.add_network_time(sample.timings['total'])
+    if on_sample is not None:
+        on_sample(sample)
+
+
+def run_measurement(config: SimpleNamespace, on_sample: Optional[Callable[[Sample], None]] = None,
+                    check_reachable: bool = True, keep_samples: bool = False) -> Result:
+    """
+    Measure the URL in the mode selected in the configuration object.
+
+    This is what both measure and the command line modes are built on. When the history is enabled in the
+    configuration every sample is also saved to the history store (see history.py), and while tracing is on
+    the total time of every sample is added to the network time of the trace (see tracing.py).
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, mode settings, engine and count (or duration).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        check_reachable (bool): Whether the first sample acts as the reachability check (every mode but rate and per-address).
+        keep_samples (bool): Whether to keep every sample in the result.
+
+    Returns:
+        Result: The result.
+
+    Raises:
+        MeasurementError: If the URL could not be reached (see measure).
+    """
+    history: Optional[HistoryWriter] = None
+    if config.history:
+        from .history import open_history_writer
+        history = open_history_writer(config)
+        on_sample = functools.partial(_save_sample, history, config.url, on_sample)
+    tracer: Optional[Tracer] = active_tracer()
+    if tracer is not None:
+        on_sample = functools.partial(_trace_sample, tracer, on_sample)
+
+    try:
+        if config.rate:
+            return _measure_at_rate(config, on_sample, keep_samples)
+        if config.per_address:
+            return _measure_per_address(config, on_sample, keep_samples)
+        if config.redirects:
+            return _measure_redirects(config, on_sample, check_reachable, keep_samples)
+        if config.body:
+            return _measure_body(config, on_sample, check_reachable, keep_samples)
+        if config.cache_split:
+            return _measure_cache_split(config, on_sample, check_reachable, keep_samples)
+        return _measure_sequential(config, on_sample, check_reachable, keep_samples)
+    finally:
+        if history is not None:
+            history.close()
+
+
+def measure(url: str, count: int = 1, mode: str = MODE_SEQUENTIAL, *, keep_samples: bool = True,
+            on_sample: Optional[Callable[[Sample], None]] = None, **options: Any) -> Result:
+    """
+    Measure a URL in-process and return the result.
+
+    The modes are the same as the command line modes:
+        - sequential: One sample after another, each over a new connection (the default).
+        - keep-alive: Samples over a pool of persistent connections, aggregated by kind of connection.
+        - rate: Samples sent on a fixed schedule (the rate option is required), measured from the scheduled time.
+        - per-address: Every address the host resolves to measured in parallel, aggregated by address.
+        - redirects: Samples that follow the redirect chain with the native engine, with the timings of each hop aggregated
+          separately (in Result.hops), with cache_redirect the remaining samples measure the final target directly.
+        - body: Samples with the native engine that profile the arrival of the body, with the body metrics aggregated
+          separately (in Result.body), with timeline each sample also keeps a compact timeline (see Sample.profile).
+        - cache-split: Samples with the native engine that alternate between the URL as it is and the URL with a unique
+          cache-busting token, aggregated by the cache status of the response (hit, miss or unknown).
+
+    The options are duration (seconds to keep sampling for instead of a count), engine ('native', the default
+    unlike the command line so that curl is not needed, or 'curl'), pool_size, rate (requests per second), max_in_flight, concurrency, pin_dns, dns_ttl, history
+    (save the samples to the history store), history_dir, target_precision (keep sampling until the confidence
+    interval of the TTFB percentile is within this fraction of it, count is then ignored), target_statistic,
+    max_samples, cache_redirect and timeline, with the same meaning and defaults as the command line options of the same name (see config.LIBRARY_DEFAULTS).
+
+    Arguments:
+        url (str): The URL to measure.
+        count (int): The number of samples to take.
+        mode (str): The mode to measure in, one of MODES.
+        keep_samples (bool): Whether to keep every sample in the result (turn off for very long runs).
+        on_sample (Optional[Callable[[Sample], None]]): Called with each sample as it completes.
+        **options (Any): The mode and engine options.
+
+    Returns:
+        Result: The result.
+
+    Raises:
+        ValueError: If the URL, count, mode, engine or adaptive sampling options are not valid.
+        TypeError: If an option is not known.
+        MeasurementError: If the first sample fails (every mode but rate and per-address), every sample fails (rate mode),
+                          the host cannot be resolved (per-address mode) or curl is not installed.
+    """
+    if not is_well_formed_url(url):
+        raise ValueError(f"Invalid URL - must start with http:// or https://: {url}")
+    if not 1 <= count <= MAX_COUNT:
+        raise ValueError(f"count must be between 1 and {MAX_COUNT}: {count}")
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}: {mode}")
+    if options.get('engine', ENGINES[1]) not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(ENGINES)}: {options['engine']}")
+    if mode == MODE_RATE and not options.get('rate'):
+        raise ValueError("the rate option is required in rate mode")
+    if options.get('target_precision') is not None and (mode in (MODE_RATE, MODE_PER_ADDRESS) or not 0 < options['target_precision'] < 1):
+        raise ValueError("target_precision must be between 0 and 1 and can not be used in rate and per-address modes")
+    if options.get('target_statistic', PRECISION_STATISTICS[0]) not in PRECISION_STATISTICS:
+        raise ValueError(f"target_statistic must be one of {', '.join(PRECISION_STATISTICS)}: {options['target_statistic']}")
+
+    config: SimpleNamespace = create_configuration(url, mode, {**options, 'count': count})
+    if config.engine == 'curl':
+        curl: Optional[str] = shutil.which('curl')
+        if curl is None:
+            raise MeasurementError("curl is not installed")
+        config.command_paths = {'curl': curl}
+    return run_measurement(config, on_sample, keep_samples=keep_samples)
+
+
+async def measure_async(url: str, count: int = 1, mode: str = MODE_SEQUENTIAL, **options: Any) -> Result:
+    """
+    Measure a URL without blocking the running event loop.
+
+    The measurement runs in the event loop's default executor, the arguments are the same as for measure
+    (on_sample is called from the executor's thread).
+
+    Arguments:
+        url (str): The URL to measure.
+        count (int): The number of samples to take.
+        mode (str): The mode to measure in, one of MODES.
+        **options (Any): The keyword arguments of measure.
+
+    Returns:
+        Result: The result.
+
+    Raises:
+        ValueError: If the URL, count, mode or engine are not valid.
+        MeasurementError: If the URL could not be reached, see measure.
+    """
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(measure, url, count, mode, **options))
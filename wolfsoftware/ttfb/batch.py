@@ -0,0 +1,311 @@
+"""
+This module handles concurrent probing of many URLs for the URL timing analysis program.
+
+The URLs are read from a file (or stdin) and measured concurrently by an asyncio scheduler which hands
+the blocking measurements to a thread pool. The number of URLs measured at once is bounded by the
+concurrency limit, and the number measured against any single host by the per-host limit, so the total
+wall-clock time scales with the concurrency rather than with the number of URLs.
+
+For very large lists a single process becomes the bottleneck (on parsing, TLS and aggregation), so the
+URLs can also be sharded across a pool of worker processes, each running its own scheduler and sending
+only the (picklable, mergeable) aggregate of each URL back to the parent.
+
+Functions:
+- read_url_list: Reads the list of URLs to probe from a file or stdin.
+- probe_urls: Measures a list of URLs concurrently and returns an aggregate per URL.
+- shard_urls: Splits a list of URLs into shards, keeping the URLs on each host together.
+- probe_urls_sharded: Measures a list of URLs across a pool of worker processes and returns an aggregate per URL.
+- process_url_list: Reads, probes and displays the results for a list of URLs.
+
+Modules:
+- asyncio: Used to schedule the measurements within the concurrency limits.
+- concurrent.futures: Provides the thread pool the blocking measurements run in, and the process pool for the worker processes.
+- cache: Imports open_validation_cache to skip the reachability check for recently reached URLs.
+- display: Imports draw_line and error_message to draw formatted lines and display error messages.
+- formatting: Imports the formatting functions shared with the other modes.
+- history: Imports open_history_writer to save the samples to the history store.
+- output: Imports open_record_writer and fatal_error for the machine-readable output formats.
+- sampling: Imports measure_url to measure all the samples for each URL.
+- stats: Imports TimingAggregate to summarise the samples for each URL.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import asyncio
+import functools
+import signal
+import sys
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import Callable, Optional, Union
+from urllib.parse import urlsplit
+
+from .cache import ValidationCache, open_validation_cache
+from .display import draw_line, error_message
+from .exceptions import MeasurementError
+from .formatting import display_header, format_aggregate_line, select_phases
+from .history import HistoryWriter, open_history_writer
+from .output import RecordWriter, fatal_error, open_record_writer
+from .sampling import measure_url
+from .stats import TimingAggregate
+
+SHARDS_PER_WORKER: int = 4
+
+
+def read_url_list(path: str) -> list[str]:
+    """
+    Read the list of URLs to probe from a file, or from stdin if the path is '-'.
+
+    Blank lines and lines starting with '#' are ignored, duplicate URLs are only probed once.
+
+    Arguments:
+        path (str): The path of the file containing one URL per line, or '-' for stdin.
+
+    Returns:
+        list[str]: The URLs in the order they were listed.
+
+    Exits:
+        If the file cannot be read, prints an error message and exits the program.
+    """
+    try:
+        if path == '-':
+            lines: list[str] = sys.stdin.read().splitlines()
+        else:
+            with open(path, 'r', encoding='UTF-8') as f:
+                lines = f.read().splitlines()
+    except OSError as err:
+        print(error_message(f"Unable to read URL list {path}: {err.strerror}"))
+        sys.exit(1)
+
+    urls: list[str] = [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+    return list(dict.fromkeys(urls))
+
+
+async def _probe_urls(config: SimpleNamespace, urls: list[str], on_complete: Optional[Callable[[str, TimingAggregate], None]],
+                      cache: Optional[ValidationCache], on_result: Optional[Callable]) -> dict[str, TimingAggregate]:
+    """
+    Measure a list of URLs concurrently within the concurrency and per-host limits.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the concurrency limits.
+        urls (list[str]): The URLs to measure.
+        on_complete (Optional[Callable[[str, TimingAggregate], None]]): Called with each URL and its aggregate as it completes.
+        cache (Optional[ValidationCache]): The validation cache, if enabled.
+        on_result (Optional[Callable]): Called with the URL, index and timing phases (or error) of each sample.
+
+    Returns:
+        dict[str, TimingAggregate]: The aggregate for each URL.
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    concurrency: asyncio.Semaphore = asyncio.Semaphore(config.concurrency)
+    host_limits: dict[str, asyncio.Semaphore] = {}
+    results: dict[str, TimingAggregate] = {}
+
+    with ThreadPoolExecutor(max_workers=config.concurrency) as executor:
+        async def probe(url: str) -> None:
+            host: str = urlsplit(url).netloc.lower()
+            host_limit: asyncio.Semaphore = host_limits.setdefault(host, asyncio.Semaphore(config.per_host))
+            async with host_limit:
+                async with concurrency:
+                    aggregate: TimingAggregate = await loop.run_in_executor(
+                        executor, measure_url, config, url, cache, functools.partial(on_result, url) if on_result is not None else None)
+            results[url] = aggregate
+            if on_complete is not None:
+                on_complete(url, aggregate)
+
+        await asyncio.gather(*(probe(url) for url in urls))
+
+    return results
+
+
+def probe_urls(config: SimpleNamespace, urls: list[str], on_complete: Optional[Callable[[str, TimingAggregate], None]] = None,
+               cache: Optional[ValidationCache] = None,
+               on_result: Optional[Callable[[str, int, Union[dict[str, float], MeasurementError]], None]] = None) -> dict[str, TimingAggregate]:
+    """
+    Measure a list of URLs concurrently and return an aggregate for each URL.
+
+    At most config.concurrency URLs are measured at once, and at most config.per_host against any single host.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine, sample count and concurrency limits.
+        urls (list[str]): The URLs to measure.
+        on_complete (Optional[Callable[[str, TimingAggregate], None]]): Called with each URL and its aggregate as it completes.
+        cache (Optional[ValidationCache]): The validation cache, if enabled.
+        on_result (Optional[Callable]): Called (from the worker threads) with the URL, index and timing phases (or error) of each sample.
+
+    Returns:
+        dict[str, TimingAggregate]: The aggregate for each URL.
+    """
+    return asyncio.run(_probe_urls(config, urls, on_complete, cache, on_result))
+
+
+def shard_urls(urls: list[str], shards: int) -> list[list[str]]:
+    """
+    Split a list of URLs into shards of roughly equal size, keeping all the URLs on the same host in the same shard.
+
+    Keeping each host in a single shard means the per-host limit still applies across the whole run. The hosts
+    are assigned largest first to whichever shard has the fewest URLs so far.
+
+    Arguments:
+        urls (list[str]): The URLs to split.
+        shards (int): The largest number of shards to split the URLs into.
+
+    Returns:
+        list[list[str]]: The shards, there are fewer than requested if there are fewer hosts.
+    """
+    hosts: dict[str, list[str]] = {}
+    for url in urls:
+        hosts.setdefault(urlsplit(url).netloc.lower(), []).append(url)
+
+    buckets: list[list[str]] = [[] for _ in range(min(shards, len(hosts)))]
+    for host_urls in sorted(hosts.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(host_urls)
+    return buckets
+
+
+def _probe_shard(config: SimpleNamespace, urls: list[str], cache: Optional[ValidationCache]) -> dict[str, TimingAggregate]:
+    """
+    Measure a single shard of URLs in a worker process, saving the samples to the history store if it is enabled.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine, sample count and concurrency limits.
+        urls (list[str]): The URLs in the shard.
+        cache (Optional[ValidationCache]): A copy of the validation cache, used to decide which URLs need a reachability check.
+
+    Returns:
+        dict[str, TimingAggregate]: The aggregate for each URL.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    history: Optional[HistoryWriter] = open_history_writer(config)
+    try:
+        return probe_urls(config, urls, cache=cache, on_result=history.result if history is not None else None)
+    finally:
+        if history is not None:
+            history.close()
+
+
+def probe_urls_sharded(config: SimpleNamespace, urls: list[str], on_complete: Optional[Callable[[str, TimingAggregate], None]] = None,
+                       cache: Optional[ValidationCache] = None) -> dict[str, TimingAggregate]:
+    """
+    Measure a list of URLs across a pool of config.workers processes and return an aggregate for each URL.
+
+    The URLs are split into SHARDS_PER_WORKER shards per worker (see shard_urls), each shard is measured by
+    probe_urls in a worker process, with its own concurrency and per-host limits, and only the aggregate of
+    each URL is sent back, so the parsing, TLS work and aggregation are spread across the processes. The
+    results of each shard are merged into the parent's results (and validation cache) as the shard completes.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the worker count, engine, sample count and concurrency limits.
+        urls (list[str]): The URLs to measure.
+        on_complete (Optional[Callable[[str, TimingAggregate], None]]): Called with each URL and its aggregate as its shard completes.
+        cache (Optional[ValidationCache]): The validation cache, if enabled.
+
+    Returns:
+        dict[str, TimingAggregate]: The aggregate for each URL.
+    """
+    results: dict[str, TimingAggregate] = {}
+    with ProcessPoolExecutor(max_workers=config.workers) as executor:
+        futures: list[Future] = [executor.submit(_probe_shard, config, shard, cache) for shard in shard_urls(urls, config.workers * SHARDS_PER_WORKER)]
+        try:
+            for future in as_completed(futures):
+                for url, aggregate in future.result().items():
+                    results[url] = aggregate
+                    if cache is not None and aggregate.count:
+                        cache.record(url)
+                    if on_complete is not None:
+                        on_complete(url, aggregate)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
+
+
+def _print_aggregate(phases: tuple[str, ...], url: str, aggregate: TimingAggregate) -> None:
+    """
+    Display the line showing the aggregate for a URL.
+
+    Arguments:
+        phases (tuple[str, ...]): The names of the timing phases to include.
+        url (str): The URL.
+        aggregate (TimingAggregate): The aggregate of the samples for the URL.
+    """
+    print(format_aggregate_line(url, aggregate, phases), flush=True)
+
+
+def _combine_results(writer: Optional[RecordWriter], history: Optional[HistoryWriter]) -> Optional[Callable]:
+    """
+    Return the callback that passes the result of each sample to the record writer and the history writer (where enabled).
+
+    Arguments:
+        writer (Optional[RecordWriter]): The record writer, if a machine-readable output format is selected.
+        history (Optional[HistoryWriter]): The history writer, if the history is enabled.
+
+    Returns:
+        Optional[Callable]: The callback, or None if neither is enabled.
+    """
+    if writer is not None and history is not None:
+        def on_result(url: str, index: int, result: Union[dict[str, float], MeasurementError]) -> None:
+            writer.result(url, index, result)
+            history.result(url, index, result)
+        return on_result
+    if writer is not None:
+        return writer.result
+    if history is not None:
+        return history.result
+    return None
+
+
+def process_url_list(config: SimpleNamespace) -> None:
+    """
+    Read, probe and display the results for a list of URLs.
+
+    A line showing the aggregate for each URL is displayed as soon as all of its samples have completed. With a
+    machine-readable output format a record is written for each sample and the summary records for each URL are
+    written as soon as all of its samples have completed.
+
+    With more than one worker the URLs are sharded across a pool of processes (see probe_urls_sharded) and the
+    results are displayed as each shard completes. Only the summary records are written in this case, as the
+    samples themselves stay in the worker processes (which save them to the history store themselves if it is enabled).
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL file and other settings.
+
+    Exits:
+        If there are no URLs to test, displays an error message and exits the program.
+    """
+    urls: list[str] = read_url_list(config.url_file)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    if not urls:
+        fatal_error(writer, "No URLs to test")
+
+    display_header(config, f"Results for {len(urls)} URLs")
+
+    phases: tuple[str, ...] = select_phases(config)
+    cache: Optional[ValidationCache] = open_validation_cache(config)
+    started: float = time.perf_counter()
+    history: Optional[HistoryWriter] = open_history_writer(config) if config.workers == 1 else None
+    on_result: Optional[Callable] = _combine_results(writer, history)
+    if writer is not None and config.workers > 1:
+        probe_urls_sharded(config, urls, writer.summary, cache)
+    elif writer is not None:
+        probe_urls(config, urls, writer.summary, cache, on_result)
+    elif config.workers > 1:
+        results: dict[str, TimingAggregate] = probe_urls_sharded(config, urls, functools.partial(_print_aggregate, phases), cache)
+    else:
+        results = probe_urls(config, urls, functools.partial(_print_aggregate, phases), cache, on_result)
+    elapsed: float = time.perf_counter() - started
+    if cache is not None:
+        cache.save()
+    if history is not None:
+        history.close()
+
+    if writer is not None:
+        writer.finish()
+        return
+
+    errors: int = sum(aggregate.errors for aggregate in results.values())
+    workers: str = f"{config.workers} workers and " if config.workers > 1 else ''
+    print(draw_line(width=config.screen_width))
+    print(f"  Tested {len(urls)} URLs ({errors} failed samples) in {elapsed:.3f}s with {workers}a concurrency of {config.concurrency}")
+    print(draw_line(width=config.screen_width))
@@ -0,0 +1,153 @@
+"""
+This module handles the body mode of the URL timing analysis program.
+
+The other modes discard the body, so they only report the time to first byte and the total time, and a
+response which starts quickly but then streams slowly looks fine. In body mode the body is still read in
+blocks and discarded (so memory use stays constant however large it is), but the arrival of each block is
+recorded, and the size of the body, the throughput after the first byte and the time to the first 1 KB,
+14 KB (roughly the initial TCP congestion window) and 100 KB are reported, along with a compact timeline
+of when the body arrived with --timeline.
+
+Functions:
+- process_url_body: Validates the URL and runs the body mode.
+- format_timeline_lines: Formats the arrival timeline of a body.
+- format_body_lines: Formats the summary statistics of the body metrics as a table.
+- display_body_timing: Measures the URL profiling its body and displays the results.
+
+Modules:
+- api: Imports run_measurement to run the body mode, which display_body_timing is a thin wrapper over.
+- bodyprofile: Imports BodyProfile for the type of the body profiles.
+- display: Imports draw_line to draw formatted lines.
+- formatting: Imports the formatting functions shared with the other modes.
+- output: Imports open_record_writer and fatal_error for the machine-readable output formats.
+- process: Imports the display functions shared with the other modes.
+- stats: Imports SUMMARY_STATISTICS and TimingAggregate for the summary statistics of the body metrics.
+- utils: Imports utility functions like validate_url.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+from typing import Optional
+
+from .api import Result, Sample, run_measurement
+from .bodyprofile import BodyProfile
+from .display import draw_line
+from .exceptions import MeasurementError
+from .formatting import display_header, select_phases
+from .globals import BODY_LABELS, BODY_METRICS
+from .output import RecordWriter, fatal_error, open_record_writer
+from .process import ProgressReporter, display_summaries, finish_display, report_sample
+from .stats import SUMMARY_STATISTICS, TimingAggregate
+from .utils import validate_url
+
+TIMELINE_POINTS_PER_LINE: int = 6
+
+
+def process_url_body(config: SimpleNamespace) -> None:
+    """
+    Process a URL by profiling its body as it streams in.
+
+    This function validates the URL specified in the configuration and displays the body timing information.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and other settings.
+    """
+    validate_url(config.url)
+    display_body_timing(config)
+
+
+def format_timeline_lines(profile: BodyProfile) -> list[str]:
+    """
+    Format the arrival timeline of a body, a few points per line.
+
+    Arguments:
+        profile (BodyProfile): The profile of the body.
+
+    Returns:
+        list[str]: The formatted lines, each point showing the time (seconds from the start of the sample) and the amount of the body received by then.
+    """
+    points: list[str] = [f"{elapsed:.6f}s {size / 1024:.1f} KB" for elapsed, size in profile.points()]
+    return [
+        ('  Timeline: ' if start == 0 else ' ' * 12) + '   '.join(points[start:start + TIMELINE_POINTS_PER_LINE])
+        for start in range(0, len(points), TIMELINE_POINTS_PER_LINE)
+    ]
+
+
+def format_body_lines(aggregate: TimingAggregate) -> list[str]:
+    """
+    Format the summary statistics of the body metrics as a table with one column per metric.
+
+    Arguments:
+        aggregate (TimingAggregate): The aggregate of the body metrics.
+
+    Returns:
+        list[str]: The formatted lines, a header line followed by one line per statistic.
+    """
+    summaries: dict[str, dict[str, float]] = {metric: aggregate.summary(metric) for metric in BODY_METRICS}
+    widths: dict[str, int] = {metric: max(len(BODY_LABELS[metric]), 10) for metric in BODY_METRICS}
+    formats: dict[str, str] = dict.fromkeys(BODY_METRICS, '.6f') | {'bytes': '.0f', 'throughput': '.3f'}
+    scales: dict[str, float] = dict.fromkeys(BODY_METRICS, 1.0) | {'throughput': 1e6}
+
+    lines: list[str] = ['  ' + 'Statistic'.ljust(10) + ''.join(f"   {BODY_LABELS[metric]:>{widths[metric]}}" for metric in BODY_METRICS)]
+    for statistic in SUMMARY_STATISTICS:
+        lines.append('  ' + statistic.ljust(10) + ''.join(
+            f"   {summaries[metric][statistic] / scales[metric]:>{widths[metric]}{formats[metric]}}" for metric in BODY_METRICS
+        ))
+    return lines
+
+
+def display_body_timing(config: SimpleNamespace) -> None:
+    """
+    Display timing information for the URL, profiling its body as it streams in.
+
+    A line is displayed for each sample (or periodic summary lines for long runs, see ProgressReporter) showing the
+    size of the body and the throughput, followed by its timeline with --timeline. The summary statistics of the timing
+    phases and of the body metrics are displayed at the end (and for long runs the timeline of the last sample). With
+    a machine-readable output format the body metrics are added to the record of each sample and summary records are
+    written for the body metrics.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing settings such as the URL, timeline size and sample count.
+
+    Exits:
+        If the first sample fails, displays an error message and exits the program.
+    """
+    display_header(config, f"Body profile for {config.url}")
+
+    phases: tuple[str, ...] = select_phases(config)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    reporter: ProgressReporter = ProgressReporter(config, phases)
+    last: list[BodyProfile] = []
+
+    def on_sample(sample: Sample) -> None:
+        report_sample(config.url, writer, reporter, sample)
+        if sample.profile is not None and sample.timings is not None and config.timeline_size:
+            last[:] = [sample.profile]
+            if writer is None and reporter.per_sample_lines:
+                for line in format_timeline_lines(sample.profile):
+                    print(line)
+
+    try:
+        result: Result = run_measurement(config, on_sample)
+    except MeasurementError as err:
+        fatal_error(writer, f"{config.url} could not be reached - aborting ({err})")
+
+    if writer is not None:
+        writer.summary(config.url, result.aggregate)
+        if result.body is not None:
+            writer.summary(config.url, result.body, 'body')
+        writer.finish()
+        return
+
+    finish_display(config, reporter, result)
+    if last and not reporter.per_sample_lines:
+        print("  Timeline of the last sample")
+        for line in format_timeline_lines(last[0]):
+            print(line)
+        print(draw_line(width=config.screen_width))
+    display_summaries(config, result.aggregates, phases)
+    if result.body is not None:
+        print(f"  Body: {result.body.count} samples")
+        for line in format_body_lines(result.body):
+            print(line)
+        print(draw_line(width=config.screen_width))
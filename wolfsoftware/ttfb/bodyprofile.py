@@ -0,0 +1,127 @@
+"""
+This module provides the body profile recorded by the native engine for the body mode of the URL timing analysis program.
+
+The other modes only need the time to first byte and the total time, so the native engine reads the body in
+blocks and discards it. In body mode a BodyProfile is attached to the connection (see engine.HttpConnection)
+and the arrival of each block is recorded in it, from which the size of the body, the throughput and the
+time to each of BODY_THRESHOLDS are reported.
+
+Classes:
+- BodyProfile: The size and arrival times of a response body, recorded as it is read.
+
+Modules:
+- globals: Imports BODY_THRESHOLDS, the body sizes the time to is reported.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from .globals import BODY_THRESHOLDS
+
+
+class BodyProfile:  # pylint: disable=too-many-instance-attributes
+    """
+    The size and arrival times of a response body, recorded (as perf_counter_ns values) as the native engine reads it.
+
+    The body itself is never kept, only its size, the time the first byte of the response (its status line) was
+    received, the time of the first and last blocks of the body, the time it first
+    reached each of BODY_THRESHOLDS and, when timeline_size is set, a timeline of at most timeline_size points
+    (the time and the number of bytes received so far). When the timeline fills up every other point is
+    dropped and points are recorded half as often, so it always covers the whole body at a coarser resolution
+    and memory use stays constant however large the body is.
+    """
+
+    __slots__ = ('started', 'responded', 'bytes', 'first', 'last', 'reached', 'timeline', 'timeline_size', '_stride', '_skipped')
+
+    def __init__(self, timeline_size: int = 0) -> None:
+        """
+        Initialise an empty profile.
+
+        Arguments:
+            timeline_size (int): The most points to keep in the timeline, or 0 for no timeline.
+        """
+        self.timeline_size: int = timeline_size
+        self.started: int = 0
+        self.responded: int = 0
+        self.bytes: int = 0
+        self.first: int = 0
+        self.last: int = 0
+        self.reached: dict[str, int] = {}
+        self.timeline: list[tuple[int, int]] = []
+        self._stride: int = 1
+        self._skipped: int = 0
+
+    def reset(self, started: int) -> None:
+        """
+        Clear the profile for a new response, such as the next hop of a redirect chain.
+
+        Arguments:
+            started (int): The start of the sample (as a perf_counter_ns value), which the times are reported from.
+        """
+        self.started = started
+        self.responded = self.bytes = self.first = self.last = 0
+        self.reached.clear()
+        self.timeline.clear()
+        self._stride = 1
+        self._skipped = 0
+
+    def add(self, size: int, now: int) -> None:
+        """
+        Record the arrival of a block of the body.
+
+        Arguments:
+            size (int): The number of bytes in the block.
+            now (int): The time the block was read (as a perf_counter_ns value).
+        """
+        if size <= 0:
+            return
+        if not self.bytes:
+            self.first = now
+        self.bytes += size
+        self.last = now
+        if len(self.reached) < len(BODY_THRESHOLDS):
+            for metric, threshold in BODY_THRESHOLDS.items():
+                if metric not in self.reached and self.bytes >= threshold:
+                    self.reached[metric] = now
+
+        if self.timeline_size:
+            self._skipped += 1
+            if self._skipped >= self._stride:
+                self._skipped = 0
+                self.timeline.append((now, self.bytes))
+                if len(self.timeline) >= self.timeline_size:
+                    del self.timeline[1::2]
+                    self._stride *= 2
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Return the metrics of the body.
+
+        The time to each threshold is the time from the start of the sample until that many bytes (or the whole body,
+        if it is smaller) had been received, and the throughput is measured from the first byte of the response. Both
+        use the marks recorded in the profile, which after a redirect chain are those of the final response (the
+        starttransfer of the sample is then the sum over the hops, so it can not be compared with them).
+
+        Returns:
+            dict[str, float]: The number of bytes, the throughput (bytes per second, 0 if the whole body arrived with the
+                              first byte) and the time in seconds to each of BODY_THRESHOLDS.
+        """
+        starttransfer: float = (self.responded - self.started) / 1e9 if self.responded else 0.0
+        last: float = (self.last - self.started) / 1e9 if self.bytes else starttransfer
+        metrics: dict[str, float] = {
+            'bytes': float(self.bytes),
+            'throughput': self.bytes / (last - starttransfer) if last > starttransfer else 0.0,
+        }
+        for metric in BODY_THRESHOLDS:
+            metrics[metric] = (self.reached[metric] - self.started) / 1e9 if metric in self.reached else last
+        return metrics
+
+    def points(self) -> list[tuple[float, int]]:
+        """
+        Return the timeline, always ending with the last block of the body.
+
+        Returns:
+            list[tuple[float, int]]: The time (seconds from the start of the sample) and the number of bytes received by then, of each point.
+        """
+        timeline: list[tuple[int, int]] = self.timeline
+        if self.bytes and (not timeline or timeline[-1][1] != self.bytes):
+            timeline = timeline + [(self.last, self.bytes)]
+        return [((now - self.started) / 1e9, size) for now, size in timeline]
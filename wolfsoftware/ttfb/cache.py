@@ -0,0 +1,195 @@
+"""
+This module provides the on-disk caches used by the URL timing analysis program.
+
+The main purpose of this module is to remember which URLs have recently been reached successfully, so
+that repeated runs (and URL lists) against the same URLs can skip the reachability check. The cache is
+opt-in, stored as JSON in the user's cache directory and entries expire after a configurable TTL.
+
+The resolved paths of the prerequisite commands are also cached, keyed by the value of PATH, so that
+each run only has to check that the cached paths are still executable instead of searching the PATH.
+
+Classes:
+- ValidationCache: Maps each URL to the time it was last reached successfully.
+
+Functions:
+- get_cache_dir: Returns the directory the cache files are stored in.
+- write_json_file: Atomically writes a JSON cache file.
+- open_validation_cache: Returns the validation cache if it is enabled in the configuration.
+- load_command_paths: Returns the cached paths of the prerequisite commands, if they are still valid.
+- save_command_paths: Caches the paths of the prerequisite commands.
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from types import SimpleNamespace
+from typing import Optional
+
+VALIDATION_CACHE_FILE: str = 'validated-urls.json'
+COMMAND_CACHE_FILE: str = 'command-paths.json'
+
+
+def get_cache_dir() -> str:
+    """
+    Return the directory the cache files are stored in.
+
+    Uses $XDG_CACHE_HOME/ttfb if XDG_CACHE_HOME is set, otherwise ~/.cache/ttfb.
+
+    Returns:
+        str: The path of the cache directory (which may not exist yet).
+    """
+    base: str = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ttfb')
+
+
+def write_json_file(path: str, data) -> None:
+    """
+    Atomically write a JSON cache file, creating the cache directory if needed.
+
+    The data is written to a temporary file which then replaces the cache file, so concurrent runs never
+    see a partially written file. If the write fails the temporary file is removed.
+
+    Arguments:
+        path (str): The path of the cache file.
+        data: The JSON serialisable data to write.
+
+    Raises:
+        OSError: If the file cannot be written.
+        TypeError: If the data is not JSON serialisable.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='UTF-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+
+
+class ValidationCache:
+    """
+    Maps each URL to the time (seconds since the epoch) it was last reached successfully.
+
+    A URL is fresh if it was reached within the last ttl seconds. Problems reading or writing the
+    cache file are ignored, the cache simply behaves as if it were empty.
+    """
+
+    def __init__(self, path: str, ttl: float) -> None:
+        """
+        Initialise the cache and load any existing entries from disk.
+
+        Arguments:
+            path (str): The path of the cache file.
+            ttl (float): How long (in seconds) an entry remains fresh.
+        """
+        self.path: str = path
+        self.ttl: float = ttl
+        self.entries: dict[str, float] = {}
+        self._changed: bool = False
+
+        try:
+            with open(path, 'r', encoding='UTF-8') as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.entries = {url: float(timestamp) for url, timestamp in entries.items()}
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def is_fresh(self, url: str) -> bool:
+        """
+        Return whether the URL was reached successfully within the TTL.
+
+        Arguments:
+            url (str): The URL to check.
+
+        Returns:
+            bool: True if the URL was reached within the TTL.
+        """
+        timestamp: Optional[float] = self.entries.get(url)
+        return timestamp is not None and time.time() - timestamp < self.ttl
+
+    def record(self, url: str) -> None:
+        """
+        Record that the URL has just been reached successfully.
+
+        Arguments:
+            url (str): The URL that was reached.
+        """
+        self.entries[url] = time.time()
+        self._changed = True
+
+    def save(self) -> None:
+        """Write the cache back to disk (if it has changed), dropping any expired entries."""
+        if not self._changed:
+            return
+
+        now: float = time.time()
+        entries: dict[str, float] = {url: timestamp for url, timestamp in self.entries.items() if now - timestamp < self.ttl}
+        try:
+            write_json_file(self.path, entries)
+            self._changed = False
+        except OSError:
+            pass
+
+
+def open_validation_cache(config: SimpleNamespace) -> Optional[ValidationCache]:
+    """
+    Return the validation cache if it is enabled in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the validation cache settings.
+
+    Returns:
+        Optional[ValidationCache]: The validation cache, or None if it is not enabled.
+    """
+    if not config.validation_cache:
+        return None
+    return ValidationCache(os.path.join(get_cache_dir(), VALIDATION_CACHE_FILE), config.validation_ttl)
+
+
+def load_command_paths(commands: list[str]) -> Optional[dict[str, str]]:
+    """
+    Return the cached paths of the prerequisite commands, if they are still valid.
+
+    The cached paths are only used if they were resolved with the current value of PATH and every one of
+    them is still an executable file.
+
+    Arguments:
+        commands (list[str]): The names of the prerequisite commands.
+
+    Returns:
+        Optional[dict[str, str]]: The path of each command, or None if the cache is missing or stale.
+    """
+    try:
+        with open(os.path.join(get_cache_dir(), COMMAND_CACHE_FILE), 'r', encoding='UTF-8') as f:
+            cached = json.load(f)
+        paths: dict[str, str] = {command: str(cached['commands'][command]) for command in commands}
+        if cached['path'] != os.environ.get('PATH', ''):
+            return None
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+    if all(os.path.isfile(path) and os.access(path, os.X_OK) for path in paths.values()):
+        return paths
+    return None
+
+
+def save_command_paths(paths: dict[str, str]) -> None:
+    """
+    Cache the paths of the prerequisite commands for the current value of PATH.
+
+    Problems writing the cache file are ignored.
+
+    Arguments:
+        paths (dict[str, str]): The path of each command.
+    """
+    try:
+        write_json_file(os.path.join(get_cache_dir(), COMMAND_CACHE_FILE), {'path': os.environ.get('PATH', ''), 'commands': paths})
+    except OSError:
+        pass
@@ -0,0 +1,113 @@
+"""
+This module handles the cache-split mode of the URL timing analysis program.
+
+The other modes ask caches to revalidate every response (Cache-Control: no-cache), which many CDNs ignore,
+so a run may have measured edge hits, origin fetches or a mix of both without saying which. In cache-split
+mode the samples alternate between a warm series, which requests the URL as it is and lets the CDN serve it
+from the edge, and a cache-busting series, which adds a unique token to the query string of every request so
+no cache can have the response. Each sample is classified by the cache status headers of its response (such
+as X-Cache, CF-Cache-Status, Cache-Status and Age), and the timings of the hits and of the misses are reported
+separately, giving both the edge performance and the cost of going to the origin in a single run.
+
+Functions:
+- process_url_cache_split: Validates the URL and runs the cache-split mode.
+- format_series_lines: Formats the number of samples of each cache status in each series as a table.
+- display_cache_split_timing: Measures the URL with and without cache-busting and displays the results.
+
+Modules:
+- api: Imports Result for the type of the result.
+- display: Imports draw_line to draw formatted lines.
+- formatting: Imports the formatting functions shared with the other modes.
+- output: Imports open_record_writer for the machine-readable output formats.
+- process: Imports measure_reported to run the mode, and the display functions shared with the other modes.
+- utils: Imports utility functions like validate_url.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+from typing import Optional
+
+from .api import Result
+from .display import draw_line
+from .formatting import display_header, select_phases
+from .globals import CACHE_SERIES
+from .output import RecordWriter, open_record_writer
+from .process import ProgressReporter, display_summaries, finish_display, measure_reported
+from .utils import validate_url
+
+SERIES_TITLES: dict[str, str] = {
+    'warm': 'Warm',
+    'busted': 'Cache-busting',
+}
+CACHE_STATUSES: tuple[str, ...] = ('hit', 'miss', 'unknown')
+
+
+def process_url_cache_split(config: SimpleNamespace) -> None:
+    """
+    Process a URL by timing its cache hits and misses separately.
+
+    This function validates the URL specified in the configuration and displays the cache-split timing information.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and other settings.
+    """
+    validate_url(config.url)
+    display_cache_split_timing(config)
+
+
+def format_series_lines(details: dict[str, float]) -> list[str]:
+    """
+    Format the number of samples of each cache status in each series as a table, one line per series.
+
+    Arguments:
+        details (dict[str, float]): The details of the result, holding the number of samples of each cache status in
+                                    each series (such as warm_hit and busted_miss).
+
+    Returns:
+        list[str]: The formatted lines, a header line followed by one line per series.
+    """
+    lines: list[str] = [f"  {'Series':<13}   {'Samples':>7}   {'Hits':>7}   {'Misses':>7}   {'Unknown':>7}"]
+    for series in CACHE_SERIES:
+        counts: list[int] = [int(details.get(f"{series}_{status}", 0)) for status in CACHE_STATUSES]
+        lines.append(f"  {SERIES_TITLES[series]:<13}   {sum(counts):>7}" + ''.join(f"   {count:>7}" for count in counts))
+    return lines
+
+
+def display_cache_split_timing(config: SimpleNamespace) -> None:
+    """
+    Display timing information for the URL with and without cache-busting, with cache hits and misses reported separately.
+
+    A line is displayed for each sample (or periodic summary lines for long runs, see ProgressReporter) showing its cache
+    status, followed by the number of hits and misses in each series, the origin cost (the median TTFB of the misses less
+    that of the hits) and the summary statistics of the hits, the misses and the samples without a cache status. With a
+    machine-readable output format a record is written for each sample and the summary records of each cache status.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing settings such as the URL and sample count.
+
+    Exits:
+        If the first sample fails, displays an error message and exits the program.
+    """
+    display_header(config, f"Results for {config.url} (cache hits and misses)")
+
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    reporter: ProgressReporter = ProgressReporter(config, select_phases(config))
+    result: Result = measure_reported(config, writer, reporter)
+
+    if writer is None:
+        finish_display(config, reporter, result)
+        for line in format_series_lines(result.details):
+            print(line)
+        if 'origin_cost' in result.details:
+            print(f"  Origin Cost (p50 TTFB of the misses less the hits): {result.details['origin_cost']:.6f}")
+        if result.details.get('busted_hit'):
+            print("  Some cache-busting samples were cache hits, the cache key may ignore the query string")
+        if set(result.aggregates) == {'unknown'}:
+            print("  No cache status headers were found, the cache hits and misses can not be told apart")
+        print(draw_line(width=config.screen_width))
+        display_summaries(config, result.aggregates, reporter.phases)
+        return
+
+    for kind, aggregate in result.aggregates.items():
+        writer.summary(config.url, aggregate, kind)
+    writer.finish()
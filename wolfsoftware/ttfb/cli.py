@@ -5,37 +5,106 @@ This program checks for the presence of required command-line tools, parses comm
 arguments, validates a given URL, and measures the timing metrics for the URL using curl.
 The timing results are displayed based on the specified configuration options.
 
+Only the modules needed for the selected mode are imported, the version is only looked up for --version
+and the curl path is only checked when the curl engine is used, so that short runs start quickly.
+
 Modules and Functions:
+- VersionAction: Displays the version, looking it up only when --version is given.
 - check_int_range: Validates that an integer value is within a specified range.
+- check_positive_int: Validates that an integer value is greater than zero.
+- check_percentage: Validates a percentage (such as 5% or 0.05) and converts it to a fraction.
+- check_port: Validates a TCP port number.
 - setup_arg_parser: Sets up the command-line argument parser with necessary arguments and options.
+- setup_serve_arg_parser: Sets up the argument parser for the monitor (ttfb serve).
+- setup_history_arg_parser: Sets up the argument parser for the history queries (ttfb history and ttfb trend).
+- setup_compare_arg_parser: Sets up the argument parser for the A/B comparison (ttfb compare).
 - process_arguments: Processes and validates the command-line arguments.
+- check_mode_options: Checks that the options which only apply to some modes are not combined with the other modes.
 - run: Main function to execute the program, coordinating all necessary steps.
+- run_mode: Runs the mode selected in the configuration.
+- finish_trace: Writes the trace file and displays the summary of the spans recorded with --trace.
+- run_serve: Runs the monitor (ttfb serve) which keeps probing a set of URLs and serves a /metrics endpoint.
+- run_history: Runs a query (ttfb history or ttfb trend) over the samples saved in the history store.
+- run_compare: Runs the A/B comparison (ttfb compare) of two URLs.
 - create_configuration_from_arguments: Creates a configuration object from the parsed arguments.
 - process_url: Validates the URL and performs the timing analysis.
+- process_url_list: Performs the timing analysis for a list of URLs concurrently.
+- process_url_at_rate: Performs the timing analysis for the URL at a fixed request rate.
+- process_url_per_address: Performs the timing analysis for every address of the URL's host.
+- process_url_redirects: Performs the timing analysis for each hop of the URL's redirect chain.
+- process_url_body: Performs the timing analysis of the URL's body as it streams in.
+- process_url_cache_split: Performs the timing analysis of the URL's cache hits and misses separately.
 - display_timing: Displays detailed timing results for the URL.
 - display_results: Displays the results header and configuration information.
 - check_prerequisite: Checks for the presence of required command-line tools.
+- check_duration: Validates a duration (such as 90s, 10m or 1h) and converts it to seconds, see utils.py.
+- check_rate: Validates a request rate (such as 50/s or 600/m) and converts it to requests per second, see utils.py.
 - validate_url: Validates that the URL is properly formed and reachable.
+- start_tracing: Starts recording the spans of the program's stages for --trace.
+- span: Records a span of a stage of the program while tracing is on.
 """
 # pylint: disable=relative-beyond-top-level
 
 import argparse
 import sys
+import time
 
 from types import SimpleNamespace
+from typing import Optional
+
+from .config import create_compare_configuration, create_configuration_from_arguments, create_history_configuration, create_monitor_configuration
+from .display import draw_line, error_message
+from .globals import (
+    ARG_PARSER_DESCRIPTION, ARG_PARSER_EPILOG, ARG_PARSER_PROG_NAME, COMPARE_ORDERS, DEFAULT_COMPARE_COUNT, DEFAULT_COMPARE_THRESHOLD,
+    DEFAULT_METRICS_PORT, DEFAULT_MONITOR_INTERVAL, DEFAULT_RING_SIZE, DEFAULT_TIMELINE_SIZE,
+    DEFAULT_MAX_SAMPLES, DEFAULT_SUMMARY_INTERVAL, DEFAULT_TREND_PERIOD, DEFAULT_TREND_WINDOW, DEFAULT_VALIDATION_TTL, ENGINES, MAX_COUNT,
+    OUTPUT_FORMATS, PER_SAMPLE_LINE_LIMIT, PRECISION_STATISTICS, TIMING_PHASES, get_version_string
+)
+from .tracing import Tracer, format_trace_summary, span, start_tracing, stop_tracing, write_trace
+from .utils import check_duration, check_prereqs, check_rate
+
 
-from .config import create_configuration_from_arguments
-from .globals import ARG_PARSER_DESCRIPTION, ARG_PARSER_EPILOG, ARG_PARSER_PROG_NAME, VERSION_STRING
-from .process import process_url
-from .utils import check_prereqs
+class VersionAction(argparse.Action):
+    """
+    Display the version and exit, like the built-in version action.
+
+    The built-in action needs the version string when the parser is set up, which would mean looking up
+    the version on every run, this action only looks it up when --version is given.
+    """
+
+    def __init__(self, option_strings: list[str], dest: str = argparse.SUPPRESS, default: str = argparse.SUPPRESS,
+                 help: Optional[str] = None) -> None:  # pylint: disable=redefined-builtin
+        """
+        Initialise the action.
+
+        Arguments:
+            option_strings (list[str]): The option strings of the argument.
+            dest (str): The attribute name (unused).
+            default (str): The default value (unused).
+            help (Optional[str]): The help text of the argument.
+        """
+        super().__init__(option_strings=option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser: argparse.ArgumentParser, namespace: argparse.Namespace, values, option_string=None) -> None:
+        """
+        Display the version and exit.
+
+        Arguments:
+            parser (argparse.ArgumentParser): The argument parser.
+            namespace (argparse.Namespace): The parsed arguments (unused).
+            values: The argument values (unused).
+            option_string (str): The option string that was used (unused).
+        """
+        print(get_version_string())
+        parser.exit()
 
 
 def check_int_range(value) -> int:
     """
-    Validate that an integer value is within the specified range (1 to 25).
+    Validate that an integer value is within the specified range (1 to MAX_COUNT).
 
     This function attempts to convert the input value to an integer and checks if it
-    falls within the range of 1 to 25, inclusive. If the value is not an integer or
+    falls within the range of 1 to MAX_COUNT, inclusive. If the value is not an integer or
     is outside the specified range, it raises an `argparse.ArgumentTypeError`.
 
     Arguments:
@@ -46,14 +115,85 @@ def check_int_range(value) -> int:
 
     Raises:
         argparse.ArgumentTypeError: If the input value is not a valid integer.
-        argparse.ArgumentTypeError: If the integer value is not within the range 1 to 25.
+        argparse.ArgumentTypeError: If the integer value is not within the range 1 to MAX_COUNT.
+    """
+    try:
+        ivalue = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid integer value: {value}") from exc
+    if ivalue < 1 or ivalue > MAX_COUNT:
+        raise argparse.ArgumentTypeError(f"Integer value must be between 1 and {MAX_COUNT}: {value}")
+    return ivalue
+
+
+def check_positive_int(value) -> int:
+    """
+    Validate that an integer value is greater than zero.
+
+    Arguments:
+        value (str): The input value to be validated.
+
+    Returns:
+        int: The validated integer value.
+
+    Raises:
+        argparse.ArgumentTypeError: If the input value is not a valid integer.
+        argparse.ArgumentTypeError: If the integer value is less than 1.
+    """
+    try:
+        ivalue = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid integer value: {value}") from exc
+    if ivalue < 1:
+        raise argparse.ArgumentTypeError(f"Integer value must be greater than 0: {value}")
+    return ivalue
+
+
+def check_percentage(value) -> float:
+    """
+    Validate a percentage (such as a target precision or a threshold) and convert it to a fraction.
+
+    The percentage is given with a % sign (such as 5%) or as a fraction (such as 0.05) and must be greater than 0 and less than 100%.
+
+    Arguments:
+        value (str): The input value to be validated.
+
+    Returns:
+        float: The percentage as a fraction.
+
+    Raises:
+        argparse.ArgumentTypeError: If the input value is not a valid percentage.
+        argparse.ArgumentTypeError: If the percentage is not greater than 0 and less than 100%.
+    """
+    try:
+        fraction = float(value[:-1]) / 100 if value.endswith('%') else float(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid percentage: {value}") from exc
+    if not 0 < fraction < 1:
+        raise argparse.ArgumentTypeError(f"Percentage must be greater than 0 and less than 100%: {value}")
+    return fraction
+
+
+def check_port(value) -> int:
+    """
+    Validate a TCP port number.
+
+    Arguments:
+        value (str): The input value to be validated.
+
+    Returns:
+        int: The validated port number.
+
+    Raises:
+        argparse.ArgumentTypeError: If the input value is not a valid integer.
+        argparse.ArgumentTypeError: If the port is not between 1 and 65535.
     """
     try:
         ivalue = int(value)
     except ValueError as exc:
         raise argparse.ArgumentTypeError(f"Invalid integer value: {value}") from exc
-    if ivalue < 1 or ivalue > 25:
-        raise argparse.ArgumentTypeError(f"Integer value must be between 1 and 25: {value}")
+    if ivalue < 1 or ivalue > 65535:
+        raise argparse.ArgumentTypeError(f"Port must be between 1 and 65535: {value}")
     return ivalue
 
 
@@ -81,20 +221,215 @@ def setup_arg_parser() -> argparse.ArgumentParser:
     flags.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="show this help message and exit")
     flags.add_argument("-d", "--debug", action="store_true", default=False, help="Very noisy")
     flags.add_argument("-v", "--verbose", action="store_true", default=False, help="Verbose output - show scan results as they come in")
-    flags.add_argument('-V', '--version', action="version", version=VERSION_STRING, help="Show program's version number and exit.")
+    flags.add_argument('-V', '--version', action=VersionAction, help="Show program's version number and exit.")
+
+    exclusive_flags_group: argparse._MutuallyExclusiveGroup = exclusive_flags.add_mutually_exclusive_group(required=False)
+    exclusive_flags_group.add_argument('-m', '--minimal', action="store_true", default=False, help="Show minimal set of timing values.")
+    exclusive_flags_group.add_argument('-f', '--full', action="store_true", default=False, help="Show full set of timing values.")
+
+    count_group: argparse._MutuallyExclusiveGroup = optional.add_mutually_exclusive_group(required=False)
+    count_group.add_argument("-c", "--count", type=check_int_range, default=1, help=f"How many times to test [1-{MAX_COUNT}]")
+    count_group.add_argument("--duration", type=check_duration, default=None, help="How long to test for instead of a count (e.g. 90s, 10m, 1h)")
+    optional.add_argument("--target-precision", type=check_percentage, default=None,
+                          help="Keep sampling (instead of --count times) until the 95%% confidence interval of the TTFB percentile is "
+                               "within this much of it (e.g. 5%% or 0.05), --duration is then the time budget")
+    optional.add_argument("--target-statistic", type=str, choices=PRECISION_STATISTICS, default=PRECISION_STATISTICS[0],
+                          help="The TTFB percentile that --target-precision applies to")
+    optional.add_argument("--max-samples", type=check_int_range, default=DEFAULT_MAX_SAMPLES,
+                          help="The most samples to take with --target-precision if the precision is not reached")
+    optional.add_argument("--summary-interval", type=check_duration, default=DEFAULT_SUMMARY_INTERVAL,
+                          help=f"Seconds between summary lines for runs of more than {PER_SAMPLE_LINE_LIMIT} samples or with --duration")
+    optional.add_argument("-e", "--engine", type=str, choices=ENGINES, default=ENGINES[0],
+                          help="The timing engine to use (curl is the reference engine, native measures in-process)")
+    optional.add_argument("-o", "--output", type=str, choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS[0],
+                          help="The output format (json, jsonl and csv write a record per sample and summary, prom writes the summary as metrics)")
+    optional.add_argument("--no-batch", action="store_true", default=False,
+                          help="Run a separate curl process for every sample instead of batching up to 100 samples per process (curl caches DNS "
+                               "within a process, so when batched only the first sample of each batch includes a DNS lookup)")
+    mode_group: argparse._MutuallyExclusiveGroup = optional.add_mutually_exclusive_group(required=False)
+    mode_group.add_argument("--keep-alive", action="store_true", default=False,
+                            help="Reuse persistent connections and report cold, resumed and warm timings separately (uses the native engine)")
+    mode_group.add_argument("--rate", type=check_rate, default=None,
+                            help="Send requests on a fixed schedule (e.g. 50 or 50/s or 600/m) and measure from the scheduled send time")
+    mode_group.add_argument("--per-address", action="store_true", default=False,
+                            help="Test every address the host resolves to in parallel and report each address separately")
+    mode_group.add_argument("--redirects", action="store_true", default=False,
+                            help="Report the status, target and timings of each hop of the redirect chain separately (uses the native engine)")
+    mode_group.add_argument("--body", action="store_true", default=False,
+                            help="Profile the body as it is read and report its size, throughput and time to the first 1 KB, 14 KB and 100 KB "
+                                 "(uses the native engine)")
+    mode_group.add_argument("--cache-split", action="store_true", default=False,
+                            help="Alternate between the URL as it is and with a unique cache-busting token, and report cache hits and misses "
+                                 "separately (uses the native engine)")
+    optional.add_argument("--timeline", action="store_true", default=False,
+                          help=f"With --body, show a compact timeline (at most {DEFAULT_TIMELINE_SIZE} points) of when the body arrived")
+    optional.add_argument("--cache-redirect", action="store_true", default=False,
+                          help="With --redirects, follow the redirect chain once, then measure the final target directly and report the "
+                               "redirect overhead separately")
+    optional.add_argument("--max-in-flight", type=check_positive_int, default=64, help="How many requests can be in flight at once with --rate")
+    optional.add_argument("--pool-size", type=check_positive_int, default=1, help="How many persistent connections to use with --keep-alive")
+    optional.add_argument("--validation-cache", action="store_true", default=False,
+                          help="Skip the reachability check for URLs that were reached successfully within the validation TTL")
+    optional.add_argument("--validation-ttl", type=check_duration, default=DEFAULT_VALIDATION_TTL,
+                          help="How long (in seconds, or e.g. 30m, 1h) a successfully reached URL stays in the validation cache")
+    optional.add_argument("--pin-dns", action="store_true", default=False,
+                          help="Resolve each host once and pin every sample to the resolved addresses (like curl --resolve)")
+    optional.add_argument("--dns-ttl", type=check_duration, default=None,
+                          help="Pin samples to the resolved addresses but resolve each host again after this long (e.g. 30s, 5m)")
+    optional.add_argument("--concurrency", type=check_positive_int, default=10, help="How many URLs to test at once when using --url-file")
+    optional.add_argument("--per-host", type=check_positive_int, default=4, help="How many URLs on the same host to test at once when using --url-file")
+    optional.add_argument("--workers", type=check_positive_int, default=1,
+                          help="How many processes to shard the URLs across when using --url-file (each with its own --concurrency)")
+    optional.add_argument("--history", action="store_true", default=False,
+                          help="Save every sample in the history store (see ttfb history and ttfb trend)")
+    optional.add_argument("--history-dir", type=str, default=None,
+                          help="The directory of the history store, if not $XDG_DATA_HOME/ttfb/history (or ~/.local/share/ttfb/history)")
+    optional.add_argument("--trace", type=str, default=None,
+                          help="Record how long each stage of the program takes, write the spans to this file in the Chrome trace "
+                               "event format and show the tool overhead")
+
+    required_group: argparse._MutuallyExclusiveGroup = required.add_mutually_exclusive_group(required=True)
+    required_group.add_argument("-u", "--url", type=str, help="The URL to test")
+    required_group.add_argument("--url-file", type=str, help="A file containing the URLs to test, one per line ('-' for stdin)")
+
+    return parser
+
+
+def setup_serve_arg_parser() -> argparse.ArgumentParser:
+    """
+    Set up and return the argument parser for the monitor (ttfb serve).
+
+    Returns:
+        argparse.ArgumentParser: The configured argument parser.
+    """
+    parser = argparse.ArgumentParser(prog=f"{ARG_PARSER_PROG_NAME} serve",
+                                     add_help=False,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description="Keep probing a set of URLs and serve the results on a /metrics endpoint.")
+
+    flags: argparse._ArgumentGroup = parser.add_argument_group(title='flags')
+    optional: argparse._ArgumentGroup = parser.add_argument_group(title='optional')
+    required: argparse._ArgumentGroup = parser.add_argument_group(title='required (one or both)')
+
+    flags.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="show this help message and exit")
+    flags.add_argument("-d", "--debug", action="store_true", default=False, help="Very noisy")
+    flags.add_argument("-v", "--verbose", action="store_true", default=False, help="Verbose output - show every probe as it completes")
+
+    optional.add_argument("--interval", type=check_duration, default=DEFAULT_MONITOR_INTERVAL,
+                          help="How long (in seconds, or e.g. 30s, 5m) to wait between probes of targets without their own interval")
+    optional.add_argument("--ring-size", type=check_positive_int, default=DEFAULT_RING_SIZE,
+                          help="How many recent probes of each target to keep for the recent quantiles")
+    optional.add_argument("--concurrency", type=check_positive_int, default=32, help="How many probes can run at once")
+    optional.add_argument("--pin-dns", action="store_true", default=False,
+                          help="Resolve each host once and pin every probe to the resolved addresses (like curl --resolve)")
+    optional.add_argument("--dns-ttl", type=check_duration, default=None,
+                          help="Pin probes to the resolved addresses but resolve each host again after this long (e.g. 30s, 5m)")
+    optional.add_argument("--bind", type=str, default="127.0.0.1", help="The address to serve the /metrics endpoint on")
+    optional.add_argument("--port", type=check_port, default=DEFAULT_METRICS_PORT, help="The port to serve the /metrics endpoint on")
+
+    required.add_argument("-u", "--url", type=str, action="append", help="A URL to monitor (can be given more than once)")
+    required.add_argument("--target-file", type=str,
+                          help="A file containing the URLs to monitor, one per line, each optionally followed by its own interval")
+
+    return parser
+
+
+def setup_history_arg_parser(command: str) -> argparse.ArgumentParser:
+    """
+    Set up and return the argument parser for the history queries (ttfb history and ttfb trend).
+
+    Arguments:
+        command (str): The query, history or trend.
+
+    Returns:
+        argparse.ArgumentParser: The configured argument parser.
+    """
+    descriptions: dict[str, str] = {
+        'history': "List the URLs in the history store, or show the summary statistics of a URL over a time window.",
+        'trend': "Show the percentiles of a timing value of a URL for each period of a time window.",
+    }
+    parser = argparse.ArgumentParser(prog=f"{ARG_PARSER_PROG_NAME} {command}",
+                                     add_help=False,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description=descriptions[command])
+
+    flags: argparse._ArgumentGroup = parser.add_argument_group(title='flags')
+    optional: argparse._ArgumentGroup = parser.add_argument_group(title='optional')
+
+    flags.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="show this help message and exit")
+    if command == 'history':
+        exclusive_flags_group: argparse._MutuallyExclusiveGroup = parser.add_argument_group(title='exclusive flags').add_mutually_exclusive_group()
+        exclusive_flags_group.add_argument('-m', '--minimal', action="store_true", default=False, help="Show minimal set of timing values.")
+        exclusive_flags_group.add_argument('-f', '--full', action="store_true", default=False, help="Show full set of timing values.")
+        optional.add_argument("-u", "--url", type=str, help="The URL to show the summary statistics of (all the URLs are listed without it)")
+        optional.add_argument("--since", type=check_duration, default=None, help="Only include samples from this long ago onwards (e.g. 12h, 7d)")
+        parser.set_defaults(bucket=DEFAULT_TREND_PERIOD, phase='starttransfer')
+    else:
+        optional.add_argument("--since", type=check_duration, default=DEFAULT_TREND_WINDOW,
+                              help="Only include samples from this long ago onwards (in seconds, or e.g. 12h, 7d)")
+        optional.add_argument("--bucket", type=check_duration, default=DEFAULT_TREND_PERIOD,
+                              help="How long each period is (in seconds, or e.g. 1h, 1d)")
+        optional.add_argument("--phase", type=str, choices=TIMING_PHASES, default='starttransfer', help="The timing value to show")
+        parser.set_defaults(minimal=False, full=False)
+    optional.add_argument("--until", type=check_duration, default=None, help="Only include samples from before this long ago (e.g. 1h, 1d)")
+    optional.add_argument("--history-dir", type=str, default=None,
+                          help="The directory of the history store, if not $XDG_DATA_HOME/ttfb/history (or ~/.local/share/ttfb/history)")
+    if command == 'trend':
+        parser.add_argument_group(title='required').add_argument("-u", "--url", type=str, required=True, help="The URL to show the trend of")
+
+    return parser
+
+
+def setup_compare_arg_parser() -> argparse.ArgumentParser:
+    """
+    Set up and return the argument parser for the A/B comparison (ttfb compare).
+
+    Returns:
+        argparse.ArgumentParser: The configured argument parser.
+    """
+    parser = argparse.ArgumentParser(prog=f"{ARG_PARSER_PROG_NAME} compare",
+                                     add_help=False,
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                     description="Measure two URLs interleaved and report whether B is significantly slower than A.")
+
+    flags: argparse._ArgumentGroup = parser.add_argument_group(title='flags')
+    exclusive_flags: argparse._ArgumentGroup = parser.add_argument_group(title='exclusive flags')
+    optional: argparse._ArgumentGroup = parser.add_argument_group(title='optional')
+    required: argparse._ArgumentGroup = parser.add_argument_group(title='required')
+
+    flags.add_argument("-h", "--help", action="help", default=argparse.SUPPRESS, help="show this help message and exit")
+    flags.add_argument("-d", "--debug", action="store_true", default=False, help="Very noisy")
+    flags.add_argument("-v", "--verbose", action="store_true", default=False, help="Verbose output - show every sample as it comes in")
 
     exclusive_flags_group: argparse._MutuallyExclusiveGroup = exclusive_flags.add_mutually_exclusive_group(required=False)
     exclusive_flags_group.add_argument('-m', '--minimal', action="store_true", default=False, help="Show minimal set of timing values.")
     exclusive_flags_group.add_argument('-f', '--full', action="store_true", default=False, help="Show full set of timing values.")
 
-    optional.add_argument("-c", "--count", type=check_int_range, default=1, help="How many times to test [1-25]")
+    count_group: argparse._MutuallyExclusiveGroup = optional.add_mutually_exclusive_group(required=False)
+    count_group.add_argument("-c", "--count", type=check_int_range, default=DEFAULT_COMPARE_COUNT, help=f"How many pairs of samples to take [1-{MAX_COUNT}]")
+    count_group.add_argument("--duration", type=check_duration, default=None,
+                             help="How long to keep taking pairs of samples for instead of a count (e.g. 90s, 10m)")
+    optional.add_argument("-e", "--engine", type=str, choices=ENGINES, default=ENGINES[0],
+                          help="The timing engine to use (curl is the reference engine, native measures in-process)")
+    optional.add_argument("--order", type=str, choices=COMPARE_ORDERS, default=COMPARE_ORDERS[0],
+                          help="Measure each pair A then B and B then A in turn (abba) or in a random order (random)")
+    optional.add_argument("--seed", type=int, default=None, help="The seed of the random order and the bootstrap resamples, for repeatable results")
+    optional.add_argument("--threshold", type=check_percentage, default=DEFAULT_COMPARE_THRESHOLD,
+                          help="How much slower (e.g. 5%% or 0.05) B has to be than A to be a regression")
+    optional.add_argument("--gate-phase", type=str, choices=TIMING_PHASES, default='starttransfer',
+                          help="The timing value that decides whether B has regressed")
+    optional.add_argument("--pin-dns", action="store_true", default=False,
+                          help="Resolve each host once and pin every sample to the resolved addresses (like curl --resolve)")
+    optional.add_argument("--dns-ttl", type=check_duration, default=None,
+                          help="Pin samples to the resolved addresses but resolve each host again after this long (e.g. 30s, 5m)")
 
-    required.add_argument("-u", "--url", type=str, required=True, help="The URL to test")
+    required.add_argument("url_a", type=str, metavar="URL_A", help="The baseline URL (A)")
+    required.add_argument("url_b", type=str, metavar="URL_B", help="The candidate URL (B)")
 
     return parser
 
 
-def process_arguments(parser: argparse.ArgumentParser) -> argparse.Namespace:
+def process_arguments(parser: argparse.ArgumentParser, argv: Optional[list[str]] = None) -> argparse.Namespace:
     """
     Process the command line arguments.
 
@@ -103,36 +438,211 @@ def process_arguments(parser: argparse.ArgumentParser) -> argparse.Namespace:
 
     Arguments:
         parser (argparse.ArgumentParser): The argument parser configured with the necessary arguments and options.
+        argv (Optional[list[str]]): The arguments to parse, or None to use sys.argv.
 
     Returns:
         argparse.Namespace: The parsed command line arguments.
     """
-    args: argparse.Namespace = parser.parse_args()
+    args: argparse.Namespace = parser.parse_args(argv)
 
     return args
 
 
+def check_mode_options(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """
+    Check that the options which only apply to some modes are not combined with the other modes.
+
+    Arguments:
+        parser (argparse.ArgumentParser): The argument parser, used to report the error.
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Exits:
+        If an option is used with a mode it does not apply to, displays the usage and an error message and exits the program.
+    """
+    if args.url_file and any((args.keep_alive, args.rate, args.per_address, args.redirects, args.body, args.cache_split)):
+        parser.error("--url-file can not be used with --keep-alive, --rate, --per-address, --redirects, --body or --cache-split")
+    if args.rate and args.duration is None and args.count < 2:
+        parser.error("--rate needs a --count of at least 2 or a --duration, a single request has no rate")
+    if args.target_precision and (args.rate or args.per_address):
+        parser.error("--target-precision can not be used with --rate or --per-address")
+    if args.cache_redirect and not args.redirects:
+        parser.error("--cache-redirect can only be used with --redirects")
+    if args.timeline and not args.body:
+        parser.error("--timeline can only be used with --body")
+    if args.trace and args.workers > 1:
+        parser.error("--trace can not be used with --workers, the worker processes are not traced")
+
+
 def run() -> None:
     """
     Master controller function.
 
     This function performs the following steps:
-    1. Checks prerequisites and obtains command paths.
-    2. Sets up the argument parser.
-    3. Processes command-line arguments.
+    1. Sets up the argument parser.
+    2. Processes command-line arguments.
+    3. Checks prerequisites and obtains command paths (only when the curl engine is used).
     4. Creates a configuration from the processed arguments.
-    5. Processes a URL based on the created configuration.
+    5. Processes a URL (or a list of URLs) based on the created configuration (see run_mode).
+    6. With --trace, writes the spans recorded along the way and displays the tool overhead (see finish_trace).
 
     If there is an argument type error during argument processing, it prints the usage information,
     prints the error message, and exits the program with a status code of 1.
+
+    If the first argument is serve, the monitor is run instead (see run_serve), and if it is history or trend,
+    the samples saved in the history store are queried instead (see run_history). If it is compare, two URLs
+    are compared instead (see run_compare).
     """
-    command_paths: dict = check_prereqs()
+    if sys.argv[1:2] == ['serve']:
+        run_serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] in (['history'], ['trend']):
+        run_history(sys.argv[1], sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['compare']:
+        run_compare(sys.argv[2:])
+        return
+
+    started: int = time.perf_counter_ns()
     parser: argparse.ArgumentParser = setup_arg_parser()
     try:
         args: argparse.Namespace = process_arguments(parser)
-        config: SimpleNamespace = create_configuration_from_arguments(args, command_paths)
-        process_url(config)
+        check_mode_options(parser, args)
+        if args.trace:
+            start_tracing(started).add('parse_arguments', 'setup', started, time.perf_counter_ns())
+        with span('check_prereqs', 'setup'):
+            command_paths: dict = check_prereqs() if args.engine == 'curl' and not (args.keep_alive or args.redirects or args.body or args.cache_split) else {}
+        with span('configure', 'setup'):
+            config: SimpleNamespace = create_configuration_from_arguments(args, command_paths)
+        try:
+            run_mode(config)
+        finally:
+            if args.trace:
+                finish_trace(config, args.trace)
     except argparse.ArgumentTypeError as err:
         parser.print_usage()
         print(err)
         sys.exit(1)
+
+
+def run_mode(config: SimpleNamespace) -> None:
+    """
+    Run the mode selected in the configuration.
+
+    Only the module of the selected mode is imported.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL (or list of URLs) and the selected mode.
+    """
+    # pylint: disable=import-outside-toplevel
+    if config.url_file:
+        from .batch import process_url_list
+        process_url_list(config)
+    elif config.rate:
+        from .rate import process_url_at_rate
+        process_url_at_rate(config)
+    elif config.per_address:
+        from .fanout import process_url_per_address
+        process_url_per_address(config)
+    elif config.redirects:
+        from .redirects import process_url_redirects
+        process_url_redirects(config)
+    elif config.body:
+        from .body import process_url_body
+        process_url_body(config)
+    elif config.cache_split:
+        from .cachesplit import process_url_cache_split
+        process_url_cache_split(config)
+    else:
+        from .process import process_url
+        process_url(config)
+
+
+def finish_trace(config: SimpleNamespace, path: str) -> None:
+    """
+    Stop tracing, write the spans to the trace file and display the summary of the spans.
+
+    The summary is displayed after the results with the text output format, and written to stderr with the
+    machine-readable output formats so that it does not mix with the records. This runs even when the run
+    exits early (such as when the URL can not be reached), so the trace of a failed run is kept too.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the output format and screen width.
+        path (str): The path of the trace file.
+    """
+    tracer: Optional[Tracer] = stop_tracing()
+    if tracer is None:
+        return
+
+    stream = sys.stdout if config.output == 'text' else sys.stderr
+    try:
+        write_trace(tracer, path)
+    except OSError as err:
+        print(error_message(f"Unable to write the trace to {path}: {err.strerror}"), file=stream)
+        return
+
+    print(f"  Trace: {len(tracer.spans)} spans written to {path}", file=stream)
+    for line in format_trace_summary(tracer):
+        print(line, file=stream)
+    if config.output == 'text':
+        print(draw_line(width=config.screen_width))
+
+
+def run_serve(argv: list[str]) -> None:
+    """
+    Run the monitor (ttfb serve).
+
+    The targets given with -u (probed every --interval seconds) and those read from --target-file are probed
+    until the program is interrupted, see monitor.py.
+
+    Arguments:
+        argv (list[str]): The command line arguments following serve.
+    """
+    parser: argparse.ArgumentParser = setup_serve_arg_parser()
+    args: argparse.Namespace = process_arguments(parser, argv)
+    if not args.url and not args.target_file:
+        parser.error("at least one of -u/--url or --target-file is required")
+
+    # pylint: disable=import-outside-toplevel
+    from .monitor import read_targets, run_monitor
+    targets: dict[str, float] = dict.fromkeys(args.url or [], args.interval)
+    for url, interval in read_targets(args.target_file, args.interval) if args.target_file else []:
+        targets.setdefault(url, interval)
+    run_monitor(create_monitor_configuration(args, list(targets.items())))
+
+
+def run_history(command: str, argv: list[str]) -> None:
+    """
+    Run a query (ttfb history or ttfb trend) over the samples saved in the history store, see history.py.
+
+    Arguments:
+        command (str): The query, history or trend.
+        argv (list[str]): The command line arguments following the query.
+    """
+    args: argparse.Namespace = process_arguments(setup_history_arg_parser(command), argv)
+    config: SimpleNamespace = create_history_configuration(args)
+
+    # pylint: disable=import-outside-toplevel
+    from .history import display_history, display_trend
+    if command == 'history':
+        display_history(config)
+    else:
+        display_trend(config)
+
+
+def run_compare(argv: list[str]) -> None:
+    """
+    Run the A/B comparison (ttfb compare) of two URLs, see compare.py.
+
+    Arguments:
+        argv (list[str]): The command line arguments following compare.
+
+    Exits:
+        With REGRESSION_EXIT_STATUS (see compare.py) if B is significantly slower than A by more than the threshold, or fails significantly more often.
+    """
+    args: argparse.Namespace = process_arguments(setup_compare_arg_parser(), argv)
+    command_paths: dict = check_prereqs() if args.engine == 'curl' else {}
+    config: SimpleNamespace = create_compare_configuration(args, command_paths)
+
+    # pylint: disable=import-outside-toplevel
+    from .compare import display_comparison
+    display_comparison(config)
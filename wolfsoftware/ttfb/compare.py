@@ -0,0 +1,246 @@
+"""
+This module handles the A/B comparison mode (ttfb compare) of the URL timing analysis program.
+
+Running ttfb against two URLs one after the other lets any drift in the network or the servers between the two
+runs swamp the difference between them. In compare mode the samples of the two URLs are interleaved, in ABBA
+order (or a random order for each pair), so neither URL is systematically measured first or during a better
+moment. The difference between the medians of each timing phase is reported with the p-value of a Mann-Whitney U
+test, and for the gate phase with a bootstrap confidence interval, neither of which assume the timings are normally
+distributed. The values of each phase are kept in compact arrays, and the bootstrap (the costly part of the report)
+runs once, on at most BOOTSTRAP_SAMPLE_LIMIT values of each URL, so the report stays quick however long the run.
+
+B has regressed when its median of the gate phase (TTFB by default) is more than the threshold slower than A's
+and the difference is significant (the p-value is below SIGNIFICANCE_LEVEL), or when B fails more often than A
+and that difference is significant too (failed samples have no timings, so a B which times out half the time
+could otherwise pass on the samples that did succeed). In either case the program exits with
+REGRESSION_EXIT_STATUS, so a comparison can gate a deploy.
+
+Functions:
+- pair_orders: Yields the order to measure each pair of samples in.
+- compare_urls: Measures the two URLs interleaved and returns the timing phases of each.
+- compare_phase: Compares a single timing phase of the two URLs.
+- compare_error_rates: Compares the error rates of the two URLs.
+- format_delta_interval: Formats the confidence interval of the difference of a compared phase.
+- display_comparison: Measures the two URLs and displays the comparison, exiting with REGRESSION_EXIT_STATUS if B has regressed.
+
+Modules:
+- array: Used to store the values of each timing phase compactly.
+- math: Used to mark the phases without a bootstrap interval.
+- random: Used for the random pair order and the bootstrap resamples.
+- display: Imports draw_line to draw formatted lines.
+- engine: Imports measure_sample to take a single measurement with the configured engine.
+- formatting: Imports the formatting functions shared with the other modes.
+- output: Imports fatal_error to abort when a URL cannot be reached.
+- sampling: Imports sample_indexes to take the configured number of pairs (or keep sampling for the configured duration).
+- stats: Imports bootstrap_median_delta, mann_whitney_u, two_proportion_test and exact_quantile to compare the samples.
+- utils: Imports validate_url to check that both URLs are well-formed.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import math
+import random
+import sys
+
+from array import array
+from types import SimpleNamespace
+from typing import Iterator
+
+from .display import draw_line
+from .engine import measure_sample
+from .exceptions import MeasurementError
+from .formatting import display_header, format_timing_line, select_phases
+from .globals import PHASE_LABELS, TIMING_PHASES
+from .output import fatal_error
+from .sampling import sample_indexes
+from .stats import bootstrap_median_delta, exact_quantile, mann_whitney_u, two_proportion_test
+from .utils import validate_url
+
+SIGNIFICANCE_LEVEL: float = 0.05
+REGRESSION_EXIT_STATUS: int = 3
+LABELS: tuple[str, str] = ('A', 'B')
+
+
+def pair_orders(order: str, rng: random.Random) -> Iterator[tuple[int, int]]:
+    """
+    Yield the order to measure each pair of samples in, as indexes of the two URLs.
+
+    Arguments:
+        order (str): abba to alternate between A then B and B then A, or random to shuffle each pair.
+        rng (random.Random): The random number generator used for the random order.
+
+    Yields:
+        tuple[int, int]: The index (0 for A, 1 for B) of the URL to measure first and second.
+    """
+    first: int = 0
+    while True:
+        if order == 'random':
+            first = rng.randrange(2)
+        yield first, 1 - first
+        if order != 'random':
+            first = 1 - first
+
+
+def compare_urls(config: SimpleNamespace, rng: random.Random) -> tuple[list[dict[str, array]], list[int]]:
+    """
+    Measure the two URLs interleaved and return the timing phases of each.
+
+    Each pair of samples is taken back to back, A and B in the order given by pair_orders. Failed samples are
+    counted rather than aborting the run, except in the first pair, which acts as the reachability check.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URLs, engine, pair order and count (or duration).
+        rng (random.Random): The random number generator used for the random order.
+
+    Returns:
+        tuple[list[dict[str, array]], list[int]]: The values of each timing phase (as arrays of doubles), and the number of failed
+                                                  samples, of A and of B.
+
+    Exits:
+        If either URL fails in the first pair, displays an error message and exits the program.
+    """
+    values: list[dict[str, array]] = [{phase: array('d') for phase in TIMING_PHASES} for _ in config.urls]
+    errors: list[int] = [0, 0]
+    orders: Iterator[tuple[int, int]] = pair_orders(config.order, rng)
+    phases: tuple[str, ...] = select_phases(config)
+
+    for index in sample_indexes(config):
+        for side in next(orders):
+            try:
+                sample: dict[str, float] = measure_sample(config, config.urls[side])
+            except MeasurementError as err:
+                if index == 0:
+                    fatal_error(None, f"{config.urls[side]} could not be reached - aborting ({err})")
+                errors[side] += 1
+                if config.verbose:
+                    print(f"  ({LABELS[side]}) {err}")
+                continue
+
+            for phase, value in sample.items():
+                values[side][phase].append(value)
+            if config.verbose:
+                print(format_timing_line(sample, phases) + f"   ({LABELS[side]})")
+
+    return values, errors
+
+
+def compare_phase(a: array, b: array, rng: random.Random, bootstrap: bool = True) -> dict[str, float]:
+    """
+    Compare a single timing phase of the two URLs.
+
+    Arguments:
+        a (array): The values of the phase for A.
+        b (array): The values of the phase for B.
+        rng (random.Random): The random number generator used for the bootstrap resamples.
+        bootstrap (bool): Whether to calculate the bootstrap confidence interval of the difference.
+
+    Returns:
+        dict[str, float]: The median of A and B, the difference between them (B - A) as seconds and as a fraction of
+                          A's median, the bounds of its 95% confidence interval (NaN without the bootstrap) and the
+                          p-value of the difference.
+    """
+    median_a: float = exact_quantile(sorted(a), 0.5)
+    median_b: float = exact_quantile(sorted(b), 0.5)
+    low, high = bootstrap_median_delta(a, b, rng) if bootstrap else (math.nan, math.nan)
+    return {
+        'a': median_a,
+        'b': median_b,
+        'delta': median_b - median_a,
+        'relative': (median_b - median_a) / median_a if median_a > 0 else 0.0,
+        'low': low,
+        'high': high,
+        'p': mann_whitney_u(a, b),
+    }
+
+
+def compare_error_rates(samples: list[int], errors: list[int]) -> dict[str, float]:
+    """
+    Compare the error rates of the two URLs.
+
+    Arguments:
+        samples (list[int]): The number of successful samples of A and of B.
+        errors (list[int]): The number of failed samples of A and of B.
+
+    Returns:
+        dict[str, float]: The error rate of A and B and the p-value of the difference between them.
+    """
+    totals: list[int] = [samples[side] + errors[side] for side in range(2)]
+    return {
+        'a': errors[0] / totals[0] if totals[0] else 0.0,
+        'b': errors[1] / totals[1] if totals[1] else 0.0,
+        'p': two_proportion_test(errors[0], totals[0], errors[1], totals[1]),
+    }
+
+
+def format_delta_interval(result: dict[str, float]) -> str:
+    """
+    Format the 95% confidence interval of the difference of a compared phase, or '-' for a phase without the bootstrap.
+
+    Arguments:
+        result (dict[str, float]): The comparison of the phase, as returned by compare_phase.
+
+    Returns:
+        str: The formatted interval.
+    """
+    if math.isnan(result['low']):
+        return '-'
+    return f"{result['low']:>+10.6f} .. {result['high']:>+10.6f}"
+
+
+def display_comparison(config: SimpleNamespace) -> None:
+    """
+    Measure the two URLs interleaved and display the comparison of each timing phase.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URLs, engine, pair order, seed, threshold,
+                                  gate phase and count (or duration).
+
+    Exits:
+        If either URL is not well-formed or cannot be reached, displays an error message and exits the program. If B has regressed (in the
+        gate phase or in its error rate), displays the comparison and exits with REGRESSION_EXIT_STATUS.
+    """
+    for url in config.urls:
+        validate_url(url)
+    display_header(config, f"Comparing A: {config.urls[0]} with B: {config.urls[1]}")
+
+    rng: random.Random = random.Random(config.seed)
+    values, errors = compare_urls(config, rng)
+    if config.verbose:
+        print(draw_line(width=config.screen_width))
+
+    phases: tuple[str, ...] = select_phases(config)
+    if config.gate_phase not in phases:
+        phases = tuple(phase for phase in TIMING_PHASES if phase in phases or phase == config.gate_phase)
+    results: dict[str, dict[str, float]] = {
+        phase: compare_phase(values[0][phase], values[1][phase], rng, bootstrap=phase == config.gate_phase) for phase in phases
+    }
+
+    samples: list[int] = [len(values[side][TIMING_PHASES[-1]]) for side in range(2)]
+    print(f"  Samples: A {samples[0]} ({errors[0]} errors)   B {samples[1]} ({errors[1]} errors)   Order: {config.order}")
+    width: int = max(len(PHASE_LABELS[phase]) for phase in phases)
+    print(f"  {'Phase':<{width}}   {'A p50':>10}   {'B p50':>10}   {'Delta':>10}   {'Delta %':>8}   {'95% Interval of Delta':>23}   {'p-value':>8}")
+    for phase, result in results.items():
+        print(f"  {PHASE_LABELS[phase]:<{width}}   {result['a']:>10.6f}   {result['b']:>10.6f}   {result['delta']:>+10.6f}   {result['relative']:>+8.1%}   "
+              f"{format_delta_interval(result):>23}   {result['p']:>8.4f}")
+    print(draw_line(width=config.screen_width))
+
+    gate: dict[str, float] = results[config.gate_phase]
+    significant: bool = gate['p'] < SIGNIFICANCE_LEVEL
+    direction: str = 'slower' if gate['delta'] > 0 else 'faster'
+    print(f"  B is {abs(gate['relative']):.1%} {direction} than A in {PHASE_LABELS[config.gate_phase]} "
+          f"({'significant' if significant else 'not significant'}, p = {gate['p']:.4f}, threshold {config.threshold:.1%})")
+
+    error_rates: dict[str, float] = compare_error_rates(samples, errors)
+    if any(errors):
+        print(f"  B failed {error_rates['b']:.1%} of samples and A {error_rates['a']:.1%} "
+              f"({'significant' if error_rates['p'] < SIGNIFICANCE_LEVEL else 'not significant'}, p = {error_rates['p']:.4f})")
+
+    if significant and gate['relative'] > config.threshold:
+        print("  Result: REGRESSION - B is significantly slower than A by more than the threshold")
+        print(draw_line(width=config.screen_width))
+        sys.exit(REGRESSION_EXIT_STATUS)
+    if error_rates['b'] > error_rates['a'] and error_rates['p'] < SIGNIFICANCE_LEVEL:
+        print("  Result: REGRESSION - B fails significantly more often than A")
+        print(draw_line(width=config.screen_width))
+        sys.exit(REGRESSION_EXIT_STATUS)
+    print("  Result: OK - no significant regression over the threshold")
+    print(draw_line(width=config.screen_width))
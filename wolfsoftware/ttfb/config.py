@@ -9,15 +9,51 @@ which are necessary for performing the timing analysis.
 Functions:
 - create_configuration_from_arguments: Creates and returns a configuration object
   based on parsed command-line arguments and command paths.
+- create_monitor_configuration: Creates and returns the configuration object for the monitor (ttfb serve).
+- create_configuration: Creates and returns the configuration object for the library API (see api.measure).
+- create_history_configuration: Creates and returns the configuration object for the history queries (ttfb history and ttfb trend).
+- create_compare_configuration: Creates and returns the configuration object for the A/B comparison (ttfb compare).
+
+Constants:
+- LIBRARY_DEFAULTS: The default value of each option of the library API, those of the command-line options of the same name
+  except for the engine, which is native so that the library needs neither curl nor a new process for each sample.
 
 Modules:
 - argparse.Namespace: Used for type annotation of command-line arguments.
 - types.SimpleNamespace: Used to create a simple object for storing configuration settings.
+- resolver: Imports Resolver to resolve each host once when DNS pinning is enabled.
 """
+# pylint: disable=relative-beyond-top-level
 
 from argparse import Namespace
 
 from types import SimpleNamespace
+from typing import Any
+
+from .globals import (
+    DEFAULT_MAX_SAMPLES, DEFAULT_SUMMARY_INTERVAL, DEFAULT_TIMELINE_SIZE, DEFAULT_VALIDATION_TTL, MODE_BODY, MODE_CACHE_SPLIT, MODE_KEEP_ALIVE,
+    MODE_PER_ADDRESS, MODE_RATE, MODE_REDIRECTS
+)
+from .resolver import Resolver
+
+LIBRARY_DEFAULTS: dict[str, Any] = {
+    'count': 1,
+    'duration': None,
+    'engine': 'native',
+    'pool_size': 1,
+    'rate': None,
+    'max_in_flight': 64,
+    'concurrency': 10,
+    'pin_dns': False,
+    'dns_ttl': None,
+    'history': False,
+    'history_dir': None,
+    'target_precision': None,
+    'target_statistic': 'p50',
+    'max_samples': DEFAULT_MAX_SAMPLES,
+    'cache_redirect': False,
+    'timeline': False,
+}
 
 
 def create_configuration_from_arguments(args: Namespace, command_paths: dict) -> SimpleNamespace:
@@ -34,7 +70,10 @@ def create_configuration_from_arguments(args: Namespace, command_paths: dict) ->
     Returns:
         SimpleNamespace: A configuration object populated with the necessary settings.
                          This includes verbosity, debug mode, minimal/full configuration,
-                         count, URL, screen width, and command paths.
+                         count (or duration), adaptive sampling settings, summary interval, engine, curl batching, output format, keep-alive settings,
+                         rate settings, per-address mode, redirects, body and cache-split mode settings, DNS resolver, URL (or URL file),
+                         validation cache settings, concurrency limits, worker count, history store settings,
+                         screen width, and command paths.
     """
     config: SimpleNamespace = SimpleNamespace()
 
@@ -42,8 +81,166 @@ def create_configuration_from_arguments(args: Namespace, command_paths: dict) ->
     config.debug = args.debug
     config.minimal = args.minimal
     config.full = args.full
-    config.count = args.count
+    config.target_precision = args.target_precision
+    config.target_statistic = args.target_statistic
+    config.count = args.max_samples if args.target_precision else args.count
+    config.duration = args.duration
+    config.summary_interval = args.summary_interval
+    config.engine = 'native' if args.keep_alive or args.redirects or args.body or args.cache_split else args.engine
+    config.curl_batch = not args.no_batch
+    config.output = args.output
+    config.keep_alive = args.keep_alive
+    config.pool_size = args.pool_size
+    config.rate = args.rate
+    config.max_in_flight = args.max_in_flight
+    config.per_address = args.per_address
+    config.redirects = args.redirects
+    config.cache_redirect = args.cache_redirect
+    config.body = args.body
+    config.timeline_size = DEFAULT_TIMELINE_SIZE if args.timeline else 0
+    config.cache_split = args.cache_split
+    config.resolver = Resolver(args.dns_ttl) if args.pin_dns or args.dns_ttl or args.per_address else None
+    config.url = args.url
+    config.url_file = args.url_file
+    config.validation_cache = args.validation_cache
+    config.validation_ttl = args.validation_ttl
+    config.concurrency = args.concurrency
+    config.per_host = args.per_host
+    config.workers = args.workers
+    config.history = args.history
+    config.history_dir = args.history_dir
+
+    if config.full:
+        config.screen_width = 182
+    elif config.minimal:
+        config.screen_width = 58
+    else:
+        config.screen_width = 107
+
+    config.command_paths = command_paths
+
+    return config
+
+
+def create_monitor_configuration(args: Namespace, targets: list[tuple[str, float]]) -> SimpleNamespace:
+    """
+    Create the configuration object for the monitor (ttfb serve) from its command-line arguments.
+
+    The monitor always measures with the native engine, so that no process is started per probe.
+
+    Arguments:
+        args (Namespace): The parsed command-line arguments.
+        targets (list[tuple[str, float]]): The URL and interval (in seconds) of each target.
+
+    Returns:
+        SimpleNamespace: A configuration object containing the verbosity, debug mode, targets, ring size,
+                         concurrency, DNS resolver, listen address, screen width and the settings shared
+                         with the other modes.
+    """
+    config: SimpleNamespace = SimpleNamespace()
+
+    config.verbose = args.verbose
+    config.debug = args.debug
+    config.targets = targets
+    config.ring_size = args.ring_size
+    config.concurrency = args.concurrency
+    config.engine = 'native'
+    config.resolver = Resolver(args.dns_ttl) if args.pin_dns or args.dns_ttl else None
+    config.bind = args.bind
+    config.port = args.port
+    config.output = 'text'
+    config.screen_width = 107
+    config.command_paths = {}
+
+    return config
+
+
+def create_configuration(url: str, mode: str, options: dict[str, Any]) -> SimpleNamespace:
+    """
+    Create the configuration object for a single URL measured through the library API (see api.measure).
+
+    The settings that only affect the output are set to those of a plain command-line run, and the
+    options that are not given default to LIBRARY_DEFAULTS, the defaults of the command-line options of the same name.
+
+    Arguments:
+        url (str): The URL to measure.
+        mode (str): The mode to measure in, one of MODES.
+        options (dict[str, Any]): The count (or duration), engine, pool size, rate, in flight limit, concurrency, DNS, history,
+                                  adaptive sampling, redirect caching and timeline settings.
+
+    Returns:
+        SimpleNamespace: A configuration object with the same settings as create_configuration_from_arguments.
+
+    Raises:
+        TypeError: If an option is not one of LIBRARY_DEFAULTS.
+    """
+    unknown: list[str] = sorted(set(options) - set(LIBRARY_DEFAULTS))
+    if unknown:
+        raise TypeError(f"unknown option(s): {', '.join(unknown)}")
+    settings: dict[str, Any] = {**LIBRARY_DEFAULTS, **options}
+
+    config: SimpleNamespace = SimpleNamespace()
+
+    config.verbose = False
+    config.debug = False
+    config.minimal = False
+    config.full = False
+    config.target_precision = settings['target_precision']
+    config.target_statistic = settings['target_statistic']
+    config.count = settings['max_samples'] if settings['target_precision'] else settings['count']
+    config.duration = settings['duration']
+    config.summary_interval = DEFAULT_SUMMARY_INTERVAL
+    config.engine = 'native' if mode in (MODE_KEEP_ALIVE, MODE_REDIRECTS, MODE_BODY, MODE_CACHE_SPLIT) else settings['engine']
+    config.curl_batch = True
+    config.output = 'text'
+    config.keep_alive = mode == MODE_KEEP_ALIVE
+    config.pool_size = settings['pool_size']
+    config.rate = settings['rate'] if mode == MODE_RATE else None
+    config.max_in_flight = settings['max_in_flight']
+    config.per_address = mode == MODE_PER_ADDRESS
+    config.redirects = mode == MODE_REDIRECTS
+    config.cache_redirect = settings['cache_redirect']
+    config.body = mode == MODE_BODY
+    config.timeline_size = DEFAULT_TIMELINE_SIZE if settings['timeline'] else 0
+    config.cache_split = mode == MODE_CACHE_SPLIT
+    config.resolver = Resolver(settings['dns_ttl']) if settings['pin_dns'] or settings['dns_ttl'] or config.per_address else None
+    config.url = url
+    config.url_file = None
+    config.validation_cache = False
+    config.validation_ttl = DEFAULT_VALIDATION_TTL
+    config.concurrency = settings['concurrency']
+    config.per_host = 4
+    config.workers = 1
+    config.history = settings['history']
+    config.history_dir = settings['history_dir']
+    config.screen_width = 107
+    config.command_paths = {}
+
+    return config
+
+
+def create_history_configuration(args: Namespace) -> SimpleNamespace:
+    """
+    Create the configuration object for the history queries (ttfb history and ttfb trend) from their command-line arguments.
+
+    Arguments:
+        args (Namespace): The parsed command-line arguments.
+
+    Returns:
+        SimpleNamespace: A configuration object containing the store directory, URL, time window (as durations before now),
+                         period length and phase of the trend, output mode and screen width.
+    """
+    config: SimpleNamespace = SimpleNamespace()
+
+    config.history_dir = args.history_dir
     config.url = args.url
+    config.since = args.since
+    config.until = args.until
+    config.bucket = args.bucket
+    config.phase = args.phase
+    config.minimal = args.minimal
+    config.full = args.full
+    config.output = 'text'
 
     if config.full:
         config.screen_width = 182
@@ -52,6 +249,43 @@ def create_configuration_from_arguments(args: Namespace, command_paths: dict) ->
     else:
         config.screen_width = 107
 
+    return config
+
+
+def create_compare_configuration(args: Namespace, command_paths: dict) -> SimpleNamespace:
+    """
+    Create the configuration object for the A/B comparison (ttfb compare) from its command-line arguments.
+
+    Curl batching is always disabled, as the samples of the two URLs are interleaved one at a time.
+
+    Arguments:
+        args (Namespace): The parsed command-line arguments.
+        command_paths (dict): A dictionary containing command paths.
+
+    Returns:
+        SimpleNamespace: A configuration object containing the verbosity, debug mode, minimal/full configuration,
+                         the two URLs, count (or duration) of pairs, pair order and seed, regression threshold and
+                         gate phase, engine, DNS resolver, screen width and command paths.
+    """
+    config: SimpleNamespace = SimpleNamespace()
+
+    config.verbose = args.verbose
+    config.debug = args.debug
+    config.minimal = args.minimal
+    config.full = args.full
+    config.urls = [args.url_a, args.url_b]
+    config.count = args.count
+    config.duration = args.duration
+    config.order = args.order
+    config.seed = args.seed
+    config.threshold = args.threshold
+    config.gate_phase = args.gate_phase
+    config.engine = args.engine
+    config.curl_batch = False
+    config.resolver = Resolver(args.dns_ttl) if args.pin_dns or args.dns_ttl else None
+    config.output = 'text'
+    config.screen_width = 182 if args.full else 107
+
     config.command_paths = command_paths
 
     return config
@@ -0,0 +1,59 @@
+"""
+This module provides lazily loaded wrappers around the terminal rendering and notification packages.
+
+Importing wolfsoftware.drawlines or wolfsoftware.notify also imports colorama and importlib.metadata,
+which together cost more than the rest of the program's start-up. The wrappers import the packages the
+first time a line is drawn or a message is displayed, so runs that never draw anything (--version,
+--help and argument errors) do not pay for them.
+
+Functions:
+- draw_line: Draws a line across the terminal, see wolfsoftware.drawlines.draw_line.
+- error_message: Formats an error message, see wolfsoftware.notify.error_message.
+- system_message: Formats a system message, see wolfsoftware.notify.system_message.
+"""
+# pylint: disable=import-outside-toplevel
+
+from typing import Any
+
+
+def draw_line(*args: Any, **kwargs: Any) -> str:
+    """
+    Draw a line across the terminal with optional text, importing wolfsoftware.drawlines on first use.
+
+    Arguments:
+        *args (Any): The positional arguments for wolfsoftware.drawlines.draw_line.
+        **kwargs (Any): The keyword arguments for wolfsoftware.drawlines.draw_line.
+
+    Returns:
+        str: The line.
+    """
+    from wolfsoftware.drawlines import draw_line as _draw_line
+    return _draw_line(*args, **kwargs)
+
+
+def error_message(message: str) -> str:
+    """
+    Format an error message, importing wolfsoftware.notify on first use.
+
+    Arguments:
+        message (str): The message.
+
+    Returns:
+        str: The formatted message.
+    """
+    from wolfsoftware.notify import error_message as _error_message
+    return _error_message(message)
+
+
+def system_message(message: str) -> str:
+    """
+    Format a system message, importing wolfsoftware.notify on first use.
+
+    Arguments:
+        message (str): The message.
+
+    Returns:
+        str: The formatted message.
+    """
+    from wolfsoftware.notify import system_message as _system_message
+    return _system_message(message)
@@ -0,0 +1,935 @@
+"""
+This module provides the timing engines used to measure a single request to a URL.
+
+Both engines report the same timing phases (in seconds) that the curl -w templates expose:
+namelookup, connect, appconnect, pretransfer, redirect, starttransfer and total.
+
+- curl: The reference backend, runs curl and parses its -w output. Repeated samples are taken in
+  batches by a single curl process (reading its transfers from a -K config on stdin) rather than
+  spawning a new process for every sample, falling back to a process per sample if the server keeps
+  the connections of a batch open (see measure_samples).
+- native: An in-process engine built on sockets, ssl and time.perf_counter_ns which avoids the
+  cost of spawning a new process for every sample.
+
+Like curl, the native engine follows redirects and accumulates the phase timings of each hop,
+with the redirect phase holding the time taken by all the redirect steps before the final request.
+The timings of each hop can also be kept separately (see trace_redirects) for the redirects mode, and
+the arrival of the body can be profiled as it is read (see bodyprofile.BodyProfile) for the body mode.
+
+With --trace the stages of each engine (building the curl command, running or spawning curl and parsing its
+output, or connecting and reading the response) are recorded as spans (see tracing.span).
+
+Classes:
+- HttpResponse: The status line, headers and body size of a response read by the native engine.
+- HttpConnection: A single timed HTTP/1.1 connection used by the native engine.
+- RedirectHop: The status, target, headers and timings of a single request of a redirect chain.
+- ConnectionPool: A small pool of persistent connections used to separate cold, resumed and warm timings.
+
+Functions:
+- get_ssl_context: Returns the (cached) SSL context used by the native engine.
+- curl_resolve_arguments: Returns the curl --resolve arguments that pin a host to the resolved addresses.
+- measure_sample: Measures a single sample using the engine selected in the configuration.
+- measure_samples: Measures a series of samples using the engine selected in the configuration.
+- measure_with_curl: Measures a single sample by running curl.
+- measure_with_curl_batch: Measures a sample for each of a list of URLs with a single curl process.
+- measure_with_native: Measures a single sample using the in-process engine.
+- trace_redirects: Follows the redirect chain of a URL, timing each hop separately.
+- chain_timings: Combines the timings of the hops of a redirect chain into those of a single sample.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import functools
+import socket
+import ssl
+import subprocess  # nosec B404
+import time
+
+from types import SimpleNamespace
+from typing import Iterator, Optional, Union
+from urllib.parse import urljoin, urlsplit
+
+from .bodyprofile import BodyProfile
+from .exceptions import ConnectionReusedError, MeasurementError
+from .globals import DEFAULT_TIMEOUT, MAX_REDIRECTS, TIMING_PHASES, get_user_agent
+from .resolver import Resolver, format_address
+from .tracing import record_span, span
+
+CURL_WRITE_OUT: str = '\t'.join('%{time_' + phase + '}' for phase in TIMING_PHASES) + '\n'
+CURL_BATCH_WRITE_OUT: str = '%{stderr}%{urlnum}\t%{exitcode}\t%{num_connects}\t%{num_redirects}\t' + CURL_WRITE_OUT
+CURL_BATCH_SIZE: int = 100
+REDIRECT_STATUSES: frozenset = frozenset((301, 302, 303, 307, 308))
+DEFAULT_PORTS: dict[str, int] = {'http': 80, 'https': 443}
+READ_SIZE: int = 65536
+MAX_HEADER_SIZE: int = 65536
+
+
+class HttpResponse:  # pylint: disable=too-few-public-methods
+    """
+    The status line, headers and body size of a response read by the native engine.
+
+    Header names are stored in lower case, repeated headers keep the last value seen.
+    """
+
+    __slots__ = ('version', 'status', 'reason', 'headers', 'body_bytes')
+
+    def __init__(self, version: str, status: int, reason: str, headers: dict[str, str]) -> None:
+        """
+        Initialise the response.
+
+        Arguments:
+            version (str): The HTTP version of the response (e.g. 'HTTP/1.1').
+            status (int): The HTTP status code.
+            reason (str): The HTTP reason phrase.
+            headers (dict[str, str]): The response headers keyed by lower case name.
+        """
+        self.version: str = version
+        self.status: int = status
+        self.reason: str = reason
+        self.headers: dict[str, str] = headers
+        self.body_bytes: int = 0
+
+
+class RedirectHop:  # pylint: disable=too-few-public-methods
+    """
+    The status, target, headers and timings of a single request of a redirect chain.
+
+    The timings map each of TIMING_PHASES to the number of seconds from the start of the hop (its DNS lookup)
+    until the end of that phase, appconnect is 0 for http hops and redirect is always 0. The offset is the
+    number of seconds from the start of the chain until the start of the hop, and location is the target of
+    the redirect, empty for the final hop. The headers are the response headers keyed by lower case name.
+    """
+
+    __slots__ = ('url', 'status', 'location', 'offset', 'timings', 'headers')
+
+    def __init__(self, url: str, status: int, location: str,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 offset: float, timings: dict[str, float], headers: Optional[dict[str, str]] = None) -> None:
+        """
+        Initialise the hop.
+
+        Arguments:
+            url (str): The URL requested.
+            status (int): The HTTP status code of the response.
+            location (str): The (absolute) URL the response redirected to, or empty for the final hop.
+            offset (float): The number of seconds from the start of the chain until the start of the hop.
+            timings (dict[str, float]): The timing phases of the hop in seconds.
+            headers (Optional[dict[str, str]]): The response headers keyed by lower case name.
+        """
+        self.url: str = url
+        self.status: int = status
+        self.location: str = location
+        self.offset: float = offset
+        self.timings: dict[str, float] = timings
+        self.headers: dict[str, str] = headers or {}
+
+    def __repr__(self) -> str:
+        """
+        Return a short description of the hop.
+
+        Returns:
+            str: The description.
+        """
+        return f"RedirectHop({self.status} {self.url}{f' -> {self.location}' if self.location else ''}, ttfb={self.timings['starttransfer']:.6f})"
+
+
+class HttpConnection:  # pylint: disable=too-many-instance-attributes
+    """
+    A single HTTP/1.1 connection timed with time.perf_counter_ns.
+
+    The moment each phase completes is recorded (as a perf_counter_ns value) in the marks
+    dictionary, so that callers can convert them into curl style timings. The body of each
+    response is read and discarded in fixed size blocks so memory use stays constant.
+
+    A connection can be kept open for further requests (keep-alive), in which case reusable
+    shows whether the server allows the connection to be used again. When a body profile is set the
+    arrival of each block of the body is recorded in it. Requests ask caches to revalidate the response
+    (Cache-Control: no-cache) unless no_cache is turned off.
+    """
+
+    def __init__(self, scheme: str, host: str, port: int, timeout: float = DEFAULT_TIMEOUT,  # pylint: disable=too-many-arguments,too-many-positional-arguments
+                 ssl_context: Optional[ssl.SSLContext] = None, resolver: Optional[Resolver] = None) -> None:
+        """
+        Initialise the connection, no network activity takes place until connect is called.
+
+        Arguments:
+            scheme (str): Either 'http' or 'https'.
+            host (str): The host name (or address) to connect to.
+            port (int): The port to connect to.
+            timeout (float): The socket timeout in seconds.
+            ssl_context (Optional[ssl.SSLContext]): The SSL context to use for https connections.
+            resolver (Optional[Resolver]): The resolver to look the host up with, or None to resolve it for every connection.
+        """
+        self.scheme: str = scheme
+        self.host: str = host
+        self.port: int = port
+        self.timeout: float = timeout
+        self.ssl_context: Optional[ssl.SSLContext] = ssl_context
+        self.resolver: Optional[Resolver] = resolver
+        self.user_agent: str = get_user_agent()
+        self.sock: Optional[socket.socket] = None
+        self.marks: dict[str, int] = {}
+        self.reusable: bool = False
+        self.resumed: bool = False
+        self.profile: Optional[BodyProfile] = None
+        self.no_cache: bool = True
+        self._buffer: bytearray = bytearray()
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = DEFAULT_TIMEOUT, ssl_context: Optional[ssl.SSLContext] = None,
+                 resolver: Optional[Resolver] = None) -> 'HttpConnection':
+        """
+        Create a connection for the scheme, host and port of the given URL.
+
+        Arguments:
+            url (str): The URL to connect to.
+            timeout (float): The socket timeout in seconds.
+            ssl_context (Optional[ssl.SSLContext]): The SSL context to use for https connections.
+            resolver (Optional[Resolver]): The resolver to look the host up with.
+
+        Returns:
+            HttpConnection: The (unconnected) connection.
+
+        Raises:
+            MeasurementError: If the URL is not a valid http or https URL.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise MeasurementError(f"Unsupported URL: {url}")
+        try:
+            port: int = parts.port or DEFAULT_PORTS[parts.scheme]
+        except ValueError as err:
+            raise MeasurementError(f"Invalid port in URL: {url}") from err
+        return cls(parts.scheme, parts.hostname, port, timeout, ssl_context, resolver)
+
+    def connect(self, session: Optional[ssl.SSLSession] = None) -> None:
+        """
+        Resolve the host, open the TCP connection and perform the TLS handshake (for https).
+
+        Records the start, namelookup, connect and (for https) appconnect marks.
+
+        Arguments:
+            session (Optional[ssl.SSLSession]): A TLS session from an earlier connection to attempt to resume.
+
+        Raises:
+            MeasurementError: If the host cannot be resolved or the connection cannot be established.
+        """
+        self.marks['start'] = time.perf_counter_ns()
+        addresses: list = (self.resolver or Resolver()).resolve(self.host, self.port)
+        self.marks['namelookup'] = time.perf_counter_ns()
+
+        sock: socket.socket = self._open_socket(addresses)
+        self.marks['connect'] = time.perf_counter_ns()
+
+        if self.scheme == 'https':
+            context: ssl.SSLContext = self.ssl_context or get_ssl_context()
+            try:
+                sock = context.wrap_socket(sock, server_hostname=self.host, do_handshake_on_connect=False, session=session)
+                sock.do_handshake()
+            except (OSError, ssl.SSLError) as err:
+                sock.close()
+                raise MeasurementError(f"TLS handshake with {self.host} failed: {err}") from err
+            self.marks['appconnect'] = time.perf_counter_ns()
+            self.resumed = sock.session_reused
+
+        self.sock = sock
+        record_span('connect', 'engine', self.marks['start'])
+
+    def _open_socket(self, addresses: list) -> socket.socket:
+        """
+        Open a TCP connection to the first reachable address.
+
+        Arguments:
+            addresses (list): The address information returned by socket.getaddrinfo.
+
+        Returns:
+            socket.socket: The connected socket.
+
+        Raises:
+            MeasurementError: If none of the addresses can be connected to.
+        """
+        last_error: Optional[OSError] = None
+        for family, socktype, proto, _canonname, address in addresses:
+            sock = socket.socket(family, socktype, proto)
+            sock.settimeout(self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                sock.connect(address)
+                return sock
+            except OSError as err:
+                sock.close()
+                last_error = err
+        raise MeasurementError(f"Failed to connect to {self.host} port {self.port}: {last_error}")
+
+    def request(self, target: str, method: str = 'GET', keep_alive: bool = False) -> HttpResponse:
+        """
+        Send a request and read the response, discarding the body.
+
+        Records the pretransfer, starttransfer and total marks.
+
+        Arguments:
+            target (str): The request target (path and query string).
+            method (str): The HTTP method to use.
+            keep_alive (bool): Ask the server to keep the connection open for further requests.
+
+        Returns:
+            HttpResponse: The response status, headers and body size.
+
+        Raises:
+            MeasurementError: If the request cannot be sent or the response cannot be read.
+        """
+        if self.sock is None:
+            raise MeasurementError("Connection is not open")
+
+        host_header: str = f"[{self.host}]" if ':' in self.host else self.host
+        if self.port != DEFAULT_PORTS[self.scheme]:
+            host_header += f":{self.port}"
+        cache_control: str = "Cache-Control: no-cache\r\n" if self.no_cache else ''
+        head: str = (
+            f"{method} {target} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            f"User-Agent: {self.user_agent}\r\n"
+            "Accept: */*\r\n"
+            f"{cache_control}"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+
+        self.marks['pretransfer'] = time.perf_counter_ns()
+        self.marks.pop('starttransfer', None)
+        self.reusable = False
+        try:
+            self.sock.sendall(head.encode('latin-1'))
+            response: HttpResponse = self._read_head()
+            while 100 <= response.status < 200 and response.status != 101:
+                response = self._read_head()
+            framed: bool = self._read_body(response, method)
+        except (OSError, ssl.SSLError) as err:
+            raise MeasurementError(f"Failed to read response from {self.host}: {err}") from err
+        self.marks['total'] = time.perf_counter_ns()
+        record_span('read', 'engine', self.marks['pretransfer'])
+
+        connection_header: str = response.headers.get('connection', '').lower()
+        self.reusable = keep_alive and framed and not self._buffer and (
+            'keep-alive' in connection_header if response.version == 'HTTP/1.0' else 'close' not in connection_header
+        )
+        return response
+
+    def close(self) -> None:
+        """Close the connection (if open)."""
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self._buffer.clear()
+
+    def _recv(self) -> bytes:
+        """
+        Receive the next block of data from the socket.
+
+        The first block received after a request has been sent sets the starttransfer mark (and that of the profile, if any).
+
+        Returns:
+            bytes: The data received, or an empty bytes object when the server closed the connection.
+        """
+        data: bytes = self.sock.recv(READ_SIZE)  # type: ignore[union-attr]
+        if data and 'starttransfer' not in self.marks:
+            self.marks['starttransfer'] = time.perf_counter_ns()
+            if self.profile is not None:
+                self.profile.responded = self.marks['starttransfer']
+        return data
+
+    def _fill(self) -> None:
+        """
+        Append the next block of data to the read buffer.
+
+        Raises:
+            MeasurementError: If the server closed the connection.
+        """
+        data: bytes = self._recv()
+        if not data:
+            raise MeasurementError(f"Connection to {self.host} closed unexpectedly")
+        self._buffer += data
+
+    def _read_head(self) -> HttpResponse:
+        """
+        Read and parse the status line and headers of a response.
+
+        Returns:
+            HttpResponse: The parsed response.
+
+        Raises:
+            MeasurementError: If the response head is malformed or too large.
+        """
+        while (end := self._buffer.find(b'\r\n\r\n')) < 0:
+            if len(self._buffer) > MAX_HEADER_SIZE:
+                raise MeasurementError(f"Response headers from {self.host} are too large")
+            self._fill()
+
+        lines: list[str] = self._buffer[:end].decode('latin-1').split('\r\n')
+        del self._buffer[:end + 4]
+
+        status_line: list[str] = lines[0].split(' ', 2)
+        if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+            raise MeasurementError(f"Malformed status line from {self.host}: {lines[0]!r}")
+
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            name, _sep, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        return HttpResponse(status_line[0], int(status_line[1]), status_line[2] if len(status_line) > 2 else '', headers)
+
+    def _read_body(self, response: HttpResponse, method: str) -> bool:
+        """
+        Read and discard the body of a response using the framing given by its headers.
+
+        Arguments:
+            response (HttpResponse): The response whose body is to be read.
+            method (str): The HTTP method of the request.
+
+        Returns:
+            bool: True if the end of the body was framed by the headers, False if it was the connection closing.
+        """
+        if method == 'HEAD' or response.status in (204, 304):
+            return True
+
+        if 'chunked' in response.headers.get('transfer-encoding', '').lower():
+            self._read_chunked(response)
+        elif 'content-length' in response.headers:
+            try:
+                length = int(response.headers['content-length'])
+            except ValueError as err:
+                raise MeasurementError(f"Invalid Content-Length from {self.host}") from err
+            self._read_exact(response, length)
+        else:
+            self._read_to_eof(response)
+            return False
+        return True
+
+    def _consume(self, response: HttpResponse, size: int) -> None:
+        """
+        Discard the given number of bytes from the front of the read buffer.
+
+        Arguments:
+            response (HttpResponse): The response the bytes belong to.
+            size (int): The number of bytes to discard.
+        """
+        del self._buffer[:size]
+        response.body_bytes += size
+        if self.profile is not None:
+            self.profile.add(size, time.perf_counter_ns())
+
+    def _read_exact(self, response: HttpResponse, length: int) -> None:
+        """
+        Read and discard exactly length bytes of body.
+
+        Arguments:
+            response (HttpResponse): The response being read.
+            length (int): The number of body bytes to read.
+        """
+        while length > 0:
+            if not self._buffer:
+                self._fill()
+            size: int = min(length, len(self._buffer))
+            self._consume(response, size)
+            length -= size
+
+    def _read_to_eof(self, response: HttpResponse) -> None:
+        """
+        Read and discard body bytes until the server closes the connection.
+
+        Arguments:
+            response (HttpResponse): The response being read.
+        """
+        self._consume(response, len(self._buffer))
+        while data := self._recv():
+            response.body_bytes += len(data)
+            if self.profile is not None:
+                self.profile.add(len(data), time.perf_counter_ns())
+
+    def _read_line(self) -> bytes:
+        """
+        Read a single CRLF terminated line from the connection.
+
+        Returns:
+            bytes: The line without the trailing CRLF.
+        """
+        while (end := self._buffer.find(b'\r\n')) < 0:
+            if len(self._buffer) > MAX_HEADER_SIZE:
+                raise MeasurementError(f"Malformed chunked response from {self.host}")
+            self._fill()
+        line: bytes = bytes(self._buffer[:end])
+        del self._buffer[:end + 2]
+        return line
+
+    def _read_chunked(self, response: HttpResponse) -> None:
+        """
+        Read and discard a chunked body, including any trailers.
+
+        Arguments:
+            response (HttpResponse): The response being read.
+        """
+        while True:
+            size_field: bytes = self._read_line().split(b';', 1)[0].strip()
+            try:
+                size = int(size_field, 16)
+            except ValueError as err:
+                raise MeasurementError(f"Malformed chunked response from {self.host}") from err
+            if size == 0:
+                break
+            self._read_exact(response, size)
+            self._read_line()
+
+        while self._read_line():
+            pass
+
+
+class ConnectionPool:  # pylint: disable=too-many-instance-attributes
+    """
+    A small pool of persistent connections to a single URL, used to separate cold and warm timings.
+
+    Requests are sent over the connections in turn. Each sample is classified by the connection it used:
+    - cold: A new connection with a full DNS lookup, TCP connect and (for https) TLS handshake.
+    - resumed: A new https connection which resumed the TLS session of an earlier connection.
+    - warm: A request sent over an already open connection, only the request itself is timed.
+
+    Redirects are not followed, the URL is measured as given.
+    """
+
+    def __init__(self, url: str, size: int = 1, timeout: float = DEFAULT_TIMEOUT, resolver: Optional[Resolver] = None) -> None:
+        """
+        Initialise the pool, no connections are opened until the first measurement.
+
+        Arguments:
+            url (str): The URL to measure.
+            size (int): The number of connections in the pool.
+            timeout (float): The socket timeout in seconds.
+            resolver (Optional[Resolver]): The resolver to look the host up with.
+        """
+        self.url: str = url
+        self.resolver: Optional[Resolver] = resolver
+        self.target: str = _request_target(url)
+        self.timeout: float = timeout
+        self.connections: list[Optional[HttpConnection]] = [None] * size
+        self.session: Optional[ssl.SSLSession] = None
+        self.last_kind: str = 'cold'
+        self._next: int = 0
+
+    def __enter__(self) -> 'ConnectionPool':
+        """
+        Enter the runtime context of the pool.
+
+        Returns:
+            ConnectionPool: The pool itself.
+        """
+        return self
+
+    def __exit__(self, *_exc_info) -> None:
+        """Close all of the connections in the pool when leaving the runtime context."""
+        self.close()
+
+    def measure(self) -> tuple[str, dict[str, float]]:
+        """
+        Measure a single sample over the next connection in the pool, opening it if required.
+
+        Returns:
+            tuple[str, dict[str, float]]: The kind of connection used (cold, resumed or warm) and the timing phases in seconds.
+
+        Raises:
+            MeasurementError: If the measurement fails, the connection used is discarded and last_kind
+                              shows the kind of connection that was attempted.
+        """
+        slot: int = self._next
+        self._next = (self._next + 1) % len(self.connections)
+
+        connection: Optional[HttpConnection] = self.connections[slot]
+        try:
+            if connection is None or not connection.reusable:
+                self.last_kind = 'cold'
+                if connection is not None:
+                    connection.close()
+                connection = HttpConnection.from_url(self.url, self.timeout, resolver=self.resolver)
+                self.connections[slot] = connection
+                connection.connect(self.session)
+                self.last_kind = 'resumed' if connection.resumed else 'cold'
+            else:
+                self.last_kind = 'warm'
+                connection.marks.clear()
+            connection.request(self.target, keep_alive=True)
+        except MeasurementError:
+            if connection is not None:
+                connection.close()
+            self.connections[slot] = None
+            raise
+
+        if isinstance(connection.sock, ssl.SSLSocket) and connection.sock.session is not None:
+            self.session = connection.sock.session
+
+        marks: dict[str, int] = connection.marks
+        start: int = marks['pretransfer'] if self.last_kind == 'warm' else marks['start']
+        timings: dict[str, float] = dict.fromkeys(TIMING_PHASES, 0.0)
+        for phase in ('namelookup', 'connect', 'appconnect', 'pretransfer', 'starttransfer', 'total'):
+            if phase in marks:
+                timings[phase] = (marks[phase] - start) / 1e9
+        return self.last_kind, timings
+
+    def close(self) -> None:
+        """Close all of the connections in the pool."""
+        for connection in self.connections:
+            if connection is not None:
+                connection.close()
+        self.connections = [None] * len(self.connections)
+
+
+@functools.lru_cache(maxsize=None)
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Return the SSL context used by the native engine.
+
+    Loading the system trust store is relatively expensive, so the context is created once and cached.
+
+    Returns:
+        ssl.SSLContext: The SSL context.
+    """
+    context: ssl.SSLContext = ssl.create_default_context()
+    context.set_alpn_protocols(['http/1.1'])
+    return context
+
+
+def _request_target(url: str) -> str:
+    """
+    Return the request target (path and query string) for the given URL.
+
+    Arguments:
+        url (str): The URL.
+
+    Returns:
+        str: The request target.
+    """
+    parts = urlsplit(url)
+    return (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+
+def measure_with_native(url: str, timeout: float = DEFAULT_TIMEOUT, resolver: Optional[Resolver] = None) -> dict[str, float]:
+    """
+    Measure a single sample using the in-process engine.
+
+    Each hop of a redirect chain uses a new connection, the timings of the hops are combined as curl does (see chain_timings).
+
+    Arguments:
+        url (str): The URL to measure.
+        timeout (float): The socket timeout in seconds.
+        resolver (Optional[Resolver]): The resolver to look the hosts up with, or None to resolve them for every connection.
+
+    Returns:
+        dict[str, float]: The timing phases in seconds.
+
+    Raises:
+        MeasurementError: If the measurement fails.
+    """
+    return chain_timings(trace_redirects(url, timeout, resolver))
+
+
+def trace_redirects(url: str, timeout: float = DEFAULT_TIMEOUT, resolver: Optional[Resolver] = None,
+                    profile: Optional[BodyProfile] = None, no_cache: bool = True) -> list[RedirectHop]:
+    """
+    Follow the redirect chain of a URL using the in-process engine, timing each hop separately.
+
+    Each hop uses a new connection, the chain ends at the first response which is not a redirect (or has no Location).
+
+    Arguments:
+        url (str): The URL to measure.
+        timeout (float): The socket timeout in seconds.
+        resolver (Optional[Resolver]): The resolver to look the hosts up with, or None to resolve them for every connection.
+        profile (Optional[BodyProfile]): The profile to record the arrival of the body of the final response in.
+        no_cache (bool): Whether to ask caches to revalidate each response (Cache-Control: no-cache).
+
+    Returns:
+        list[RedirectHop]: The hops of the chain in order, the last one being the final target.
+
+    Raises:
+        MeasurementError: If any hop fails or more than MAX_REDIRECTS redirects are followed.
+    """
+    hops: list[RedirectHop] = []
+    started: int = time.perf_counter_ns()
+
+    for _ in range(MAX_REDIRECTS + 1):
+        connection: HttpConnection = HttpConnection.from_url(url, timeout, resolver=resolver)
+        connection.no_cache = no_cache
+        if profile is not None:
+            profile.reset(started)
+            connection.profile = profile
+        try:
+            connection.connect()
+            response: HttpResponse = connection.request(_request_target(url))
+        finally:
+            connection.close()
+
+        marks: dict[str, int] = connection.marks
+        timings: dict[str, float] = dict.fromkeys(TIMING_PHASES, 0.0)
+        for phase in ('namelookup', 'connect', 'appconnect', 'pretransfer', 'starttransfer', 'total'):
+            if phase in marks:
+                timings[phase] = (marks[phase] - marks['start']) / 1e9
+
+        location: Optional[str] = response.headers.get('location')
+        if response.status not in REDIRECT_STATUSES or not location:
+            hops.append(RedirectHop(url, response.status, '', (marks['start'] - started) / 1e9, timings, response.headers))
+            return hops
+
+        hops.append(RedirectHop(url, response.status, urljoin(url, location), (marks['start'] - started) / 1e9, timings, response.headers))
+        url = hops[-1].location
+
+    raise MeasurementError(f"Maximum ({MAX_REDIRECTS}) redirects followed")
+
+
+def chain_timings(hops: list[RedirectHop]) -> dict[str, float]:
+    """
+    Combine the timings of the hops of a redirect chain into those of a single sample, as curl does.
+
+    The namelookup, connect, appconnect, pretransfer and starttransfer timings of every hop are accumulated,
+    redirect is the time taken before the final request was started and total is the end to end time.
+
+    Arguments:
+        hops (list[RedirectHop]): The hops of the chain, see trace_redirects.
+
+    Returns:
+        dict[str, float]: The timing phases in seconds.
+    """
+    timings: dict[str, float] = dict.fromkeys(TIMING_PHASES, 0.0)
+    for hop in hops:
+        for phase in ('namelookup', 'connect', 'appconnect', 'pretransfer', 'starttransfer'):
+            timings[phase] += hop.timings[phase]
+    final: RedirectHop = hops[-1]
+    timings['redirect'] = final.offset if len(hops) > 1 else 0.0
+    timings['total'] = final.offset + final.timings['total']
+    return timings
+
+
+def curl_resolve_arguments(url: str, resolver: Optional[Resolver]) -> list[str]:
+    """
+    Return the curl --resolve arguments that pin the host of the URL to the addresses held by the resolver.
+
+    Arguments:
+        url (str): The URL being measured.
+        resolver (Optional[Resolver]): The resolver, or None to let curl resolve the host itself.
+
+    Returns:
+        list[str]: The arguments, empty if there is no resolver.
+
+    Raises:
+        MeasurementError: If the host cannot be resolved.
+    """
+    if resolver is None:
+        return []
+    connection: HttpConnection = HttpConnection.from_url(url)
+    addresses: list[str] = resolver.addresses(connection.host, connection.port)
+    return ['--resolve', f"{connection.host}:{connection.port}:{','.join(format_address(address) for address in addresses)}"]
+
+
+def measure_with_curl(curl_path: str, url: str, resolver: Optional[Resolver] = None) -> dict[str, float]:
+    """
+    Measure a single sample by running curl.
+
+    Arguments:
+        curl_path (str): The full path to the curl binary.
+        url (str): The URL to measure.
+        resolver (Optional[Resolver]): The resolver whose addresses the host of the URL is pinned to, or None to let curl resolve it.
+
+    Returns:
+        dict[str, float]: The timing phases in seconds.
+
+    Raises:
+        MeasurementError: If curl fails or its output cannot be parsed.
+    """
+    with span('build_command', 'engine'):
+        command: list[str] = [
+            curl_path, '-L', '-o', '/dev/null', '-H', 'Cache-Control: no-cache', '-s', '-w', CURL_WRITE_OUT, *curl_resolve_arguments(url, resolver), url
+        ]
+    try:
+        with span('run_curl', 'engine'):
+            result: subprocess.CompletedProcess[str] = subprocess.run(command, text=True, check=True, capture_output=True)  # nosec B603
+    except subprocess.CalledProcessError as err:
+        raise MeasurementError(f"curl failed with exit code {err.returncode}") from err
+
+    return parse_curl_timings(result.stdout)
+
+
+def parse_curl_timings(output: str) -> dict[str, float]:
+    """
+    Parse the timing phases written by the CURL_WRITE_OUT template.
+
+    Arguments:
+        output (str): The tab separated timing values written by curl.
+
+    Returns:
+        dict[str, float]: The timing phases in seconds.
+
+    Raises:
+        MeasurementError: If the output cannot be parsed.
+    """
+    with span('parse', 'engine'):
+        try:
+            values: list[float] = [float(value) for value in output.strip().split('\t')]
+        except ValueError as err:
+            raise MeasurementError(f"Unable to parse curl output: {output!r}") from err
+    if len(values) != len(TIMING_PHASES):
+        raise MeasurementError(f"Unable to parse curl output: {output!r}")
+
+    return dict(zip(TIMING_PHASES, values))
+
+
+def _quote_curl_config(value: str) -> str:
+    """
+    Escape a value for use inside double quotes in a curl config file.
+
+    Arguments:
+        value (str): The value to escape.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _parse_curl_batch_line(line: str) -> tuple[str, Union[dict[str, float], MeasurementError]]:
+    """
+    Parse a line written by the CURL_BATCH_WRITE_OUT template.
+
+    Arguments:
+        line (str): The line, which may not have come from the template at all.
+
+    Returns:
+        tuple[str, Union[dict[str, float], MeasurementError]]: The transfer number (not checked to be a number) and either
+                                                               its timing phases or the error.
+    """
+    number, exit_code, connects, redirects, timings = (line.split('\t', 4) + ['', '', '', ''])[:5]
+    if exit_code != '0':
+        return number, MeasurementError(f"curl failed with exit code {exit_code}")
+    if connects.isdigit() and redirects.isdigit() and int(connects) <= int(redirects):
+        return number, ConnectionReusedError("curl reused an open connection")
+    try:
+        return number, parse_curl_timings(timings)
+    except MeasurementError as err:
+        return number, err
+
+
+def measure_with_curl_batch(curl_path: str, urls: list[str],
+                            resolver: Optional[Resolver] = None) -> Iterator[tuple[int, Union[dict[str, float], MeasurementError]]]:
+    """
+    Measure a sample for each of the URLs with a single curl process, yielding each result as its transfer completes.
+
+    The URLs are passed to curl as a -K config on stdin and the transfers run one after another, so the
+    samples are taken in the same closed-loop way as one curl process per sample. Every transfer asks for a
+    new connection (Connection: close) and a full TLS handshake (--no-sessionid), but curl caches DNS lookups
+    within the process, so only the first sample for each host includes a real lookup (as with --pin-dns).
+    The tagged -w output is written to stderr, which curl does not buffer, so results arrive as they happen.
+    Closing the generator early stops curl.
+
+    Curl has no option to forbid reusing a connection, and a server which ignores Connection: close (as every
+    HTTP/2 server does) leaves the connection open for the next transfer, which then has no connect or TLS
+    time. A transfer which opened fewer connections than it made requests is therefore reported as a
+    ConnectionReusedError, after which curl is stopped and no further results are yielded.
+
+    Arguments:
+        curl_path (str): The full path to the curl binary.
+        urls (list[str]): The URL of each sample, repeated for repeated samples.
+        resolver (Optional[Resolver]): The resolver whose addresses the hosts are pinned to, or None to let curl resolve them.
+
+    Yields:
+        tuple[int, Union[dict[str, float], MeasurementError]]: The index of the URL and either its timing phases or the error.
+    """
+    with span('build_command', 'engine'):
+        transfers: str = ''.join(f'url = "{_quote_curl_config(url)}"\noutput = "/dev/null"\n' for url in urls)
+        resolve: dict[tuple[str, ...], None] = dict.fromkeys(tuple(curl_resolve_arguments(url, resolver)) for url in dict.fromkeys(urls))
+        command: list[str] = [
+            curl_path, '-L', '-s', '--no-sessionid', '-H', 'Cache-Control: no-cache', '-H', 'Connection: close', '-w', CURL_BATCH_WRITE_OUT,
+            *(argument for arguments in resolve for argument in arguments), '-K', '-'
+        ]
+
+    spawned: int = time.perf_counter_ns()
+    with subprocess.Popen(command, text=True, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as process:  # nosec B603
+        pending: set[int] = set(range(len(urls)))
+        try:
+            process.stdin.write(transfers)
+            process.stdin.close()
+            record_span('spawn', 'engine', spawned)
+            for line in process.stderr:
+                number, result = _parse_curl_batch_line(line)
+                if not number.isdigit() or int(number) not in pending:
+                    continue
+                pending.discard(int(number))
+                yield int(number), result
+                if isinstance(result, ConnectionReusedError):
+                    return
+
+            return_code: int = process.wait()
+            for number in sorted(pending):
+                yield number, MeasurementError(f"curl failed with exit code {return_code}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+
+
+def measure_samples(config: SimpleNamespace, url: str,
+                    indexes: Iterator[int]) -> Iterator[tuple[int, Union[dict[str, float], MeasurementError]]]:
+    """
+    Measure a sample for each index using the engine selected in the configuration, yielding each result as it completes.
+
+    With the curl engine the samples are taken in batches of up to CURL_BATCH_SIZE by a single curl process
+    (see measure_with_curl_batch) unless batching is disabled in the configuration. If a batched transfer reuses
+    a connection (the server ignored Connection: close, as HTTP/2 servers do) that sample is measured again with
+    a curl process of its own, as are the rest of the samples, so every sample still uses a new connection.
+    The indexes are consumed one at a time as the samples complete, so a duration based run stops as soon as
+    the indexes run out, and closing the generator early stops any running curl process.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine, command paths, resolver and count (or duration).
+        url (str): The URL to measure.
+        indexes (Iterator[int]): The index of each sample to take.
+
+    Yields:
+        tuple[int, Union[dict[str, float], MeasurementError]]: The index of the sample and either its timing phases or the error.
+    """
+    batched: bool = config.engine == 'curl' and config.curl_batch
+    batch: Optional[Iterator[tuple[int, Union[dict[str, float], MeasurementError]]]] = None
+    remaining: int = 0
+    try:
+        for index in indexes:
+            if batched:
+                if remaining == 0:
+                    if batch is not None:
+                        batch.close()
+                    remaining = CURL_BATCH_SIZE if config.duration is not None else min(CURL_BATCH_SIZE, config.count - index)
+                    batch = measure_with_curl_batch(config.command_paths['curl'], [url] * remaining, config.resolver)
+                remaining -= 1
+                result: Union[dict[str, float], MeasurementError] = next(batch, (index, MeasurementError("curl exited before completing every sample")))[1]
+                if not isinstance(result, ConnectionReusedError):
+                    yield index, result
+                    continue
+                batch.close()
+                batched = False
+
+            try:
+                yield index, measure_sample(config, url)
+            except MeasurementError as err:
+                yield index, err
+    finally:
+        if batch is not None:
+            batch.close()
+
+
+def measure_sample(config: SimpleNamespace, url: str) -> dict[str, float]:
+    """
+    Measure a single sample using the engine selected in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine, command paths and resolver.
+        url (str): The URL to measure.
+
+    Returns:
+        dict[str, float]: The timing phases in seconds.
+
+    Raises:
+        MeasurementError: If the measurement fails.
+    """
+    if config.engine == 'native':
+        return measure_with_native(url, resolver=config.resolver)
+    return measure_with_curl(config.command_paths['curl'], url, config.resolver)
@@ -6,6 +6,8 @@ granular and descriptive error handling tailored to the application's domain log
 
 Classes:
 - CustomException: A custom exception class used for specific error scenarios in the application.
+- MeasurementError: Raised when a timing engine is unable to complete a measurement.
+- ConnectionReusedError: Raised when a batched curl transfer reused a connection instead of opening a new one.
 """
 
 
@@ -19,3 +21,27 @@ class CustomException(Exception):
     Inherits from:
         Exception: The base class for all built-in exceptions.
     """
+
+
+class MeasurementError(CustomException):
+    """
+    An exception raised when a timing engine is unable to complete a measurement.
+
+    This covers DNS failures, connection errors, TLS errors, malformed responses and
+    curl exiting with a non-zero status.
+
+    Inherits from:
+        CustomException: The base class for application specific exceptions.
+    """
+
+
+class ConnectionReusedError(MeasurementError):
+    """
+    An exception raised when a batched curl transfer reused an open connection instead of opening a new one.
+
+    Curl keeps connections open between the transfers of a batch when the server ignores Connection: close
+    (as HTTP/2 always does), so the sample has no connect or TLS time and has to be measured again.
+
+    Inherits from:
+        MeasurementError: The base class for measurement errors.
+    """
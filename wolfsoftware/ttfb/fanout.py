@@ -0,0 +1,96 @@
+"""
+This module handles the per-address mode of the URL timing analysis program.
+
+A host name often resolves to several addresses (multiple A/AAAA records, or IPv4 and IPv6), and the
+normal modes measure whichever address the resolver happens to return. In per-address mode the host is
+resolved once and every address is measured in parallel, each with its own resolver pinned to that single
+address, so a slow or broken address shows up in its own breakdown instead of as noise in the overall results.
+
+Functions:
+- process_url_per_address: Validates the URL and runs the per-address mode.
+- display_address_timing: Measures every address of the URL's host and displays the results.
+
+Modules:
+- api: Imports run_measurement to run the per-address mode, which display_address_timing is a thin wrapper over.
+- display: Imports draw_line to draw formatted lines.
+- engine: Imports HttpConnection to find the host and port of the URL.
+- formatting: Imports the formatting functions shared with the other modes.
+- output: Imports open_record_writer and fatal_error for the machine-readable output formats.
+- resolver: Imports format_address to display each address.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+from typing import Optional
+
+from .api import Result, Sample, run_measurement
+from .display import draw_line
+from .engine import HttpConnection
+from .exceptions import MeasurementError
+from .formatting import display_header, format_aggregate_line, format_summary_lines, select_phases
+from .output import RecordWriter, fatal_error, open_record_writer
+from .resolver import format_address
+from .utils import validate_url
+
+
+def process_url_per_address(config: SimpleNamespace) -> None:
+    """
+    Process a URL by measuring every address its host resolves to.
+
+    This function validates the URL specified in the configuration and displays the per-address timing information.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and other settings.
+    """
+    validate_url(config.url)
+    display_address_timing(config)
+
+
+def display_address_timing(config: SimpleNamespace) -> None:
+    """
+    Display timing information for every address the host of the URL resolves to.
+
+    A line showing the aggregate for each address is displayed once every address has been measured,
+    followed by the summary statistics of each reachable address for runs of more than one sample. With a
+    machine-readable output format a record is written for each sample and the summary records of each address.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing settings such as the URL, engine, resolver and sample count.
+
+    Exits:
+        If the host cannot be resolved, displays an error message and exits the program.
+    """
+    connection: HttpConnection = HttpConnection.from_url(config.url)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    try:
+        addresses: list[str] = config.resolver.addresses(connection.host, connection.port)
+    except MeasurementError as err:
+        fatal_error(writer, f"{config.url} could not be reached - aborting ({err})")
+
+    display_header(config, f"Results for {config.url} across {len(addresses)} addresses")
+
+    def on_sample(sample: Sample) -> None:
+        if writer is not None:
+            writer.result(config.url, sample.index, sample.timings if sample.timings is not None else MeasurementError(sample.error),
+                          address=sample.address)
+
+    phases: tuple[str, ...] = select_phases(config)
+    result: Result = run_measurement(config, on_sample)
+    for address, aggregate in result.aggregates.items():
+        if writer is not None:
+            writer.summary(config.url, aggregate, address=address)
+        else:
+            print(format_aggregate_line(format_address(address), aggregate, phases))
+
+    if writer is not None:
+        writer.finish()
+        return
+
+    if any(aggregate.count > 1 for aggregate in result.aggregates.values()):
+        for address, aggregate in result.aggregates.items():
+            if aggregate.count == 0:
+                continue
+            print(draw_line(width=config.screen_width))
+            for line in format_summary_lines(aggregate, phases, title=f"{format_address(address)} Samples"):
+                print(line)
+    print(draw_line(width=config.screen_width))
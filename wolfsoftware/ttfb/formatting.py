@@ -0,0 +1,138 @@
+"""
+This module provides the formatting of the results shared by the display of every mode of the URL timing analysis program.
+
+The helpers only format (or, for display_header, print) results they are given and depend on nothing which takes
+measurements, so the modes, the history queries and the monitor can share them without importing each other or the
+library API.
+
+Functions:
+- select_phases: Selects the timing phases to display for the configured output mode.
+- format_timing_line: Formats a single sample in the layout of the original curl templates.
+- format_summary_lines: Formats the summary statistics of an aggregate as a table.
+- format_interval_line: Formats a periodic summary line for long runs.
+- format_aggregate_line: Formats the aggregate of a single URL (or address) on one line.
+- display_header: Displays the results header with a subtitle.
+
+Modules:
+- types.SimpleNamespace: Used to handle configuration settings.
+- display: Imports draw_line to draw formatted lines.
+- globals: Imports global constants like SCRIPT_TITLE and the timing phase definitions.
+- stats: Imports TimingAggregate and SUMMARY_STATISTICS to format the summary statistics.
+- tracing: Imports span to record the rendering of the header with --trace.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+
+from .display import draw_line
+from .globals import DEFAULT_PHASES, FULL_PHASES, MINIMAL_PHASES, PHASE_LABELS, SCRIPT_TITLE
+from .stats import SUMMARY_STATISTICS, TimingAggregate
+from .tracing import span
+
+
+def select_phases(config: SimpleNamespace) -> tuple[str, ...]:
+    """
+    Select the timing phases to display based on the output mode in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the minimal and full flags.
+
+    Returns:
+        tuple[str, ...]: The names of the timing phases to display.
+    """
+    if config.minimal:
+        return MINIMAL_PHASES
+    if config.full:
+        return FULL_PHASES
+    return DEFAULT_PHASES
+
+
+def format_timing_line(sample: dict[str, float], phases: tuple[str, ...]) -> str:
+    """
+    Format a single sample in the same layout as the original curl -w templates.
+
+    Arguments:
+        sample (dict[str, float]): The timing phases (in seconds) of a single sample.
+        phases (tuple[str, ...]): The names of the timing phases to include.
+
+    Returns:
+        str: The formatted line.
+    """
+    return '  ' + '   '.join(f"{PHASE_LABELS[phase]}: {sample[phase]:.6f}" for phase in phases)
+
+
+def format_summary_lines(aggregate: TimingAggregate, phases: tuple[str, ...], title: str = 'Samples') -> list[str]:
+    """
+    Format the summary statistics of an aggregate as a table with one column per timing phase.
+
+    Arguments:
+        aggregate (TimingAggregate): The aggregate to summarise.
+        phases (tuple[str, ...]): The names of the timing phases to include.
+        title (str): The title shown in front of the number of samples.
+
+    Returns:
+        list[str]: The formatted lines, the sample counts and a header line followed by one line per statistic.
+    """
+    summaries: dict[str, dict[str, float]] = {phase: aggregate.summary(phase) for phase in phases}
+    widths: dict[str, int] = {phase: max(len(PHASE_LABELS[phase]), 10) for phase in phases}
+
+    lines: list[str] = [f"  {title}: {aggregate.count}   Errors: {aggregate.errors}"]
+    lines.append('  ' + 'Statistic'.ljust(10) + ''.join(f"   {PHASE_LABELS[phase]:>{widths[phase]}}" for phase in phases))
+    for statistic in SUMMARY_STATISTICS:
+        lines.append('  ' + statistic.ljust(10) + ''.join(f"   {summaries[phase][statistic]:>{widths[phase]}.6f}" for phase in phases))
+    return lines
+
+
+def format_interval_line(elapsed: float, aggregate: TimingAggregate, phases: tuple[str, ...]) -> str:
+    """
+    Format a periodic summary line showing the median of each timing phase over an interval.
+
+    Arguments:
+        elapsed (float): The number of seconds since the run started.
+        aggregate (TimingAggregate): The aggregate of the samples taken during the interval.
+        phases (tuple[str, ...]): The names of the timing phases to include.
+
+    Returns:
+        str: The formatted line.
+    """
+    line: str = f"  [{elapsed:>9.1f}s] Samples: {aggregate.count}   Errors: {aggregate.errors}"
+    if aggregate.count == 0:
+        return line
+    return line + '   p50 ' + '   '.join(f"{PHASE_LABELS[phase]}: {aggregate.summary(phase)['p50']:.6f}" for phase in phases)
+
+
+def format_aggregate_line(label: str, aggregate: TimingAggregate, phases: tuple[str, ...]) -> str:
+    """
+    Format the aggregate for a single URL, showing the mean of each timing phase.
+
+    Arguments:
+        label (str): The label for the line, usually the URL.
+        aggregate (TimingAggregate): The aggregate to format.
+        phases (tuple[str, ...]): The names of the timing phases to include.
+
+    Returns:
+        str: The formatted line.
+    """
+    line: str = f"  {label}   Samples: {aggregate.count}   Errors: {aggregate.errors}"
+    if aggregate.count == 0:
+        return f"{line}   Last Error: {aggregate.last_error}"
+    return line + ''.join(f"   {PHASE_LABELS[phase]}: {aggregate.phases[phase].mean:.6f}" for phase in phases)
+
+
+def display_header(config: SimpleNamespace, subtitle: str) -> None:
+    """
+    Display the results header, the script title and a subtitle between two lines.
+
+    Nothing is displayed when a machine-readable output format is selected.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the screen width and output format.
+        subtitle (str): The subtitle, usually describing what is being tested.
+    """
+    if config.output != 'text':
+        return
+    with span('render', 'output'):
+        print(draw_line(width=config.screen_width))
+        print(draw_line(width=config.screen_width, text=SCRIPT_TITLE, fill_char=' '))
+        print(draw_line(width=config.screen_width, text=subtitle, fill_char=' '))
+        print(draw_line(width=config.screen_width))
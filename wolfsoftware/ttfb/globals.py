@@ -5,32 +5,173 @@ The main purpose of this module is to define constants that are used throughout
 such as the program name, description, and version information. It also checks for prerequisite
 commands needed for the program to run.
 
+Looking up the version imports importlib.metadata, which costs more than the rest of the program's
+start-up, so the version is only looked up (once) when it is actually needed.
+
+Functions:
+- get_version: Returns the current version of the 'wolfsoftware.ttfb' package, or 'unknown' if the package is not found.
+- get_version_string: Returns a formatted string displaying the current version of the program.
+- get_user_agent: Returns the User-Agent header sent by the native engine.
+
 Modules and Constants:
-- importlib.metadata: Used to retrieve package version information.
-- version: The current version of the 'wolfsoftware.ttfb' package, or 'unknown' if the package is not found.
 - ARG_PARSER_PROG_NAME: The program name for the argument parser.
 - ARG_PARSER_DESCRIPTION: The description of the program for the argument parser.
 - ARG_PARSER_EPILOG: The epilog for the argument parser.
-- VERSION_STRING: A formatted string displaying the current version of the program.
 - SCRIPT_TITLE: The title of the script, used in the output display.
 - prerequisite_commands: A list of commands that are required for the program to run.
-
-Exceptions:
-- importlib.metadata.PackageNotFoundError: If the 'wolfsoftware.ttfb' package is not found.
+- TIMING_PHASES: The timing phases reported for every sample, in the order curl reports them.
+- PHASE_LABELS: The display label used for each timing phase.
+- MINIMAL_PHASES / DEFAULT_PHASES / FULL_PHASES: The phases shown by each output mode.
+- MAX_COUNT: The maximum number of samples that can be requested with --count.
+- PER_SAMPLE_LINE_LIMIT: Runs with more samples than this display periodic summary lines instead of a line per sample.
+- DEFAULT_MAX_SAMPLES: The default maximum number of samples taken with --target-precision.
+- PRECISION_STATISTICS: The percentiles that --target-precision can be applied to.
+- DEFAULT_SUMMARY_INTERVAL: The default number of seconds between periodic summary lines.
+- BODY_METRICS: The metrics of the body reported by the body mode.
+- BODY_THRESHOLDS: The body sizes (in bytes) the body mode reports the time to, the first 14 KB being roughly the initial TCP congestion window.
+- BODY_LABELS: The display titles of the body metrics.
+- DEFAULT_TIMELINE_SIZE: The most points kept in the arrival timeline of a body with --timeline.
+- CACHE_STATUS_HEADERS: The response headers the cache mode reads the cache status from, in order of preference.
+- CACHE_HIT_VALUES: The words of a cache status header that mean the response was served by a cache.
+- CACHE_MISS_VALUES: The words of a cache status header that mean the response was fetched from the origin.
+- CACHE_BUST_PARAMETER: The query string parameter the cache mode adds a unique token to, so that no cache has the response.
+- CACHE_SERIES: The series of samples taken by the cache mode, without and with a cache-busting token.
+- CONNECTION_KINDS: The kinds of sample reported by the keep-alive, redirects and cache modes and their display titles.
+- DEFAULT_VALIDATION_TTL: The default number of seconds a successfully reached URL stays in the validation cache.
+- DEFAULT_MONITOR_INTERVAL: The default number of seconds between probes of each target in the monitor (ttfb serve).
+- DEFAULT_RING_SIZE: The default number of recent samples the monitor keeps for each target.
+- DEFAULT_METRICS_PORT: The default port the monitor serves the /metrics endpoint on.
+- DEFAULT_TREND_PERIOD: The default length (in seconds) of each period reported by ttfb trend.
+- DEFAULT_TREND_WINDOW: The default time window (in seconds before now) reported by ttfb trend.
+- DEFAULT_COMPARE_COUNT: The default number of pairs of samples taken by ttfb compare.
+- DEFAULT_COMPARE_THRESHOLD: The default slowdown (as a fraction) of B over A that ttfb compare treats as a regression.
+- COMPARE_ORDERS: The orders ttfb compare can measure each pair of samples in.
+- ENGINES: The available timing engines, the first entry is the default.
+- OUTPUT_FORMATS: The available output formats, the first entry (formatted text) is the default.
+- MODE_SEQUENTIAL, MODE_KEEP_ALIVE, MODE_RATE, MODE_PER_ADDRESS, MODE_REDIRECTS, MODE_BODY, MODE_CACHE_SPLIT: The names of
+  the measurement modes of the library API (see api.measure).
+- MODES: The measurement modes of the library API, the first entry is the default.
+- DEFAULT_TIMEOUT: The socket timeout (in seconds) used by the native engine.
+- MAX_REDIRECTS: The maximum number of redirects the native engine will follow.
 """
 
-import importlib.metadata
-
-try:
-    version: str = importlib.metadata.version('wolfsoftware.ttfb')
-except importlib.metadata.PackageNotFoundError:
-    version = 'unknown'
+import functools
 
 ARG_PARSER_PROG_NAME: str = "ttfb"
 ARG_PARSER_DESCRIPTION: str = "Display the time-to-first-byte for any given url."
 ARG_PARSER_EPILOG: str = "The Epilog goes here"
 
-VERSION_STRING: str = "Current version of " + ARG_PARSER_PROG_NAME + " is v" + version
-
 SCRIPT_TITLE = "Time to First Byte Tester"
 prerequisite_commands: list[str] = ["curl"]
+
+TIMING_PHASES: tuple[str, ...] = ('namelookup', 'connect', 'appconnect', 'pretransfer', 'redirect', 'starttransfer', 'total')
+PHASE_LABELS: dict[str, str] = {
+    'namelookup': 'Lookup Time',
+    'connect': 'Connect Time',
+    'appconnect': 'AppCon Time',
+    'pretransfer': 'PreXfer Time',
+    'redirect': 'Redirect Time',
+    'starttransfer': 'StartXfer Time (TTFB)',
+    'total': 'Total Time',
+}
+MINIMAL_PHASES: tuple[str, ...] = ('starttransfer', 'total')
+DEFAULT_PHASES: tuple[str, ...] = ('namelookup', 'connect', 'starttransfer', 'total')
+FULL_PHASES: tuple[str, ...] = TIMING_PHASES
+
+MAX_COUNT: int = 1000000
+PER_SAMPLE_LINE_LIMIT: int = 25
+DEFAULT_MAX_SAMPLES: int = 1000
+PRECISION_STATISTICS: tuple[str, ...] = ('p50', 'p90', 'p99')
+DEFAULT_SUMMARY_INTERVAL: float = 10.0
+
+DEFAULT_VALIDATION_TTL: float = 3600.0
+
+DEFAULT_MONITOR_INTERVAL: float = 60.0
+DEFAULT_RING_SIZE: int = 120
+DEFAULT_METRICS_PORT: int = 9155
+
+DEFAULT_TREND_PERIOD: float = 86400.0
+DEFAULT_TREND_WINDOW: float = 604800.0
+
+DEFAULT_COMPARE_COUNT: int = 30
+DEFAULT_COMPARE_THRESHOLD: float = 0.05
+COMPARE_ORDERS: list[str] = ["abba", "random"]
+
+BODY_METRICS: tuple[str, ...] = ('bytes', 'throughput', 'first_1k', 'first_14k', 'first_100k')
+BODY_THRESHOLDS: dict[str, int] = {'first_1k': 1024, 'first_14k': 14336, 'first_100k': 102400}
+BODY_LABELS: dict[str, str] = {
+    'bytes': 'Body Bytes',
+    'throughput': 'Throughput (MB/s)',
+    'first_1k': 'First 1 KB',
+    'first_14k': 'First 14 KB',
+    'first_100k': 'First 100 KB',
+}
+DEFAULT_TIMELINE_SIZE: int = 32
+
+CACHE_STATUS_HEADERS: tuple[str, ...] = (
+    'cache-status', 'cf-cache-status', 'x-cache', 'x-cache-status', 'x-proxy-cache', 'x-vercel-cache', 'x-drupal-cache', 'cdn-cache'
+)
+CACHE_HIT_VALUES: frozenset = frozenset(('hit', 'updating'))
+CACHE_MISS_VALUES: frozenset = frozenset(('miss', 'expired', 'bypass', 'dynamic', 'pass', 'fwd', 'refreshhit', 'revalidated', 'uncacheable'))
+CACHE_BUST_PARAMETER: str = 'ttfb-cache-bust'
+CACHE_SERIES: tuple[str, ...] = ('warm', 'busted')
+
+CONNECTION_KINDS: dict[str, str] = {
+    'cold': 'Cold connections (new connection)',
+    'resumed': 'Resumed connections (new connection, TLS session resumed)',
+    'warm': 'Warm connections (reused connection)',
+    'redirected': 'Redirect chain (followed from the original URL)',
+    'direct': 'Final target (measured directly, redirects cached)',
+    'hit': 'Cache hits (served by a cache)',
+    'miss': 'Cache misses (fetched from the origin)',
+    'unknown': 'Cache status unknown (no cache status headers)',
+}
+
+ENGINES: list[str] = ["curl", "native"]
+OUTPUT_FORMATS: list[str] = ["text", "json", "jsonl", "csv", "prom"]
+MODE_SEQUENTIAL: str = 'sequential'
+MODE_KEEP_ALIVE: str = 'keep-alive'
+MODE_RATE: str = 'rate'
+MODE_PER_ADDRESS: str = 'per-address'
+MODE_REDIRECTS: str = 'redirects'
+MODE_BODY: str = 'body'
+MODE_CACHE_SPLIT: str = 'cache-split'
+MODES: list[str] = [MODE_SEQUENTIAL, MODE_KEEP_ALIVE, MODE_RATE, MODE_PER_ADDRESS, MODE_REDIRECTS, MODE_BODY, MODE_CACHE_SPLIT]
+DEFAULT_TIMEOUT: float = 30.0
+MAX_REDIRECTS: int = 50
+
+
+@functools.lru_cache(maxsize=None)
+def get_version() -> str:
+    """
+    Return the current version of the 'wolfsoftware.ttfb' package.
+
+    Returns:
+        str: The version, or 'unknown' if the package is not found.
+    """
+    import importlib.metadata  # pylint: disable=import-outside-toplevel
+
+    try:
+        return importlib.metadata.version('wolfsoftware.ttfb')
+    except importlib.metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def get_version_string() -> str:
+    """
+    Return a formatted string displaying the current version of the program.
+
+    Returns:
+        str: The version string.
+    """
+    return "Current version of " + ARG_PARSER_PROG_NAME + " is v" + get_version()
+
+
+def get_user_agent() -> str:
+    """
+    Return the User-Agent header sent by the native engine.
+
+    Returns:
+        str: The User-Agent header value.
+    """
+    return ARG_PARSER_PROG_NAME + "/" + get_version()
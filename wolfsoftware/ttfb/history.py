@@ -0,0 +1,487 @@
+"""
+This module provides the history store of the URL timing analysis program.
+
+Every sample of a run can be saved (with --history) to a compact, append-only store so that later runs
+can be compared with earlier ones without keeping text logs. The store is a directory holding three files:
+
+- samples.bin: Fixed-width sample records (see RECORD), appended in blocks of consecutive samples of a single URL.
+- index.bin: A fixed-width entry (see INDEX_ENTRY) for each block, holding the hash of the URL, the time range
+  of the block and where the block is in samples.bin.
+- urls.txt: The URLs in the store, one per line, so the hashes in the index can be mapped back to URLs.
+
+Queries scan the (small) index for the blocks of the URL that overlap the time window and only read those
+blocks, through a memory map of samples.bin, into a TimingAggregate, so a query never loads the samples of
+other URLs or other times and its memory use stays bounded however many samples the store holds. Appends
+are serialised with an exclusive lock on the index file, so several runs (and the worker processes of
+--workers) can write to the same store at once.
+
+Each record holds the time the sample completed, the kind of connection (keep-alive mode), whether the sample
+failed and each of TIMING_PHASES as a 32-bit float, which is 40 bytes per sample. Error messages are not stored.
+
+Classes:
+- HistoryStore: Appends blocks of samples to the store and answers queries over a URL and time window.
+- HistoryWriter: Buffers the samples of a run and appends them to the store in blocks.
+
+Functions:
+- get_history_dir: Returns the default directory of the history store.
+- url_hash: Returns the 64-bit hash of a URL used in the index.
+- open_history_writer: Returns a history writer if saving to the history store is enabled in the configuration.
+- format_timestamp: Formats a time as a UTC date and time.
+- display_history: Displays the URLs in the store, or the summary statistics of a URL over a time window.
+- display_trend: Displays the percentiles of a timing phase of a URL for each period of a time window.
+
+Modules:
+- hashlib: Used to hash the URLs for the index.
+- mmap: Used to read the blocks of samples without reading the whole store.
+- struct: Used to pack and unpack the fixed-width records and index entries.
+- display: Imports draw_line and error_message to draw formatted lines and display error messages.
+- formatting: Imports the formatting functions shared with the other modes.
+- stats: Imports TimingAggregate to calculate the summary statistics of the stored samples.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import contextlib
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from types import SimpleNamespace
+from typing import IO, Iterator, Optional, Union
+
+from .display import draw_line, error_message
+from .exceptions import MeasurementError
+from .globals import CONNECTION_KINDS, PHASE_LABELS, TIMING_PHASES
+from .formatting import display_header, format_summary_lines, select_phases
+from .stats import TimingAggregate
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
+RECORD: struct.Struct = struct.Struct('<d7fBBxx')
+INDEX_ENTRY: struct.Struct = struct.Struct('<QddQI4x')
+SAMPLES_FILE: str = 'samples.bin'
+INDEX_FILE: str = 'index.bin'
+URLS_FILE: str = 'urls.txt'
+BLOCK_SIZE: int = 4096
+FLUSH_INTERVAL: float = 10.0
+KINDS: tuple[str, ...] = ('',) + tuple(CONNECTION_KINDS)
+FLAG_ERROR: int = 1
+TREND_PERCENTILES: tuple[str, ...] = ('p50', 'p90', 'p99')
+
+
+def get_history_dir() -> str:
+    """
+    Return the default directory of the history store.
+
+    Uses $XDG_DATA_HOME/ttfb/history if XDG_DATA_HOME is set, otherwise ~/.local/share/ttfb/history. Unlike the
+    caches the history is not disposable, so it is kept with the user's data rather than in the cache directory.
+
+    Returns:
+        str: The path of the history directory (which may not exist yet).
+    """
+    base: str = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'ttfb', 'history')
+
+
+def url_hash(url: str) -> int:
+    """
+    Return the 64-bit hash of a URL used to find its blocks in the index.
+
+    Arguments:
+        url (str): The URL.
+
+    Returns:
+        int: The hash.
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode('UTF-8'), digest_size=8).digest(), 'little')
+
+
+@contextlib.contextmanager
+def _locked(f: IO) -> Iterator[None]:
+    """
+    Hold an exclusive lock on an open file (where file locking is available).
+
+    Arguments:
+        f (IO): The open file.
+
+    Yields:
+        None: The lock is held until the context exits.
+    """
+    if fcntl is None:
+        yield
+        return
+
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _truncate_partial(f: IO, size: int) -> int:
+    """
+    Drop a partially written entry (left by a run that was killed mid-write) from the end of a file.
+
+    Arguments:
+        f (IO): The file, open for appending.
+        size (int): The size of the entries in the file.
+
+    Returns:
+        int: The number of whole entries in the file.
+    """
+    length: int = f.seek(0, os.SEEK_END)
+    if length % size:
+        f.truncate(length - length % size)
+    return length // size
+
+
+class HistoryStore:
+    """
+    Appends blocks of samples to the history store and answers queries over a URL and time window.
+
+    See the module documentation for the layout of the store.
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        """
+        Initialise the store, the files are only created when the first block is appended.
+
+        Arguments:
+            directory (Optional[str]): The directory of the store, or None for the default (see get_history_dir).
+        """
+        self.directory: str = directory or get_history_dir()
+        self._known: Optional[set[int]] = None
+
+    def _path(self, name: str) -> str:
+        """
+        Return the path of one of the files of the store.
+
+        Arguments:
+            name (str): The name of the file.
+
+        Returns:
+            str: The path.
+        """
+        return os.path.join(self.directory, name)
+
+    def append(self, url: str, records: list[tuple[float, str, Optional[dict[str, float]]]]) -> None:
+        """
+        Append a block of samples of a single URL to the store.
+
+        Arguments:
+            url (str): The URL the samples were taken from.
+            records (list[tuple[float, str, Optional[dict[str, float]]]]): The completion time, kind of connection and timing
+                                                                           phases (or None for a failed sample) of each sample.
+
+        Raises:
+            OSError: If the store cannot be written.
+        """
+        if not records:
+            return
+
+        data: bytes = b''.join(
+            RECORD.pack(timestamp, *(timings[phase] if timings is not None else 0.0 for phase in TIMING_PHASES),
+                        KINDS.index(kind) if kind in KINDS else 0, FLAG_ERROR if timings is None else 0)
+            for timestamp, kind, timings in records
+        )
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(INDEX_FILE), 'ab') as index, _locked(index), open(self._path(SAMPLES_FILE), 'ab') as samples:
+            first: int = _truncate_partial(samples, RECORD.size)
+            samples.write(data)
+            samples.flush()
+
+            key: int = url_hash(url)
+            if key not in self._known_urls():
+                with open(self._path(URLS_FILE), 'a', encoding='UTF-8') as urls:
+                    urls.write(f"{url}\n")
+                self._known_urls().add(key)
+
+            _truncate_partial(index, INDEX_ENTRY.size)
+            index.write(INDEX_ENTRY.pack(key, records[0][0], records[-1][0], first, len(records)))
+
+    def _known_urls(self) -> set[int]:
+        """
+        Return the hashes of the URLs listed in urls.txt, reading it on first use.
+
+        Returns:
+            set[int]: The hashes.
+        """
+        if self._known is None:
+            self._known = {url_hash(url) for url in self.urls()}
+        return self._known
+
+    def urls(self) -> list[str]:
+        """
+        Return the URLs in the store, in the order they were first saved.
+
+        Returns:
+            list[str]: The URLs.
+        """
+        try:
+            with open(self._path(URLS_FILE), 'r', encoding='UTF-8') as f:
+                return list(dict.fromkeys(line.rstrip('\n') for line in f if line.strip()))
+        except OSError:
+            return []
+
+    def blocks(self) -> Iterator[tuple[int, float, float, int, int]]:
+        """
+        Yield the index entry of every block in the store.
+
+        Yields:
+            tuple[int, float, float, int, int]: The hash of the URL, the time of the first and last samples and the
+                                                position and number of the samples in samples.bin.
+        """
+        try:
+            with open(self._path(INDEX_FILE), 'rb') as f:
+                data: bytes = f.read()
+        except OSError:
+            return
+        yield from INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size])
+
+    def samples(self, url: str, since: float = 0.0, until: float = math.inf) -> Iterator[tuple[float, str, Optional[dict[str, float]]]]:
+        """
+        Yield the samples of a URL that completed within a time window, oldest block first.
+
+        Only the blocks of the URL that overlap the window are read, one block at a time.
+
+        Arguments:
+            url (str): The URL.
+            since (float): The start of the window (seconds since the epoch).
+            until (float): The end of the window (seconds since the epoch).
+
+        Yields:
+            tuple[float, str, Optional[dict[str, float]]]: The completion time, kind of connection and timing phases
+                                                           (or None for a failed sample) of each sample.
+        """
+        key: int = url_hash(url)
+        blocks: list[tuple[int, int]] = [(first, count) for block_key, start, end, first, count in self.blocks()
+                                         if block_key == key and end >= since and start <= until]
+        if not blocks:
+            return
+
+        with open(self._path(SAMPLES_FILE), 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for first, count in blocks:
+                for record in RECORD.iter_unpack(data[first * RECORD.size:(first + count) * RECORD.size]):
+                    if since <= record[0] <= until:
+                        yield record[0], KINDS[record[8]] if record[8] < len(KINDS) else '', \
+                            None if record[9] & FLAG_ERROR else dict(zip(TIMING_PHASES, record[1:8]))
+
+    def aggregate(self, url: str, since: float = 0.0, until: float = math.inf) -> TimingAggregate:
+        """
+        Return the aggregate of the samples of a URL that completed within a time window.
+
+        Arguments:
+            url (str): The URL.
+            since (float): The start of the window (seconds since the epoch).
+            until (float): The end of the window (seconds since the epoch).
+
+        Returns:
+            TimingAggregate: The aggregate of the samples.
+        """
+        aggregate: TimingAggregate = TimingAggregate()
+        for _, _, timings in self.samples(url, since, until):
+            if timings is None:
+                aggregate.add_error('')
+            else:
+                aggregate.add(timings)
+        return aggregate
+
+
+class HistoryWriter:
+    """
+    Buffers the samples of a run and appends them to the history store in blocks.
+
+    The samples of each URL are appended once BLOCK_SIZE of them have been buffered, once FLUSH_INTERVAL seconds
+    have passed or when the writer is closed, whichever comes first. The writer is thread-safe. A problem
+    writing the store is displayed once and the rest of the samples are then discarded, the run itself carries on.
+    """
+
+    def __init__(self, store: HistoryStore) -> None:
+        """
+        Initialise the writer.
+
+        Arguments:
+            store (HistoryStore): The store to append the samples to.
+        """
+        self.store: HistoryStore = store
+        self._buffers: dict[str, list[tuple[float, str, Optional[dict[str, float]]]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._last_flush: float = time.monotonic()
+        self._failed: bool = False
+
+    def add(self, url: str, timings: Optional[dict[str, float]], kind: str = '') -> None:
+        """
+        Add a sample.
+
+        Arguments:
+            url (str): The URL the sample was taken from.
+            timings (Optional[dict[str, float]]): The timing phases in seconds, or None if the sample failed.
+            kind (str): The kind of connection used in keep-alive mode.
+        """
+        with self._lock:
+            buffer: list = self._buffers.setdefault(url, [])
+            buffer.append((time.time(), kind, timings))
+            if len(buffer) >= BLOCK_SIZE or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+
+    def result(self, url: str,
+               index: int, result: Union[dict[str, float], MeasurementError], kind: str = '', address: str = '') -> None:  # pylint: disable=unused-argument
+        """
+        Add the result of a sample, with the same arguments as RecordWriter.result so it can be used as the same callback.
+
+        Arguments:
+            url (str): The URL the sample was taken from.
+            index (int): The index of the sample (not stored).
+            result (Union[dict[str, float], MeasurementError]): The timing phases, or the error if the sample failed.
+            kind (str): The kind of connection used in keep-alive mode.
+            address (str): The address the host was pinned to in per-address mode (not stored).
+        """
+        self.add(url, None if isinstance(result, MeasurementError) else result, kind)
+
+    def close(self) -> None:
+        """Append any buffered samples to the store."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Append the buffered samples of every URL to the store, the caller must hold the lock."""
+        buffers: dict[str, list] = self._buffers
+        self._buffers = {}
+        self._last_flush = time.monotonic()
+        if self._failed:
+            return
+
+        try:
+            for url, records in buffers.items():
+                self.store.append(url, records)
+        except OSError as err:
+            self._failed = True
+            print(error_message(f"Could not save to the history store, the samples will not be saved: {err}"), file=sys.stderr)
+
+
+def open_history_writer(config: SimpleNamespace) -> Optional[HistoryWriter]:
+    """
+    Return a history writer if saving to the history store is enabled in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the history settings.
+
+    Returns:
+        Optional[HistoryWriter]: The writer, or None if the history is not enabled.
+    """
+    if not config.history:
+        return None
+    return HistoryWriter(HistoryStore(config.history_dir))
+
+
+def format_timestamp(timestamp: float) -> str:
+    """
+    Format a time as a UTC date and time.
+
+    Arguments:
+        timestamp (float): The time (seconds since the epoch).
+
+    Returns:
+        str: The formatted time.
+    """
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(timestamp))
+
+
+def _window(config: SimpleNamespace) -> tuple[float, float]:
+    """
+    Return the time window of a query.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the since and until durations (ago), or None.
+
+    Returns:
+        tuple[float, float]: The start and end of the window (seconds since the epoch).
+    """
+    now: float = time.time()
+    return (now - config.since if config.since else 0.0), (now - config.until if config.until else now)
+
+
+def display_history(config: SimpleNamespace) -> None:
+    """
+    Display the URLs in the history store, or the summary statistics of a single URL over a time window.
+
+    Without a URL every URL in the store is listed with its number of samples and the time of its first and
+    last samples, which only needs the index. With a URL the summary statistics of its samples within the window
+    are displayed, in the same layout as a normal run.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the store directory, URL, time window and output mode.
+    """
+    store: HistoryStore = HistoryStore(config.history_dir)
+
+    if not config.url:
+        display_header(config, f"History in {store.directory}")
+        totals: dict[int, list[float]] = {}
+        for key, start, end, _, count in store.blocks():
+            total: list[float] = totals.setdefault(key, [0, start, end])
+            total[0] += count
+            total[1] = min(total[1], start)
+            total[2] = max(total[2], end)
+        for url in store.urls():
+            if url_hash(url) in totals:
+                count, start, end = totals[url_hash(url)]
+                print(f"  {url}   Samples: {count:.0f}   First: {format_timestamp(start)}   Last: {format_timestamp(end)}")
+        if not totals:
+            print("  No samples have been saved")
+        print(draw_line(width=config.screen_width))
+        return
+
+    since, until = _window(config)
+    display_header(config, f"History for {config.url} from {format_timestamp(since) if since else 'the start'} to {format_timestamp(until)} (UTC)")
+    aggregate: TimingAggregate = store.aggregate(config.url, since, until)
+    if aggregate.count == 0:
+        print(f"  Samples: 0   Errors: {aggregate.errors}")
+    else:
+        for line in format_summary_lines(aggregate, select_phases(config)):
+            print(line)
+    print(draw_line(width=config.screen_width))
+
+
+def display_trend(config: SimpleNamespace) -> None:
+    """
+    Display the percentiles of a timing phase of a URL for each period (of config.bucket seconds) of a time window.
+
+    The periods are aligned to multiples of their length since the epoch, so the same periods are reported by
+    every query, and the change in the median from the previous period is shown alongside each one.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the store directory, URL, time window, period length and phase.
+    """
+    store: HistoryStore = HistoryStore(config.history_dir)
+    since, until = _window(config)
+    display_header(config, f"{PHASE_LABELS[config.phase]} trend for {config.url}")
+
+    periods: dict[float, TimingAggregate] = {}
+    for timestamp, _, timings in store.samples(config.url, since, until):
+        aggregate: TimingAggregate = periods.setdefault(timestamp - timestamp % config.bucket, TimingAggregate())
+        if timings is None:
+            aggregate.add_error('')
+        else:
+            aggregate.add(timings)
+
+    print(f"  {'Period (UTC)':<19}   {'Samples':>9}   {'Errors':>9}" + ''.join(f"   {name:>10}" for name in TREND_PERCENTILES) + f"   {'p50 Change':>10}")
+    previous: Optional[float] = None
+    for start in sorted(periods):
+        aggregate = periods[start]
+        line: str = f"  {format_timestamp(start)}   {aggregate.count:>9}   {aggregate.errors:>9}"
+        if aggregate.count:
+            summary: dict[str, float] = aggregate.summary(config.phase)
+            change: str = f"{(summary['p50'] - previous) / previous:+.1%}" if previous else '-'
+            line += ''.join(f"   {summary[name]:>10.6f}" for name in TREND_PERCENTILES) + f"   {change:>10}"
+            previous = summary['p50']
+        print(line)
+    if not periods:
+        print("  No samples in the time window")
+    print(draw_line(width=config.screen_width))
@@ -11,15 +11,14 @@ Functions:
 Modules:
 - sys: Provides access to system-specific parameters and functions.
 - run: The main function that executes the core logic of the program, imported from the cli module.
-- system: A function to display system notifications, imported from the notify module.
+- system_message: A function to display system notifications, imported from the display module.
 """
 # pylint: disable=relative-beyond-top-level
 
 import sys
 
-from wolfsoftware.notify import system_message
-
 from .cli import run
+from .display import system_message
 
 
 def main() -> None:
@@ -0,0 +1,318 @@
+"""
+This module handles the long-running monitor mode (ttfb serve) of the URL timing analysis program.
+
+The monitor keeps probing a set of targets (URLs), each on its own interval, and serves the results on a
+local HTTP /metrics endpoint in the Prometheus text exposition format, so the history is kept by whatever
+scrapes the endpoint rather than lost between cron runs.
+
+A single asyncio event loop schedules every probe and serves the endpoint, the blocking measurements are
+handed to a fixed-size thread pool and always use the native engine, so there is no process per check.
+The first probe of each target is staggered across its interval to spread the load. Memory use is flat
+however long the monitor runs: each target keeps its recent samples in a fixed-size ring buffer (a deque)
+and a fixed set of histogram buckets per timing phase.
+
+Classes:
+- MonitorTarget: The URL, interval, recent samples and histograms of a single target.
+
+Functions:
+- read_targets: Reads the targets to monitor from a file.
+- format_metrics: Formats the metrics of every target in the Prometheus text exposition format.
+- run_monitor: Probes the targets and serves the /metrics endpoint until interrupted.
+
+Modules:
+- asyncio: Used to schedule the probes and serve the /metrics endpoint.
+- bisect: Used to find the histogram bucket of each sample.
+- collections.deque: Used as the ring buffer of recent samples.
+- concurrent.futures: Provides the thread pool the blocking measurements run in.
+- display: Imports error_message to display error messages.
+- engine: Imports measure_sample to take each measurement.
+- output: Imports escape_label_value and fatal_error, which are shared with the prom output format.
+- formatting: Imports display_header and format_timing_line which are shared with the other modes.
+- stats: Imports exact_quantile to calculate the quantiles of the recent samples.
+- utils: Imports check_duration to parse the interval of each target and is_well_formed_url to check each URL.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import argparse
+import asyncio
+import bisect
+import functools
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import urlsplit
+
+from .display import error_message
+from .engine import measure_sample
+from .exceptions import MeasurementError
+from .formatting import display_header, format_timing_line
+from .globals import DEFAULT_PHASES, TIMING_PHASES
+from .output import escape_label_value, fatal_error
+from .stats import exact_quantile
+from .utils import check_duration, is_well_formed_url
+
+HISTOGRAM_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_QUANTILES: tuple[float, ...] = (0.5, 0.9, 0.99)
+REQUEST_TIMEOUT: float = 10.0
+
+
+class MonitorTarget:  # pylint: disable=too-many-instance-attributes
+    """
+    The URL, interval, recent samples and histograms of a single monitored target.
+
+    The most recent samples are kept in a ring buffer of config.ring_size entries, each entry holds the
+    timing phases of a sample in TIMING_PHASES order. The histograms count every sample since the monitor
+    started (so rates and rolling windows can be taken over them by the scraper) in HISTOGRAM_BUCKETS.
+    """
+
+    __slots__ = ('url', 'interval', 'recent', 'buckets', 'sums', 'count', 'errors', 'last_probe', 'last_error', 'up')
+
+    def __init__(self, url: str, interval: float, ring_size: int) -> None:
+        """
+        Initialise a target with no samples.
+
+        Arguments:
+            url (str): The URL to probe.
+            interval (float): The number of seconds between probes.
+            ring_size (int): The number of recent samples to keep.
+        """
+        self.url: str = url
+        self.interval: float = interval
+        self.recent: deque = deque(maxlen=ring_size)
+        self.buckets: dict[str, list[int]] = {phase: [0] * (len(HISTOGRAM_BUCKETS) + 1) for phase in TIMING_PHASES}
+        self.sums: dict[str, float] = dict.fromkeys(TIMING_PHASES, 0.0)
+        self.count: int = 0
+        self.errors: int = 0
+        self.last_probe: float = 0.0
+        self.last_error: Optional[str] = None
+        self.up: bool = False
+
+    def add(self, timestamp: float, sample: dict[str, float]) -> None:
+        """
+        Record a successful probe.
+
+        Arguments:
+            timestamp (float): The time (in seconds since the epoch) the probe started.
+            sample (dict[str, float]): The timing phases (in seconds) of the probe.
+        """
+        self.recent.append(tuple(sample[phase] for phase in TIMING_PHASES))
+        for phase in TIMING_PHASES:
+            self.buckets[phase][bisect.bisect_left(HISTOGRAM_BUCKETS, sample[phase])] += 1
+            self.sums[phase] += sample[phase]
+        self.count += 1
+        self.last_probe = timestamp
+        self.up = True
+
+    def add_error(self, timestamp: float, message: str) -> None:
+        """
+        Record a failed probe.
+
+        Arguments:
+            timestamp (float): The time (in seconds since the epoch) the probe started.
+            message (str): The error message of the failure.
+        """
+        self.errors += 1
+        self.last_probe = timestamp
+        self.last_error = message
+        self.up = False
+
+
+def read_targets(path: str, default_interval: float) -> list[tuple[str, float]]:
+    """
+    Read the targets to monitor from a file.
+
+    Each line holds a URL optionally followed by its own interval (e.g. https://example.com 30s), blank lines
+    and lines starting with '#' are ignored, and a URL listed more than once is only monitored once.
+
+    Arguments:
+        path (str): The path of the file.
+        default_interval (float): The interval (in seconds) used for targets without their own.
+
+    Returns:
+        list[tuple[str, float]]: The URL and interval of each target, in the order they were listed.
+
+    Exits:
+        If the file cannot be read or a line is not valid, displays an error message and exits the program.
+    """
+    try:
+        with open(path, 'r', encoding='UTF-8') as f:
+            lines: list[str] = f.read().splitlines()
+    except OSError as err:
+        fatal_error(None, f"Unable to read target list {path}: {err.strerror}")
+
+    targets: dict[str, float] = {}
+    for number, line in enumerate(lines, 1):
+        fields: list[str] = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        try:
+            if len(fields) > 2:
+                raise argparse.ArgumentTypeError("expected a URL and an optional interval")
+            targets.setdefault(fields[0], check_duration(fields[1]) if len(fields) == 2 else default_interval)
+        except argparse.ArgumentTypeError as err:
+            fatal_error(None, f"{path} line {number}: {err}")
+    return list(targets.items())
+
+
+def format_metrics(targets: list[MonitorTarget]) -> str:
+    """
+    Format the metrics of every target in the Prometheus text exposition format.
+
+    Arguments:
+        targets (list[MonitorTarget]): The monitored targets.
+
+    Returns:
+        str: The metrics.
+    """
+    histograms: list[str] = ["# HELP ttfb_probe_phase_seconds Time from the start of each probe until the end of each timing phase.",
+                             "# TYPE ttfb_probe_phase_seconds histogram"]
+    recent: list[str] = ["# HELP ttfb_recent_phase_seconds Quantiles of each timing phase over the most recent probes.",
+                         "# TYPE ttfb_recent_phase_seconds summary"]
+    probes: list[str] = ["# HELP ttfb_probes_total Successful probes.", "# TYPE ttfb_probes_total counter"]
+    errors: list[str] = ["# HELP ttfb_probe_errors_total Failed probes.", "# TYPE ttfb_probe_errors_total counter"]
+    up: list[str] = ["# HELP ttfb_up Whether the most recent probe succeeded.", "# TYPE ttfb_up gauge"]
+    last: list[str] = ["# HELP ttfb_last_probe_timestamp_seconds When the most recent probe started.", "# TYPE ttfb_last_probe_timestamp_seconds gauge"]
+
+    for target in targets:
+        url: str = f'url="{escape_label_value(target.url)}"'
+        for position, phase in enumerate(TIMING_PHASES):
+            _format_phase_metrics(target, position, f'{url},phase="{phase}"', histograms, recent)
+
+        probes.append(f"ttfb_probes_total{{{url}}} {target.count}")
+        errors.append(f"ttfb_probe_errors_total{{{url}}} {target.errors}")
+        up.append(f"ttfb_up{{{url}}} {int(target.up)}")
+        last.append(f"ttfb_last_probe_timestamp_seconds{{{url}}} {target.last_probe!r}")
+
+    return '\n'.join(histograms + recent + probes + errors + up + last) + '\n'
+
+
+def _format_phase_metrics(target: MonitorTarget, position: int, labels: str, histograms: list[str], recent: list[str]) -> None:
+    """
+    Format the histogram and recent quantiles of a single timing phase of a target.
+
+    Arguments:
+        target (MonitorTarget): The target.
+        position (int): The position of the phase in TIMING_PHASES.
+        labels (str): The labels of the metrics.
+        histograms (list[str]): The histogram lines, the lines for the phase are appended.
+        recent (list[str]): The recent quantile lines, the lines for the phase are appended.
+    """
+    phase: str = TIMING_PHASES[position]
+    cumulative: int = 0
+    for bound, count in zip(HISTOGRAM_BUCKETS + (float('inf'),), target.buckets[phase]):
+        cumulative += count
+        histograms.append(f'ttfb_probe_phase_seconds_bucket{{{labels},le="{"+Inf" if bound == float("inf") else bound}"}} {cumulative}')
+    histograms.append(f"ttfb_probe_phase_seconds_sum{{{labels}}} {target.sums[phase]!r}")
+    histograms.append(f"ttfb_probe_phase_seconds_count{{{labels}}} {target.count}")
+
+    values: list[float] = sorted(sample[position] for sample in target.recent)
+    for quantile in RECENT_QUANTILES:
+        recent.append(f'ttfb_recent_phase_seconds{{{labels},quantile="{quantile}"}} {exact_quantile(values, quantile)!r}')
+    recent.append(f"ttfb_recent_phase_seconds_sum{{{labels}}} {sum(values, 0.0)!r}")
+    recent.append(f"ttfb_recent_phase_seconds_count{{{labels}}} {len(values)}")
+
+
+async def _handle_request(targets: list[MonitorTarget], reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Answer a single HTTP request, serving the metrics for GET /metrics and a 404 for anything else.
+
+    Arguments:
+        targets (list[MonitorTarget]): The monitored targets.
+        reader (asyncio.StreamReader): The request stream.
+        writer (asyncio.StreamWriter): The response stream.
+    """
+    try:
+        request: list[str] = (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)).decode('latin-1').split()
+        while (await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)) not in (b'\r\n', b'\n', b''):
+            pass
+
+        status: str = '200 OK'
+        body: bytes = b''
+        if len(request) < 2 or request[0] != 'GET':
+            status = '405 Method Not Allowed'
+        elif urlsplit(request[1]).path != '/metrics':
+            status = '404 Not Found'
+        else:
+            body = format_metrics(targets).encode('UTF-8')
+
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError, UnicodeError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _probe(config: SimpleNamespace, target: MonitorTarget, offset: float, executor: ThreadPoolExecutor) -> None:
+    """
+    Probe a single target on its interval forever.
+
+    If a probe takes longer than the interval the missed probes are skipped rather than sent in a burst.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine, resolver and verbosity.
+        target (MonitorTarget): The target to probe.
+        offset (float): The number of seconds to wait before the first probe.
+        executor (ThreadPoolExecutor): The thread pool the measurements run in.
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    next_probe: float = loop.time() + offset
+    while True:
+        await asyncio.sleep(max(next_probe - loop.time(), 0))
+        started: float = time.time()
+        try:
+            sample: dict[str, float] = await loop.run_in_executor(executor, measure_sample, config, target.url)
+        except MeasurementError as err:
+            target.add_error(started, f"{err}")
+            if config.verbose:
+                print(error_message(f"  {target.url}: {err}"), flush=True)
+        else:
+            target.add(started, sample)
+            if config.verbose:
+                print(f"{format_timing_line(sample, DEFAULT_PHASES)}   {target.url}", flush=True)
+        next_probe = max(next_probe + target.interval, loop.time())
+
+
+async def _monitor(config: SimpleNamespace, targets: list[MonitorTarget]) -> None:
+    """
+    Serve the /metrics endpoint and probe every target until cancelled.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the listen address and concurrency.
+        targets (list[MonitorTarget]): The targets to probe.
+
+    Exits:
+        If the listen address cannot be bound, displays an error message and exits the program.
+    """
+    try:
+        server: asyncio.AbstractServer = await asyncio.start_server(functools.partial(_handle_request, targets), config.bind, config.port)
+    except OSError as err:
+        fatal_error(None, f"Unable to listen on {config.bind}:{config.port}: {err.strerror}")
+
+    with ThreadPoolExecutor(max_workers=config.concurrency) as executor:
+        async with server:
+            await asyncio.gather(*(_probe(config, target, target.interval * position / len(targets), executor)
+                                   for position, target in enumerate(targets)))
+
+
+def run_monitor(config: SimpleNamespace) -> None:
+    """
+    Probe the configured targets and serve the /metrics endpoint until interrupted.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the targets, intervals, ring size and listen address.
+
+    Exits:
+        If a target URL is not valid or the listen address cannot be bound, displays an error message and exits the program.
+    """
+    for url, _ in config.targets:
+        if not is_well_formed_url(url):
+            fatal_error(None, f"{url} is not a valid URL - must start with http:// or https://")
+
+    targets: list[MonitorTarget] = [MonitorTarget(url, interval, config.ring_size) for url, interval in config.targets]
+    display_header(config, f"Monitoring {len(targets)} targets, metrics at http://{config.bind}:{config.port}/metrics")
+    asyncio.run(_monitor(config, targets))
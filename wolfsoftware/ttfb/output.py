@@ -0,0 +1,380 @@
+"""
+This module provides the machine-readable output formats of the URL timing analysis program.
+
+With --output json, jsonl, csv or prom the banners and formatted lines are replaced by structured records
+written to stdout. Every format shares the same flat record layout (RECORD_FIELDS):
+
+- sample records: One per sample, carrying the URL, sample index, timestamp and every timing phase (or
+  the error message of a failed sample), and the body metrics in body mode.
+- summary records: One per summary statistic (min, mean, stddev, p50, p90, p99 and max) for each URL
+  (and keep-alive connection kind or address), carrying the sample and error counts and every timing phase,
+  and in body mode for the body metrics (kind body).
+
+The formats are:
+
+- jsonl: One JSON object per line, written as each sample completes.
+- json: A single JSON array of the same objects, written as each sample completes.
+- csv: A header row followed by one row per record, written as each sample completes.
+- prom: The summary records of the timing phases in the Prometheus text exposition format, written at the
+  end of the run (the format has no way to represent individual samples).
+
+The records are written through a buffer which is flushed when it fills up, when FLUSH_INTERVAL seconds
+have passed since the last flush or at the end of the run, rather than with a print per line. Writers are
+thread safe so that concurrent measurements (the URL list and per-address modes) can share one.
+
+Classes:
+- RecordWriter: The buffered abstract base class of the record writers.
+- JsonLinesWriter: Writes each record as a line of JSON.
+- JsonWriter: Writes the records as a single JSON array.
+- CsvWriter: Writes the records as CSV with a header row.
+- PrometheusWriter: Writes the summary records in the Prometheus text exposition format.
+
+Functions:
+- open_record_writer: Returns the record writer for the configured output format, or None for text output.
+- escape_label_value: Escapes a Prometheus label value.
+- fatal_error: Displays an error message and exits, keeping stdout parseable when records are being written.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import csv
+import json
+import sys
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import Any, NoReturn, Optional, TextIO, Union
+
+from .display import error_message
+from .exceptions import MeasurementError
+from .globals import BODY_METRICS, TIMING_PHASES
+from .stats import SUMMARY_STATISTICS, TimingAggregate
+
+RECORD_FIELDS: tuple[str, ...] = (
+    ('type', 'timestamp', 'url', 'address', 'kind', 'index', 'error', 'samples', 'errors', 'statistic') + TIMING_PHASES + BODY_METRICS
+)
+BUFFER_SIZE: int = 65536
+FLUSH_INTERVAL: float = 1.0
+PROMETHEUS_QUANTILES: dict[str, str] = {'min': '0', 'p50': '0.5', 'p90': '0.9', 'p99': '0.99', 'max': '1'}
+
+
+class RecordWriter(ABC):
+    """
+    The buffered abstract base class of the record writers.
+
+    Subclasses format each record with format_record (and may add a header and footer), the base class
+    builds the records and handles the buffering and locking.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        """
+        Initialise the writer.
+
+        Arguments:
+            stream (Optional[TextIO]): The stream to write to, stdout if not given.
+        """
+        self.stream: TextIO = stream or sys.stdout
+        self.buffer: list[str] = []
+        self.buffered: int = 0
+        self.records: int = 0
+        self.last_flush: float = time.monotonic()
+        self.lock: threading.Lock = threading.Lock()
+
+    def result(self, url: str, index: int, result: Union[dict[str, float], MeasurementError], kind: str = '', address: str = '') -> None:
+        """
+        Write the record for a sample, successful or failed.
+
+        Arguments:
+            url (str): The URL that was measured.
+            index (int): The index of the sample.
+            result (Union[dict[str, float], MeasurementError]): The timing phases (in seconds) of the sample, or the error.
+            kind (str): The kind of connection used in keep-alive mode.
+            address (str): The address the host was pinned to in per-address mode.
+        """
+        record: dict[str, Any] = {'type': 'sample', 'timestamp': time.time(), 'url': url, 'address': address, 'kind': kind, 'index': index}
+        if isinstance(result, MeasurementError):
+            record['error'] = f"{result}"
+        else:
+            record.update(result)
+        self.write_record(record)
+
+    def summary(self, url: str, aggregate: TimingAggregate, kind: str = '', address: str = '') -> None:
+        """
+        Write the summary records of an aggregate, one for each summary statistic.
+
+        Arguments:
+            url (str): The URL that was measured.
+            aggregate (TimingAggregate): The aggregate of the samples, of the timing phases or of the body metrics.
+            kind (str): The kind of connection used in keep-alive mode.
+            address (str): The address the host was pinned to in per-address mode.
+        """
+        summaries: dict[str, dict[str, float]] = {phase: aggregate.summary(phase) for phase in aggregate.phases}
+        timestamp: float = time.time()
+        for statistic in SUMMARY_STATISTICS:
+            record: dict[str, Any] = {
+                'type': 'summary', 'timestamp': timestamp, 'url': url, 'address': address, 'kind': kind,
+                'samples': aggregate.count, 'errors': aggregate.errors, 'statistic': statistic,
+            }
+            record.update({phase: summaries[phase][statistic] for phase in aggregate.phases})
+            self.write_record(record)
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        """
+        Format a record and add it to the buffer.
+
+        Arguments:
+            record (dict[str, Any]): The record, fields that are not set are written as empty (or null).
+        """
+        with self.lock:
+            self._write(self.format_record({field: record.get(field) for field in RECORD_FIELDS}))
+            self.records += 1
+
+    @abstractmethod
+    def format_record(self, record: dict[str, Any]) -> str:
+        """
+        Format a single record.
+
+        Arguments:
+            record (dict[str, Any]): The record with every field of RECORD_FIELDS.
+
+        Returns:
+            str: The formatted record.
+        """
+
+    def footer(self) -> str:
+        """
+        Return the text written after the last record.
+
+        Returns:
+            str: The footer, empty by default.
+        """
+        return ''
+
+    def finish(self) -> None:
+        """Write the footer and flush the buffer."""
+        with self.lock:
+            self._write(self.footer())
+            self._flush()
+
+    def _write(self, text: str) -> None:
+        """
+        Add text to the buffer, flushing it if it is full or has not been flushed for FLUSH_INTERVAL seconds.
+
+        Arguments:
+            text (str): The text to add.
+        """
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= BUFFER_SIZE or time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self._flush()
+
+    def _flush(self) -> None:
+        """Write the buffer to the stream."""
+        self.stream.write(''.join(self.buffer))
+        self.stream.flush()
+        self.buffer.clear()
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+
+
+class JsonLinesWriter(RecordWriter):
+    """Writes each record as a line of JSON."""
+
+    def format_record(self, record: dict[str, Any]) -> str:
+        """
+        Format a record as a line of JSON.
+
+        Arguments:
+            record (dict[str, Any]): The record with every field of RECORD_FIELDS.
+
+        Returns:
+            str: The JSON object followed by a newline.
+        """
+        return json.dumps(record) + '\n'
+
+
+class JsonWriter(RecordWriter):
+    """Writes the records as a single JSON array, one object per line."""
+
+    def format_record(self, record: dict[str, Any]) -> str:
+        """
+        Format a record as an element of the JSON array.
+
+        Arguments:
+            record (dict[str, Any]): The record with every field of RECORD_FIELDS.
+
+        Returns:
+            str: The JSON object, preceded by the opening bracket or a comma.
+        """
+        return ('[\n' if self.records == 0 else ',\n') + json.dumps(record)
+
+    def footer(self) -> str:
+        """
+        Return the closing bracket of the JSON array.
+
+        Returns:
+            str: The closing bracket (or an empty array if there were no records).
+        """
+        return '[]\n' if self.records == 0 else '\n]\n'
+
+
+class CsvWriter(RecordWriter):
+    """Writes the records as CSV with a header row."""
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        """
+        Initialise the writer.
+
+        Arguments:
+            stream (Optional[TextIO]): The stream to write to, stdout if not given.
+        """
+        super().__init__(stream)
+        self.rows: list[str] = []
+        self.csv: Any = csv.writer(self, lineterminator='\n')
+
+    def write(self, row: str) -> None:
+        """
+        Collect a row formatted by the csv module.
+
+        Arguments:
+            row (str): The formatted row.
+        """
+        self.rows.append(row)
+
+    def format_record(self, record: dict[str, Any]) -> str:
+        """
+        Format a record as a CSV row, preceded by the header row for the first record.
+
+        Arguments:
+            record (dict[str, Any]): The record with every field of RECORD_FIELDS.
+
+        Returns:
+            str: The formatted row (or rows).
+        """
+        if self.records == 0:
+            self.csv.writerow(RECORD_FIELDS)
+        self.csv.writerow(['' if value is None else value for value in record.values()])
+        rows: str = ''.join(self.rows)
+        self.rows.clear()
+        return rows
+
+
+class PrometheusWriter(RecordWriter):
+    """
+    Writes the summary records in the Prometheus text exposition format at the end of the run.
+
+    Each timing phase is written as a summary (quantiles 0, 0.5, 0.9, 0.99 and 1 with the _sum and _count)
+    labelled with the URL, address, kind and phase, along with the sample and error counts. Summaries without
+    timing phases (those of the body metrics) are not written.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        """
+        Initialise the writer.
+
+        Arguments:
+            stream (Optional[TextIO]): The stream to write to, stdout if not given.
+        """
+        super().__init__(stream)
+        self.summaries: dict[tuple[str, str, str], dict[str, dict[str, Any]]] = {}
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        """
+        Keep the summary records until the end of the run, sample records are not written.
+
+        Arguments:
+            record (dict[str, Any]): The record.
+        """
+        if record['type'] == 'summary':
+            with self.lock:
+                self.summaries.setdefault((record['url'], record['address'], record['kind']), {})[record['statistic']] = record
+
+    def format_record(self, record: dict[str, Any]) -> str:
+        """
+        Not used, the records are formatted together by footer.
+
+        Arguments:
+            record (dict[str, Any]): The record.
+
+        Returns:
+            str: An empty string.
+        """
+        return ''
+
+    def footer(self) -> str:
+        """
+        Return the metrics for every summary.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        phases: list[str] = ["# HELP ttfb_phase_seconds Time from the start of the request until the end of each timing phase.",
+                             "# TYPE ttfb_phase_seconds summary"]
+        samples: list[str] = ["# HELP ttfb_samples_total Successful samples.", "# TYPE ttfb_samples_total counter"]
+        errors: list[str] = ["# HELP ttfb_errors_total Failed samples.", "# TYPE ttfb_errors_total counter"]
+
+        for (url, address, kind), statistics in self.summaries.items():
+            if statistics['mean'].get(TIMING_PHASES[-1]) is None:
+                continue
+            labels: str = f'url="{escape_label_value(url)}",address="{escape_label_value(address)}",kind="{escape_label_value(kind)}"'
+            mean: dict[str, Any] = statistics['mean']
+            for phase in TIMING_PHASES:
+                for statistic, quantile in PROMETHEUS_QUANTILES.items():
+                    phases.append(f'ttfb_phase_seconds{{{labels},phase="{phase}",quantile="{quantile}"}} {statistics[statistic][phase]!r}')
+                phases.append(f'ttfb_phase_seconds_sum{{{labels},phase="{phase}"}} {mean[phase] * mean["samples"]!r}')
+                phases.append(f'ttfb_phase_seconds_count{{{labels},phase="{phase}"}} {mean["samples"]}')
+            samples.append(f"ttfb_samples_total{{{labels}}} {mean['samples']}")
+            errors.append(f"ttfb_errors_total{{{labels}}} {mean['errors']}")
+
+        return '\n'.join(phases + samples + errors) + '\n'
+
+
+def escape_label_value(value: str) -> str:
+    """
+    Escape a Prometheus label value.
+
+    Arguments:
+        value (str): The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def open_record_writer(config: SimpleNamespace) -> Optional[RecordWriter]:
+    """
+    Return the record writer for the output format in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the output format.
+
+    Returns:
+        Optional[RecordWriter]: The record writer, or None for the (default) text output.
+    """
+    writers: dict[str, type] = {'json': JsonWriter, 'jsonl': JsonLinesWriter, 'csv': CsvWriter, 'prom': PrometheusWriter}
+    writer: Optional[type] = writers.get(config.output)
+    return writer() if writer is not None else None
+
+
+def fatal_error(writer: Optional[RecordWriter], message: str) -> NoReturn:
+    """
+    Display an error message and exit the program.
+
+    When records are being written the writer is finished first (so the output is complete, e.g. the JSON
+    array is closed) and the message is displayed on stderr rather than mixed into the records.
+
+    Arguments:
+        writer (Optional[RecordWriter]): The record writer, or None for text output.
+        message (str): The error message.
+
+    Exits:
+        Always, with status 1.
+    """
+    if writer is None:
+        print(error_message(message))
+    else:
+        writer.finish()
+        print(error_message(message), file=sys.stderr)
+    sys.exit(1)
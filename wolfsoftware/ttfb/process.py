@@ -1,29 +1,52 @@
 """
 This module handles URL processing and timing information display for the URL timing analysis program.
 
-The main purpose of this module is to validate a given URL, execute curl commands to measure various
-timing metrics, and display the results in a formatted manner.
+The main purpose of this module is to validate a given URL, measure various timing metrics using
+the selected timing engine, and display the results in a formatted manner.
+
+Classes:
+- ProgressReporter: Displays a line per sample for short runs, or periodic summary lines for long runs.
 
 Functions:
 - process_url: Validates the URL and initiates the timing display process.
-- display_timing: Executes curl commands to measure and display timing metrics for the URL.
+- report_sample: Reports a sample as a record or as a line, depending on the output format.
+- measure_reported: Measures the URL in the configured mode, reporting each sample as it completes.
+- display_timing: Measures and displays timing metrics for the URL.
+- display_summaries: Displays the summary statistics of each kind of connection.
+- finish_display: Finishes the per-sample output of a run and displays its precision.
+- display_precision: Displays the target and achieved precision of an adaptive sampling run.
 
 Modules:
-- subprocess: Used to run curl commands to measure timing metrics.
+- functools: Used to pass the URL, record writer and progress reporter to report_sample.
+- time: Used to time the periodic summary lines.
 - types.SimpleNamespace: Used to handle configuration settings.
-- wolfsoftware.drawlines: Provides functions to draw formatted lines in the terminal.
-- globals: Imports global constants like SCRIPT_TITLE.
+- api: Imports run_measurement to take the measurements, which the display functions are thin wrappers over.
+- cache: Imports open_validation_cache to skip the reachability check for recently reached URLs.
+- display: Imports draw_line and error_message to draw formatted lines and display error messages.
+- formatting: Imports the formatting functions shared with the other modes.
+- globals: Imports PER_SAMPLE_LINE_LIMIT and the labels of each kind of connection.
+- output: Imports open_record_writer and fatal_error for the machine-readable output formats.
+- stats: Imports TimingAggregate to collect the samples and calculate the summary statistics.
+- tracing: Imports span to record the rendering of the header, samples and summaries with --trace.
 - utils: Imports utility functions like validate_url.
 """
 # pylint: disable=relative-beyond-top-level
 
-import subprocess  # nosec B404
+import functools
+import time
 
 from types import SimpleNamespace
+from typing import Optional
 
-from wolfsoftware.drawlines import draw_line
-
-from .globals import SCRIPT_TITLE
+from .api import Result, Sample, run_measurement
+from .cache import ValidationCache, open_validation_cache
+from .display import draw_line, error_message
+from .exceptions import MeasurementError
+from .formatting import display_header, format_interval_line, format_summary_lines, format_timing_line, select_phases
+from .globals import CONNECTION_KINDS, PER_SAMPLE_LINE_LIMIT
+from .output import RecordWriter, fatal_error, open_record_writer
+from .stats import TimingAggregate
+from .tracing import span
 from .utils import validate_url
 
 
@@ -40,52 +63,223 @@ def process_url(config: SimpleNamespace) -> None:
     display_timing(config)
 
 
+class ProgressReporter:
+    """
+    Displays the progress of a run, either as a line per sample or as periodic summary lines.
+
+    Short runs (up to PER_SAMPLE_LINE_LIMIT samples, or when verbose) display a line for every sample,
+    longer runs display a summary line for the samples of each config.summary_interval seconds instead,
+    so the output stays bounded however long the run is.
+    """
+
+    def __init__(self, config: SimpleNamespace, phases: tuple[str, ...]) -> None:
+        """
+        Initialise the reporter and start the clock for the periodic summary lines.
+
+        Arguments:
+            config (SimpleNamespace): The configuration object containing the count, duration, verbosity and summary interval.
+            phases (tuple[str, ...]): The names of the timing phases to display.
+        """
+        self.phases: tuple[str, ...] = phases
+        self.per_sample_lines: bool = config.verbose or (config.duration is None and config.count <= PER_SAMPLE_LINE_LIMIT)
+        self.summary_interval: float = config.summary_interval
+        self.interval: TimingAggregate = TimingAggregate()
+        self.started: float = time.monotonic()
+        self.next_report: float = self.started + self.summary_interval
+
+    def sample(self, sample: dict[str, float], suffix: str = '') -> None:
+        """
+        Report a successful sample.
+
+        Arguments:
+            sample (dict[str, float]): The timing phases (in seconds) of the sample.
+            suffix (str): Text to append to the line for the sample.
+        """
+        self.interval.add(sample)
+        if self.per_sample_lines:
+            print(format_timing_line(sample, self.phases) + suffix)
+        self._check_interval()
+
+    def error(self, message: str) -> None:
+        """
+        Report a failed sample.
+
+        Arguments:
+            message (str): The error message of the failure.
+        """
+        self.interval.add_error(message)
+        if self.per_sample_lines:
+            print(error_message(f"  {message}"))
+        self._check_interval()
+
+    def finish(self) -> None:
+        """Display the summary line for the final (partial) interval, if there is one."""
+        if not self.per_sample_lines and (self.interval.count or self.interval.errors):
+            print(format_interval_line(time.monotonic() - self.started, self.interval, self.phases))
+
+    def _check_interval(self) -> None:
+        """Display a summary line and start a new interval if the current interval has ended."""
+        if not self.per_sample_lines and time.monotonic() >= self.next_report:
+            print(format_interval_line(time.monotonic() - self.started, self.interval, self.phases), flush=True)
+            self.interval = TimingAggregate()
+            self.next_report += self.summary_interval
+
+
+def report_sample(url: str, writer: Optional[RecordWriter], reporter: ProgressReporter, sample: Sample) -> None:
+    """
+    Report a sample as a record with a machine-readable output format, or to the progress reporter otherwise.
+
+    Arguments:
+        url (str): The URL the sample was taken from.
+        writer (Optional[RecordWriter]): The record writer, or None for the formatted text output.
+        reporter (ProgressReporter): The progress reporter.
+        sample (Sample): The sample, its kind (if any) and its body size and throughput (in body mode) are shown after its line.
+    """
+    with span('render', 'output'):
+        body: Optional[dict[str, float]] = sample.body
+        if writer is not None:
+            writer.result(url, sample.index, MeasurementError(sample.error) if sample.timings is None else {**sample.timings, **(body or {})}, sample.kind)
+        elif sample.timings is None:
+            reporter.error(sample.error or '')
+        else:
+            suffix: str = f"   Body: {body['bytes']:.0f} bytes at {body['throughput'] / 1e6:.3f} MB/s" if body is not None else ''
+            reporter.sample(sample.timings, suffix + (f"   ({sample.kind})" if sample.kind else ''))
+
+
+def measure_reported(config: SimpleNamespace, writer: Optional[RecordWriter], reporter: ProgressReporter) -> Result:
+    """
+    Measure the URL in the configured mode, reporting each sample as it completes (see report_sample).
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and mode settings.
+        writer (Optional[RecordWriter]): The record writer, or None for the formatted text output.
+        reporter (ProgressReporter): The progress reporter.
+
+    Returns:
+        Result: The result.
+
+    Exits:
+        If the first sample fails, displays an error message and exits the program.
+    """
+    try:
+        result: Result = run_measurement(config, functools.partial(report_sample, config.url, writer, reporter))
+    except MeasurementError as err:
+        fatal_error(writer, f"{config.url} could not be reached - aborting ({err})")
+    return result
+
+
 def display_timing(config: SimpleNamespace) -> None:
     """
     Display timing information for the specified URL.
 
-    This function prints formatted lines and executes curl commands to display various timing metrics
-    (such as lookup time, connect time, TTFB, and total time) for the URL specified in the configuration.
+    This function prints formatted lines and measures various timing metrics (such as lookup time,
+    connect time, TTFB, and total time) for the URL specified in the configuration, using either
+    curl (the reference engine) or the native in-process engine. When more than one sample is taken,
+    the min, mean, stddev, p50, p90, p99 and max of each timing value are displayed at the end.
 
-    The command executed depends on the configuration:
+    Short runs display a line for every sample, longer runs display periodic summary lines instead (see
+    ProgressReporter). The samples are aggregated incrementally, so memory use stays constant however
+    long the run is.
+
+    In keep-alive mode the requests are sent over a small pool of persistent connections and the summary
+    statistics are displayed separately for cold, resumed (TLS session resumption) and warm connections.
+
+    With a target precision (adaptive sampling) the run keeps taking samples until the confidence interval of
+    the chosen TTFB percentile is narrow enough, or the maximum number of samples or the time budget is reached,
+    and the precision achieved is displayed with the summary statistics.
+
+    The first measurement doubles as the reachability check for the URL, unless the validation cache is
+    enabled and the URL was reached successfully within the cache TTL.
+
+    With a machine-readable output format (see output.py) the lines are replaced by a record per sample
+    and the summary records of each aggregate.
+
+    The timing values displayed depend on the configuration:
         - Minimal: Only TTFB and total time.
         - Full: Detailed timing metrics including lookup, connect, app connect, pre-transfer, redirect, TTFB, and total time.
         - Default: A subset of the full metrics.
 
     Arguments:
         config (SimpleNamespace): The configuration object containing settings such as screen width, URL, command paths,
-                                  verbosity, and the number of times to repeat the command.
+                                  engine, verbosity, and the number of times (or how long) to repeat the measurement.
+
+    Exits:
+        If the first measurement fails (and acts as the reachability check), displays an error message and exits the program.
     """
+    display_header(config, f"Results for {config.url}")
+
+    phases: tuple[str, ...] = select_phases(config)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    reporter: ProgressReporter = ProgressReporter(config, phases)
+    cache: Optional[ValidationCache] = open_validation_cache(config)
+
+    def on_sample(sample: Sample) -> None:
+        if cache is not None and sample.index == 0 and sample.ok:
+            cache.record(config.url)
+        report_sample(config.url, writer, reporter, sample)
+
+    try:
+        result: Result = run_measurement(config, on_sample, check_reachable=cache is None or not cache.is_fresh(config.url))
+    except MeasurementError as err:
+        fatal_error(writer, f"{config.url} could not be reached - aborting ({err})")
+
+    if cache is not None:
+        cache.save()
+
+    if writer is not None:
+        for kind, aggregate in result.aggregates.items():
+            writer.summary(config.url, aggregate, kind)
+        writer.finish()
+        return
+
+    finish_display(config, reporter, result)
+    display_summaries(config, result.aggregates, phases)
+
+
+def finish_display(config: SimpleNamespace, reporter: ProgressReporter, result: Result) -> None:
+    """
+    Finish the per-sample output of a run and display the precision of an adaptive sampling run, ahead of its summaries.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the screen width and the target precision.
+        reporter (ProgressReporter): The progress reporter, whose last summary line (if any) is flushed.
+        result (Result): The result of the run.
+    """
+    reporter.finish()
     print(draw_line(width=config.screen_width))
-    print(draw_line(width=config.screen_width, text=SCRIPT_TITLE, fill_char=' '))
-    print(draw_line(width=config.screen_width, text=f"Results for {config.url}", fill_char=' '))
-    print(draw_line(width=config.screen_width))
+    if config.target_precision:
+        display_precision(config, result)
 
-    minimal_command: list[str] = [
-        config.command_paths['curl'], '-L', '-o', '/dev/null', '-H', 'Cache-Control: no-cache', '-s', '-w',
-        '  StartXfer Time (TTFB): %{time_starttransfer}   Total Time: %{time_total}\n',
-        config.url
-    ]
-    full_command: list[str] = [
-        config.command_paths['curl'], '-L', '-o', '/dev/null', '-H', 'Cache-Control: no-cache', '-s', '-w',
-        (
-            '  Lookup Time: %{time_namelookup}   Connect Time: %{time_connect}   AppCon Time: %{time_appconnect}   PreXfer Time: %{time_pretransfer}   '
-            'Redirect Time: %{time_redirect}   StartXfer Time (TTFB): %{time_starttransfer}   Total Time: %{time_total}\n'
-        ),
-        config.url
-    ]
-    default_command: list[str] = [
-        config.command_paths['curl'], '-L', '-o', '/dev/null', '-H', 'Cache-Control: no-cache', '-s', '-w',
-        '  Lookup Time: %{time_namelookup}   Connect Time: %{time_connect}   StartXfer Time (TTFB): %{time_starttransfer}   Total Time: %{time_total}\n',
-        config.url
-    ]
-
-    for _i in range(config.count):
-        if config.minimal:
-            subprocess.run(minimal_command, text=True, check=True)  # nosec B603
-        elif config.full:
-            subprocess.run(full_command, text=True, check=True)  # nosec B603
-        else:
-            subprocess.run(default_command, text=True, check=True)  # nosec B603
 
+def display_precision(config: SimpleNamespace, result: Result) -> None:
+    """
+    Display the target and achieved precision of an adaptive sampling run.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the screen width and the target statistic.
+        result (Result): The result, with the precision and confidence interval in its details.
+    """
+    details: dict[str, float] = result.details
+    print(f"  Target Precision: +/-{details['target_precision']:.2%} of {config.target_statistic} TTFB   "
+          f"Achieved: +/-{details['precision']:.2%} after {result.count} samples   "
+          f"95% Interval: {details['interval_low']:.6f} - {details['interval_high']:.6f}")
+    if not details['converged']:
+        print("  The target precision was not reached before the sample limit or time budget ran out")
     print(draw_line(width=config.screen_width))
+
+
+def display_summaries(config: SimpleNamespace, aggregates: dict[str, TimingAggregate], phases: tuple[str, ...]) -> None:
+    """
+    Display the summary statistics of each kind of connection, if more than one sample was taken.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the screen width.
+        aggregates (dict[str, TimingAggregate]): The aggregate for each kind of connection (a single empty kind outside keep-alive mode).
+        phases (tuple[str, ...]): The names of the timing phases to display.
+    """
+    if sum(aggregate.count for aggregate in aggregates.values()) > 1:
+        with span('render', 'output'):
+            for kind, aggregate in aggregates.items():
+                for line in format_summary_lines(aggregate, phases, CONNECTION_KINDS.get(kind, 'Samples')):
+                    print(line)
+                print(draw_line(width=config.screen_width))
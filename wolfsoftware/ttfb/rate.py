@@ -0,0 +1,98 @@
+"""
+This module handles the open-loop (constant rate) mode of the URL timing analysis program.
+
+In the normal (closed-loop) mode each request waits for the previous one to finish, so when the server
+slows down fewer requests are sent and the latency looks better than it really is (coordinated omission).
+In open-loop mode the requests are started on a fixed schedule by a pool of worker threads, whatever
+happened to the earlier requests, and each timing is measured from the time the request was meant to be
+sent rather than the time it was actually sent. The report shows the achieved rate against the target rate.
+The requests are sent by sampling.run_open_loop, which the library API shares.
+
+Functions:
+- process_url_at_rate: Validates the URL and runs the open-loop mode.
+- display_rate_timing: Runs the open-loop mode and displays the results.
+
+Modules:
+- api: Imports run_measurement to run the open-loop mode, which display_rate_timing is a thin wrapper over.
+- display: Imports draw_line to draw formatted lines.
+- formatting: Imports the formatting functions shared with the closed-loop mode.
+- output: Imports open_record_writer and fatal_error for the machine-readable output formats.
+- process: Imports ProgressReporter to display the samples as they complete.
+- utils: Imports utility functions like validate_url.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+from typing import Optional
+
+from .api import Result, Sample, run_measurement
+from .display import draw_line
+from .exceptions import MeasurementError
+from .formatting import display_header, format_summary_lines, select_phases
+from .output import RecordWriter, fatal_error, open_record_writer
+from .process import ProgressReporter
+from .utils import validate_url
+
+
+def process_url_at_rate(config: SimpleNamespace) -> None:
+    """
+    Process a URL using the open-loop (constant rate) mode.
+
+    This function validates the URL specified in the configuration and displays the open-loop timing information.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, rate and other settings.
+    """
+    validate_url(config.url)
+    display_rate_timing(config)
+
+
+def display_rate_timing(config: SimpleNamespace) -> None:
+    """
+    Display timing information for the specified URL using the open-loop (constant rate) mode.
+
+    The output follows the closed-loop mode (a line per sample for short runs, periodic summary lines for
+    longer ones, then the summary statistics) with every timing measured from the scheduled send time. The
+    target rate, achieved rate and the delay between the scheduled and actual send times are shown at the end.
+    With a machine-readable output format the samples (indexed in the order they complete) and the summary
+    are written as records instead.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing settings such as the URL, rate and worker count.
+
+    Exits:
+        If every request fails, displays the last error message and exits the program.
+    """
+    display_header(config, f"Results for {config.url} at {config.rate:g} requests/s")
+
+    phases: tuple[str, ...] = select_phases(config)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    reporter: ProgressReporter = ProgressReporter(config, phases)
+
+    def on_sample(sample: Sample) -> None:
+        if writer is not None:
+            writer.result(config.url, sample.index, sample.timings if sample.timings is not None else MeasurementError(sample.error))
+        elif sample.timings is None:
+            reporter.error(sample.error or '')
+        else:
+            reporter.sample(sample.timings)
+
+    try:
+        result: Result = run_measurement(config, on_sample)
+    except MeasurementError as err:
+        fatal_error(writer, f"{err}")
+
+    if writer is not None:
+        writer.summary(config.url, result.aggregate)
+        writer.finish()
+        return
+
+    reporter.finish()
+    print(draw_line(width=config.screen_width))
+    print(f"  Target Rate: {config.rate:.2f}/s   Achieved Rate: {result.details['achieved_rate']:.2f}/s   "
+          f"Completed Rate: {result.details['completed_rate']:.2f}/s")
+    print(f"  Schedule Lag (mean): {result.details['lag_mean']:.6f}   Schedule Lag (max): {result.details['lag_max']:.6f}")
+    print(draw_line(width=config.screen_width))
+    for line in format_summary_lines(result.aggregate, phases):
+        print(line)
+    print(draw_line(width=config.screen_width))
@@ -0,0 +1,115 @@
+"""
+This module handles the redirects mode of the URL timing analysis program.
+
+The other modes follow redirects silently, like curl -L, so a chain of redirects (http to https, apex to www,
+locale redirects) only shows up as a single redirect time. In redirects mode each hop of the chain is timed
+separately, so the status, target and connect, TLS and TTFB times of every hop are reported and a slow hop
+can be found. With --cache-redirect the chain is only followed once, the remaining samples measure the final
+target directly, and the redirect overhead is reported separately from the timings of the destination.
+
+Functions:
+- process_url_redirects: Validates the URL and runs the redirects mode.
+- format_hop_lines: Formats the median timings of each hop of the redirect chain as a table.
+- display_redirect_timing: Measures the URL following its redirect chain and displays the results.
+
+Modules:
+- api: Imports Result for the type of the result.
+- display: Imports draw_line to draw formatted lines.
+- formatting: Imports the formatting functions shared with the other modes.
+- output: Imports open_record_writer for the machine-readable output formats.
+- process: Imports measure_reported to run the mode, and the display functions shared with the other modes.
+- utils: Imports utility functions like validate_url.
+"""
+# pylint: disable=relative-beyond-top-level
+
+from types import SimpleNamespace
+from typing import Optional
+
+from .api import Result
+from .display import draw_line
+from .formatting import display_header, select_phases
+from .output import RecordWriter, open_record_writer
+from .process import ProgressReporter, display_summaries, finish_display, measure_reported
+from .stats import TimingAggregate
+from .utils import validate_url
+
+HOP_PHASES: dict[str, str] = {
+    'namelookup': 'Lookup',
+    'connect': 'Connect',
+    'appconnect': 'TLS',
+    'starttransfer': 'TTFB',
+    'total': 'Total',
+}
+
+
+def process_url_redirects(config: SimpleNamespace) -> None:
+    """
+    Process a URL by timing each hop of its redirect chain.
+
+    This function validates the URL specified in the configuration and displays the per-hop timing information.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and other settings.
+    """
+    validate_url(config.url)
+    display_redirect_timing(config)
+
+
+def format_hop_lines(hops: dict[str, TimingAggregate]) -> list[str]:
+    """
+    Format the median timings of each hop of the redirect chain as a table, one line per hop.
+
+    The timings of each hop are measured from its own start (its DNS lookup), as curl reports them for a single request.
+
+    Arguments:
+        hops (dict[str, TimingAggregate]): The aggregate of each hop, keyed by its label (see api.hop_label).
+
+    Returns:
+        list[str]: The formatted lines, a header line followed by one line per hop.
+    """
+    lines: list[str] = ['  Hop   Samples' + ''.join(f"   {title:>8}" for title in HOP_PHASES.values())
+                        + '   Status and URL (p50 seconds from the start of the hop)']
+    for number, (label, aggregate) in enumerate(hops.items(), start=1):
+        lines.append(f"  {number:>3}   {aggregate.count:>7}" + ''.join(f"   {aggregate.summary(phase)['p50']:>8.6f}" for phase in HOP_PHASES) + f"   {label}")
+    return lines
+
+
+def display_redirect_timing(config: SimpleNamespace) -> None:
+    """
+    Display timing information for each hop of the redirect chain of the URL.
+
+    A line is displayed for each sample (or periodic summary lines for long runs, see ProgressReporter), followed by the
+    median timings of each hop, the number of redirects and the redirect overhead (the median time taken before the final
+    request was started), and the summary statistics of the samples which followed the chain and of those which measured
+    the final target directly. With a machine-readable output format a record is written for each sample and the summary
+    records of each kind of sample and of each hop (with the label of the hop in place of the URL).
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing settings such as the URL, redirect caching and sample count.
+
+    Exits:
+        If the first sample fails, displays an error message and exits the program.
+    """
+    display_header(config, f"Results for {config.url} (following redirects)")
+
+    phases: tuple[str, ...] = select_phases(config)
+    writer: Optional[RecordWriter] = open_record_writer(config)
+    reporter: ProgressReporter = ProgressReporter(config, phases)
+    result: Result = measure_reported(config, writer, reporter)
+
+    if writer is not None:
+        for kind, aggregate in result.aggregates.items():
+            writer.summary(config.url, aggregate, kind)
+        for label, aggregate in result.hops.items():
+            writer.summary(label, aggregate, 'hop')
+        writer.finish()
+        return
+
+    finish_display(config, reporter, result)
+    for line in format_hop_lines(result.hops):
+        print(line)
+    overhead: str = f"{result.details['redirect_overhead']:.6f}" if 'redirect_overhead' in result.details else 'n/a'
+    print(f"  Redirects: {result.details['redirects']:.0f}   Redirect Overhead (p50): {overhead}"
+          f"{'   Final target cached after the first sample' if config.cache_redirect else ''}")
+    print(draw_line(width=config.screen_width))
+    display_summaries(config, result.aggregates, phases)
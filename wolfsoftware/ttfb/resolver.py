@@ -0,0 +1,116 @@
+"""
+This module provides the DNS resolution layer for the URL timing analysis program.
+
+Without it every sample resolves the host name again, so resolver latency is mixed into every sample and a
+host with several A/AAAA records is measured at whichever address the resolver returns. A Resolver resolves
+each host once (or again once its TTL has expired) and pins the following samples to the resolved addresses,
+in the same way as curl --resolve. A resolver can also be pinned to a single address, which is used to probe
+every address of a host separately.
+
+Classes:
+- Resolver: Caches the addresses of each host and port, optionally pinned to a single address.
+
+Functions:
+- format_address: Formats an address for use in a URL authority or curl --resolve (IPv6 in brackets).
+"""
+# pylint: disable=relative-beyond-top-level
+
+import socket
+import time
+
+from typing import Optional
+
+from .exceptions import MeasurementError
+
+
+def format_address(address: str) -> str:
+    """
+    Format an address for use in a URL authority or curl --resolve, IPv6 addresses are wrapped in brackets.
+
+    Arguments:
+        address (str): The IPv4 or IPv6 address.
+
+    Returns:
+        str: The formatted address.
+    """
+    return f"[{address}]" if ':' in address else address
+
+
+class Resolver:
+    """
+    Caches the addresses of each host and port, optionally pinned to a single address.
+
+    The entries are the address information tuples returned by socket.getaddrinfo. Entries never expire
+    unless a TTL is given, in which case the host is resolved again on the first lookup after it expires.
+    """
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        """
+        Initialise an empty resolver.
+
+        Arguments:
+            ttl (Optional[float]): How long (in seconds) to keep each entry, or None to keep entries for the whole run.
+        """
+        self.ttl: Optional[float] = ttl
+        self.entries: dict[tuple[str, int], tuple[float, list]] = {}
+
+    def resolve(self, host: str, port: int) -> list:
+        """
+        Return the address information for the host and port, resolving it if it is not cached (or has expired).
+
+        Arguments:
+            host (str): The host name (or address).
+            port (int): The port.
+
+        Returns:
+            list: The address information tuples, as returned by socket.getaddrinfo.
+
+        Raises:
+            MeasurementError: If the host cannot be resolved.
+        """
+        entry: Optional[tuple[float, list]] = self.entries.get((host, port))
+        if entry is not None and (self.ttl is None or time.monotonic() < entry[0]):
+            return entry[1]
+
+        try:
+            addresses: list = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as err:
+            raise MeasurementError(f"Could not resolve host: {host}") from err
+        self.entries[(host, port)] = (time.monotonic() + (self.ttl or 0.0), addresses)
+        return addresses
+
+    def addresses(self, host: str, port: int) -> list[str]:
+        """
+        Return the unique addresses of the host and port, in the order the resolver returned them.
+
+        Arguments:
+            host (str): The host name (or address).
+            port (int): The port.
+
+        Returns:
+            list[str]: The IPv4 and IPv6 addresses.
+
+        Raises:
+            MeasurementError: If the host cannot be resolved.
+        """
+        return list(dict.fromkeys(info[4][0] for info in self.resolve(host, port)))
+
+    def pinned(self, host: str, port: int, address: str) -> 'Resolver':
+        """
+        Return a copy of this resolver with the host and port pinned to a single address.
+
+        Arguments:
+            host (str): The host name.
+            port (int): The port.
+            address (str): The address (one of those returned by addresses) to pin the host to.
+
+        Returns:
+            Resolver: The pinned resolver, any other hosts are resolved (and cached) as normal.
+
+        Raises:
+            MeasurementError: If the host cannot be resolved.
+        """
+        resolver: Resolver = Resolver(self.ttl)
+        resolver.entries = dict(self.entries)
+        resolver.entries[(host, port)] = (float('inf'), [info for info in self.resolve(host, port) if info[4][0] == address][:1])
+        return resolver
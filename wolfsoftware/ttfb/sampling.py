@@ -0,0 +1,236 @@
+"""
+This module provides the sampling loops of the URL timing analysis program.
+
+The loops take the samples of a run (a fixed number, for a duration or until a precision target is met, on
+a fixed schedule for the open-loop mode, or for each address of a host) and hand each result to a callback.
+They are used by the library API (see api.run_measurement) and by the URL list mode, and depend only on the
+timing engines and the statistics, never on the display of any mode, so the library API does not depend on
+the command line code.
+
+In the open-loop (constant rate) mode the requests are started on a fixed schedule by a pool of worker threads,
+whatever happened to the earlier requests, and each timing is measured from the time the request was meant to
+be sent rather than the time it was actually sent, which avoids coordinated omission (see rate.py).
+
+Functions:
+- sample_indexes: Yields the index of each sample to take, by count or by duration, or until the precision target is met.
+- open_precision_tracker: Returns a precision tracker if adaptive sampling is enabled in the configuration.
+- measure_url: Measures all the samples for a single URL into an aggregate.
+- measure_address: Measures all the samples for the URL pinned to a single address.
+- run_open_loop: Sends the requests on a fixed schedule and passes each result to a callback.
+
+Modules:
+- concurrent.futures: Provides the worker pool the open-loop requests are sent from.
+- queue: Used to pass the open-loop results from the workers back to the calling thread.
+- cache: Imports ValidationCache to skip the reachability check for recently reached URLs.
+- engine: Imports measure_samples and measure_sample to take the measurements with the configured engine, and HttpConnection
+  to find the host and port of the URL.
+- stats: Imports TimingAggregate to summarise the samples and PrecisionTracker for adaptive sampling.
+- tracing: Imports active_tracer to add the time the samples spent on the network to the trace with --trace.
+- utils: Imports is_well_formed_url to check each URL.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import contextlib
+import functools
+import math
+import queue
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Callable, Iterator, Optional, Union
+
+from .cache import ValidationCache
+from .engine import HttpConnection, measure_sample, measure_samples
+from .exceptions import MeasurementError
+from .stats import PrecisionTracker, TimingAggregate
+from .tracing import Tracer, active_tracer
+from .utils import is_well_formed_url
+
+MAX_QUEUED_PER_WORKER: int = 10
+
+
+def sample_indexes(config: SimpleNamespace, tracker: Optional[PrecisionTracker] = None) -> Iterator[int]:
+    """
+    Yield the index of each sample to take.
+
+    Yields config.count indexes, or when config.duration is set, keeps yielding indexes until the duration has elapsed.
+    With a precision tracker (adaptive sampling, where config.count is the maximum number of samples) the indexes stop
+    as soon as the tracked percentile has converged, or when the count or duration (the time budget) runs out.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the count and duration.
+        tracker (Optional[PrecisionTracker]): The precision tracker fed with the samples, for adaptive sampling.
+
+    Yields:
+        int: The index of the next sample.
+    """
+    if config.duration is None and tracker is None:
+        yield from range(config.count)
+        return
+
+    deadline: float = time.monotonic() + config.duration if config.duration is not None else math.inf
+    limit: float = config.count if tracker is not None else math.inf
+    index: int = 0
+    while index < limit and time.monotonic() < deadline and not (tracker is not None and tracker.converged):
+        yield index
+        index += 1
+
+
+def open_precision_tracker(config: SimpleNamespace) -> Optional[PrecisionTracker]:
+    """
+    Return a precision tracker for the TTFB if adaptive sampling is enabled in the configuration.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the target precision and statistic.
+
+    Returns:
+        Optional[PrecisionTracker]: The tracker, or None if adaptive sampling is not enabled.
+    """
+    if not config.target_precision:
+        return None
+    return PrecisionTracker(config.target_precision, config.target_statistic)
+
+
+def measure_url(config: SimpleNamespace, url: str, cache: Optional[ValidationCache] = None,
+                on_result: Optional[Callable[[int, Union[dict[str, float], MeasurementError]], None]] = None) -> TimingAggregate:
+    """
+    Measure all the samples for a single URL.
+
+    Failed samples are recorded in the aggregate rather than aborting the run. The first sample acts as the
+    reachability check, if it fails the remaining samples are skipped, unless the URL was reached successfully
+    within the validation cache TTL. With a target precision (adaptive sampling) the samples stop as soon as the
+    TTFB percentile of the URL has converged.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the engine and the sample count (or duration).
+        url (str): The URL to measure.
+        cache (Optional[ValidationCache]): The validation cache, if enabled.
+        on_result (Optional[Callable]): Called with the index and the timing phases (or the error) of each sample.
+
+    Returns:
+        TimingAggregate: The aggregate of the samples for the URL.
+    """
+    aggregate: TimingAggregate = TimingAggregate()
+    if not is_well_formed_url(url):
+        aggregate.add_error("Invalid URL - must start with http:// or https://")
+        return aggregate
+
+    check_reachable: bool = cache is None or not cache.is_fresh(url)
+    tracker: Optional[PrecisionTracker] = open_precision_tracker(config)
+    tracer: Optional[Tracer] = active_tracer()
+    with contextlib.closing(measure_samples(config, url, sample_indexes(config, tracker))) as results:
+        for index, result in results:
+            if on_result is not None:
+                on_result(index, result)
+            if isinstance(result, MeasurementError):
+                aggregate.add_error(f"{result}")
+                if index == 0 and check_reachable:
+                    break
+            else:
+                aggregate.add(result)
+                if tracker is not None:
+                    tracker.add(result)
+                if tracer is not None:
+                    tracer.add_network_time(result['total'])
+
+    if cache is not None and aggregate.count:
+        cache.record(url)
+    return aggregate
+
+
+def measure_address(config: SimpleNamespace, address: str,
+                    on_result: Optional[Callable[[int, Union[dict[str, float], MeasurementError]], None]] = None) -> TimingAggregate:
+    """
+    Measure all the samples for the URL with its host pinned to a single address.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL, engine and resolver.
+        address (str): The address (one of those the host resolves to) to pin the host to.
+        on_result (Optional[Callable]): Called with the index and the timing phases (or the error) of each sample.
+
+    Returns:
+        TimingAggregate: The aggregate of the samples for the address.
+    """
+    connection: HttpConnection = HttpConnection.from_url(config.url)
+    pinned: SimpleNamespace = SimpleNamespace(**vars(config))
+    pinned.resolver = config.resolver.pinned(connection.host, connection.port, address)
+    return measure_url(pinned, config.url, on_result=on_result)
+
+
+def _timed_sample(config: SimpleNamespace, intended: float) -> tuple[float, Optional[dict[str, float]], Optional[str]]:
+    """
+    Take a single sample and measure it from the time it was meant to be sent.
+
+    The lag is added to every phase that happened, the phases that did not (such as appconnect for http and
+    redirect without redirects) are reported as 0, just as they are for a sample taken on time.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the URL and engine.
+        intended (float): The perf_counter time the request was scheduled to be sent at.
+
+    Returns:
+        tuple[float, Optional[dict[str, float]], Optional[str]]: The schedule lag in seconds, and either the
+                                                                 corrected timing phases or the error message.
+    """
+    lag: float = max(time.perf_counter() - intended, 0.0)
+    try:
+        sample: dict[str, float] = measure_sample(config, config.url)
+    except MeasurementError as err:
+        return lag, None, f"{err}"
+    return lag, {phase: value + lag if value else 0.0 for phase, value in sample.items()}, None
+
+
+def run_open_loop(config: SimpleNamespace,
+                  on_result: Callable[[float, Optional[dict[str, float]], Optional[str]], None]) -> tuple[int, float]:
+    """
+    Send the requests on a fixed schedule and pass each result to a callback on the calling thread.
+
+    Request i is scheduled at i / config.rate seconds after the start. If the workers fall far enough behind
+    that MAX_QUEUED_PER_WORKER requests per worker are waiting, the scheduler pauses until they catch up, the
+    requests are still measured from their scheduled times so the pause shows up in the results.
+
+    Arguments:
+        config (SimpleNamespace): The configuration object containing the rate, count (or duration) and worker count.
+        on_result (Callable): Called with the schedule lag, the timing phases (or None) and the error message (or None) of each request.
+
+    Returns:
+        tuple[int, float]: The number of requests sent and the number of seconds from the start until the last request was actually sent.
+    """
+    total: int = config.count if config.duration is None else max(int(config.duration * config.rate), 1)
+    results: queue.SimpleQueue = queue.SimpleQueue()
+    outstanding: threading.BoundedSemaphore = threading.BoundedSemaphore(config.max_in_flight * MAX_QUEUED_PER_WORKER)
+    received: int = 0
+    started: float = time.perf_counter()
+    last_sent: float = started
+
+    def complete(intended: float, future) -> None:
+        outstanding.release()
+        error: Optional[BaseException] = future.exception()
+        results.put((intended, (0.0, None, f"{error}") if error is not None else future.result()))
+
+    def drain(timeout: float) -> None:
+        nonlocal received, last_sent
+        deadline: float = time.perf_counter() + timeout
+        while True:
+            try:
+                intended, result = results.get(timeout=deadline - time.perf_counter()) if deadline > time.perf_counter() else results.get_nowait()
+            except queue.Empty:
+                return
+            received += 1
+            last_sent = max(last_sent, intended + result[0])
+            on_result(*result)
+
+    with ThreadPoolExecutor(max_workers=config.max_in_flight) as executor:
+        for index in range(total):
+            intended: float = started + index / config.rate
+            drain(intended - time.perf_counter())
+            while not outstanding.acquire(timeout=0.1):  # pylint: disable=consider-using-with
+                drain(0)
+            executor.submit(_timed_sample, config, intended).add_done_callback(functools.partial(complete, intended))
+
+        while received < total:
+            drain(0.1)
+
+    return total, last_sent - started
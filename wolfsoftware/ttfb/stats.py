@@ -0,0 +1,508 @@
+"""
+This module provides the aggregation of timing samples for the URL timing analysis program.
+
+The main purpose of this module is to summarise the timing phases of many samples. The samples are kept
+in a compact array-backed store (so percentiles are exact) until the store reaches EXACT_SAMPLE_LIMIT,
+after which percentiles come from a streaming quantile sketch whose size does not depend on the number of
+samples. Every part of an aggregate can be merged, so results from concurrent workers can be combined.
+
+Classes:
+- RunningStats: Running count, minimum, maximum, mean and standard deviation of a series of values.
+- QuantileSketch: A mergeable streaming quantile sketch with a fixed relative accuracy.
+- TimingAggregate: Per-phase statistics, percentiles and the error count for a set of samples.
+- PrecisionTracker: Tracks the confidence interval of a percentile of a timing phase, for adaptive sampling.
+
+Functions:
+- exact_quantile: Returns a quantile of a sorted list of values.
+- bootstrap_median_delta: Returns a bootstrap confidence interval of the difference between the medians of two samples.
+- mann_whitney_statistic: Returns the Mann-Whitney U statistic of two samples and the tie term of its variance.
+- mann_whitney_u: Returns the p-value of the Mann-Whitney U test of two samples.
+- two_proportion_test: Returns the p-value of the difference between two proportions, such as the error rates of two URLs.
+"""
+# pylint: disable=relative-beyond-top-level
+
+import math
+import random
+
+from array import array
+from typing import Iterable, Optional, Sequence
+
+from .globals import TIMING_PHASES
+
+SUMMARY_STATISTICS: tuple[str, ...] = ('min', 'mean', 'stddev', 'p50', 'p90', 'p99', 'max')
+EXACT_SAMPLE_LIMIT: int = 10000
+SKETCH_RELATIVE_ACCURACY: float = 0.01
+SKETCH_MIN_VALUE: float = 1e-9
+PRECISION_Z: float = 1.96
+PRECISION_MIN_SAMPLES: int = 10
+BOOTSTRAP_RESAMPLES: int = 2000
+BOOTSTRAP_SAMPLE_LIMIT: int = 1000
+
+
+class RunningStats:
+    """
+    Running count, minimum, maximum, mean and standard deviation of a series of values.
+
+    Uses Welford's algorithm so the values themselves are never stored, and Chan's parallel
+    algorithm when two sets of statistics are merged.
+    """
+
+    __slots__ = ('count', 'mean', 'minimum', 'maximum', 'm2')
+
+    def __init__(self) -> None:
+        """Initialise an empty set of statistics."""
+        self.count: int = 0
+        self.mean: float = 0.0
+        self.minimum: float = math.inf
+        self.maximum: float = -math.inf
+        self.m2: float = 0.0
+
+    def add(self, value: float) -> None:
+        """
+        Add a single value.
+
+        Arguments:
+            value (float): The value to add.
+        """
+        self.count += 1
+        delta: float = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: 'RunningStats') -> None:
+        """
+        Merge another set of statistics into this one.
+
+        Arguments:
+            other (RunningStats): The statistics to merge.
+        """
+        if other.count == 0:
+            return
+        total: int = self.count + other.count
+        delta: float = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def stddev(self) -> float:
+        """
+        Return the sample standard deviation.
+
+        Returns:
+            float: The standard deviation, or 0.0 if fewer than two values have been added.
+        """
+        if self.count < 2:
+            return 0.0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+class QuantileSketch:
+    """
+    A mergeable streaming quantile sketch with a fixed relative accuracy.
+
+    Values are counted in logarithmically sized buckets (as in DDSketch), so any quantile is returned
+    within SKETCH_RELATIVE_ACCURACY of the true value. The number of buckets depends only on the range of
+    the values (around 2,000 buckets cover 1 nanosecond to 1,000 seconds) and not on how many values are
+    added. Sketches are merged by adding their bucket counts together.
+    """
+
+    __slots__ = ('count', 'zero_count', 'buckets')
+
+    _gamma: float = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+    _log_gamma: float = math.log(_gamma)
+
+    def __init__(self) -> None:
+        """Initialise an empty sketch."""
+        self.count: int = 0
+        self.zero_count: int = 0
+        self.buckets: dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        """
+        Add a single value.
+
+        Arguments:
+            value (float): The value to add.
+        """
+        self.count += 1
+        if value <= SKETCH_MIN_VALUE:
+            self.zero_count += 1
+            return
+        index: int = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """
+        Merge another sketch into this one.
+
+        Arguments:
+            other (QuantileSketch): The sketch to merge.
+        """
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q: float) -> float:
+        """
+        Return an estimate of the given quantile.
+
+        Arguments:
+            q (float): The quantile to estimate, between 0 and 1.
+
+        Returns:
+            float: The estimated value, or 0.0 if the sketch is empty.
+        """
+        if self.count == 0:
+            return 0.0
+        rank: float = q * (self.count - 1)
+        seen: int = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self._gamma ** index / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.buckets) / (self._gamma + 1)
+
+
+def exact_quantile(sorted_values: list[float], q: float) -> float:
+    """
+    Return the given quantile of a sorted list of values, interpolating between the closest ranks.
+
+    Arguments:
+        sorted_values (list[float]): The values in ascending order.
+        q (float): The quantile to return, between 0 and 1.
+
+    Returns:
+        float: The quantile, or 0.0 if there are no values.
+    """
+    if not sorted_values:
+        return 0.0
+    position: float = q * (len(sorted_values) - 1)
+    lower: int = math.floor(position)
+    upper: int = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class TimingAggregate:
+    """
+    Per-phase statistics, percentiles and the error count for a set of samples.
+
+    Each sample is a dictionary of timing phases (in seconds) as returned by the timing engines. The
+    samples are kept in one array per phase until there are more than EXACT_SAMPLE_LIMIT of them, at
+    which point the arrays are released and percentiles are estimated from the per-phase sketches, so
+    memory use stays constant however many samples are taken. Other sets of values (such as the body
+    metrics of the body mode) can be aggregated in the same way by naming them in place of the phases.
+    """
+
+    __slots__ = ('phases', 'sketches', 'samples', 'errors', 'last_error')
+
+    def __init__(self, phases: tuple[str, ...] = TIMING_PHASES) -> None:
+        """
+        Initialise an empty aggregate.
+
+        Arguments:
+            phases (tuple[str, ...]): The names of the values in each sample, the timing phases by default.
+        """
+        self.phases: dict[str, RunningStats] = {phase: RunningStats() for phase in phases}
+        self.sketches: dict[str, QuantileSketch] = {phase: QuantileSketch() for phase in phases}
+        self.samples: Optional[dict[str, array]] = {phase: array('d') for phase in phases}
+        self.errors: int = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def count(self) -> int:
+        """
+        Return the number of successful samples.
+
+        Returns:
+            int: The number of samples added.
+        """
+        return next(iter(self.phases.values())).count
+
+    def add(self, sample: dict[str, float]) -> None:
+        """
+        Add a single sample.
+
+        Arguments:
+            sample (dict[str, float]): The timing phases (in seconds) of the sample.
+        """
+        for phase, stats in self.phases.items():
+            stats.add(sample[phase])
+            self.sketches[phase].add(sample[phase])
+
+        if self.samples is not None:
+            if self.count > EXACT_SAMPLE_LIMIT:
+                self.samples = None
+            else:
+                for phase, values in self.samples.items():
+                    values.append(sample[phase])
+
+    def add_error(self, message: str) -> None:
+        """
+        Record a failed sample.
+
+        Arguments:
+            message (str): The error message of the failure.
+        """
+        self.errors += 1
+        self.last_error = message
+
+    def merge(self, other: 'TimingAggregate') -> None:
+        """
+        Merge another aggregate into this one.
+
+        Arguments:
+            other (TimingAggregate): The aggregate to merge.
+        """
+        for phase, stats in self.phases.items():
+            stats.merge(other.phases[phase])
+            self.sketches[phase].merge(other.sketches[phase])
+
+        if self.samples is not None and other.samples is not None and self.count <= EXACT_SAMPLE_LIMIT:
+            for phase, values in self.samples.items():
+                values.extend(other.samples[phase])
+        else:
+            self.samples = None
+
+        self.errors += other.errors
+        self.last_error = other.last_error or self.last_error
+
+    @property
+    def exact(self) -> bool:
+        """
+        Return whether percentiles are calculated from the stored samples rather than estimated.
+
+        Returns:
+            bool: True if every sample is still stored.
+        """
+        return self.samples is not None
+
+    def summary(self, phase: str) -> dict[str, float]:
+        """
+        Return the summary statistics of a single phase.
+
+        Arguments:
+            phase (str): The name of the timing phase.
+
+        Returns:
+            dict[str, float]: The min, mean, stddev, p50, p90, p99 and max of the phase (all 0.0 if there are no samples).
+        """
+        stats: RunningStats = self.phases[phase]
+        if stats.count == 0:
+            return dict.fromkeys(SUMMARY_STATISTICS, 0.0)
+
+        if self.samples is not None:
+            values: list[float] = sorted(self.samples[phase])
+            p50, p90, p99 = (exact_quantile(values, q) for q in (0.5, 0.9, 0.99))
+        else:
+            sketch: QuantileSketch = self.sketches[phase]
+            p50, p90, p99 = (min(max(sketch.quantile(q), stats.minimum), stats.maximum) for q in (0.5, 0.9, 0.99))
+
+        return {
+            'min': stats.minimum,
+            'mean': stats.mean,
+            'stddev': stats.stddev,
+            'p50': p50,
+            'p90': p90,
+            'p99': p99,
+            'max': stats.maximum,
+        }
+
+
+class PrecisionTracker:
+    """
+    Tracks the confidence interval of a percentile of a timing phase, to tell when enough samples have been taken.
+
+    The interval is distribution-free: of n sorted samples, those at the ranks n * q -/+ z * sqrt(n * q * (1 - q))
+    bound the q quantile with 95% confidence (z = PRECISION_Z), whatever the shape of the distribution. The
+    percentile has converged once the half-width of the interval, relative to the percentile, is no more than the
+    target precision and at least PRECISION_MIN_SAMPLES samples have been taken.
+
+    The values are kept in an array of doubles. Sorting them for every check would make a run quadratic, so once
+    there are more than 100 samples the interval is only checked again when the number of samples has grown by 2%.
+    """
+
+    __slots__ = ('precision', 'quantile', 'phase', 'values', 'converged', '_next_check')
+
+    def __init__(self, precision: float, statistic: str = 'p50', phase: str = 'starttransfer', values: Iterable[float] = ()) -> None:
+        """
+        Initialise the tracker.
+
+        Arguments:
+            precision (float): The target half-width of the interval, as a fraction of the percentile.
+            statistic (str): The percentile to track, such as p50 (see PRECISION_STATISTICS).
+            phase (str): The timing phase to track.
+            values (Iterable[float]): Values of the phase already taken, which are not checked for convergence until the next sample is added.
+        """
+        self.precision: float = precision
+        self.quantile: float = float(statistic[1:]) / 100
+        self.phase: str = phase
+        self.values: array = array('d', values)
+        self.converged: bool = False
+        self._next_check: int = PRECISION_MIN_SAMPLES
+
+    def add(self, sample: dict[str, float]) -> None:
+        """
+        Add a successful sample, checking whether the percentile has converged when a check is due.
+
+        Arguments:
+            sample (dict[str, float]): The timing phases (in seconds) of the sample.
+        """
+        self.values.append(sample[self.phase])
+        if self.converged or len(self.values) < self._next_check:
+            return
+
+        self._next_check = len(self.values) + (len(self.values) // 50 if len(self.values) > 100 else 1)
+        low, estimate, high = self.interval()
+        self.converged = (high - low) / 2 <= self.precision * estimate
+
+    def interval(self) -> tuple[float, float, float]:
+        """
+        Return the confidence interval of the percentile.
+
+        Returns:
+            tuple[float, float, float]: The lower bound, the percentile itself and the upper bound (all 0.0 without any samples).
+        """
+        if not self.values:
+            return 0.0, 0.0, 0.0
+
+        self.values = array('d', sorted(self.values))
+        count: int = len(self.values)
+        spread: float = PRECISION_Z * math.sqrt(count * self.quantile * (1 - self.quantile))
+        lower: int = min(max(math.ceil(count * self.quantile - spread), 1), count)
+        upper: int = min(max(math.ceil(count * self.quantile + spread), 1), count)
+        return self.values[lower - 1], exact_quantile(self.values, self.quantile), self.values[upper - 1]
+
+    def achieved(self) -> float:
+        """
+        Return the half-width of the confidence interval as a fraction of the percentile.
+
+        Returns:
+            float: The relative half-width, infinite if the percentile is zero.
+        """
+        low, estimate, high = self.interval()
+        return (high - low) / 2 / estimate if estimate > 0 else math.inf
+
+
+def bootstrap_median_delta(a: Sequence[float], b: Sequence[float], rng: random.Random,
+                           resamples: int = BOOTSTRAP_RESAMPLES) -> tuple[float, float]:
+    """
+    Return the 95% bootstrap (percentile method) confidence interval of the median of b minus the median of a.
+
+    Each resample sorts both samples, so a sample of more than BOOTSTRAP_SAMPLE_LIMIT values is first reduced
+    to a random subset of that many, which keeps the cost bounded however long the run was (the interval is then
+    that of the subset, so somewhat wider than that of every value).
+
+    Arguments:
+        a (Sequence[float]): The first sample.
+        b (Sequence[float]): The second sample.
+        rng (random.Random): The random number generator used to resample.
+        resamples (int): The number of resamples.
+
+    Returns:
+        tuple[float, float]: The lower and upper bounds of the interval (both 0.0 if either sample is empty).
+    """
+    if not a or not b:
+        return 0.0, 0.0
+
+    if len(a) > BOOTSTRAP_SAMPLE_LIMIT:
+        a = rng.sample(a, BOOTSTRAP_SAMPLE_LIMIT)
+    if len(b) > BOOTSTRAP_SAMPLE_LIMIT:
+        b = rng.sample(b, BOOTSTRAP_SAMPLE_LIMIT)
+    deltas: list[float] = sorted(
+        exact_quantile(sorted(rng.choices(b, k=len(b))), 0.5) - exact_quantile(sorted(rng.choices(a, k=len(a))), 0.5)
+        for _ in range(resamples)
+    )
+    return exact_quantile(deltas, 0.025), exact_quantile(deltas, 0.975)
+
+
+def mann_whitney_statistic(a: Sequence[float], b: Sequence[float]) -> tuple[float, float]:
+    """
+    Return the Mann-Whitney U statistic of the first sample and the tie term of its variance.
+
+    U is the number of pairs (one value from each sample) in which the value from a is the larger, counting ties
+    as half, calculated from the rank sum of a with tied values given their average rank.
+
+    Arguments:
+        a (Sequence[float]): The first sample.
+        b (Sequence[float]): The second sample.
+
+    Returns:
+        tuple[float, float]: U and the sum of t^3 - t over each group of t tied values.
+    """
+    values: list[tuple[float, int]] = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    rank_sum: float = 0.0
+    ties: float = 0.0
+    start: int = 0
+    while start < len(values):
+        end: int = start
+        while end + 1 < len(values) and values[end + 1][0] == values[start][0]:
+            end += 1
+        tied: int = end - start + 1
+        ties += tied ** 3 - tied
+        rank_sum += (start + end + 2) / 2 * sum(1 for _, group in values[start:end + 1] if group == 0)
+        start = end + 1
+
+    return rank_sum - len(a) * (len(a) + 1) / 2, ties
+
+
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    Return the two-sided p-value of the Mann-Whitney U test of whether two samples come from the same distribution.
+
+    Uses the normal approximation with a tie correction and a continuity correction, which is accurate from
+    around ten values in each sample.
+
+    Arguments:
+        a (Sequence[float]): The first sample.
+        b (Sequence[float]): The second sample.
+
+    Returns:
+        float: The p-value (1.0 if either sample is empty or every value is the same).
+    """
+    if not a or not b:
+        return 1.0
+
+    u, ties = mann_whitney_statistic(a, b)
+    total: int = len(a) + len(b)
+    mean: float = len(a) * len(b) / 2
+    variance: float = len(a) * len(b) / 12 * ((total + 1) - ties / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z: float = max(abs(u - mean) - 0.5, 0.0) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
+
+
+def two_proportion_test(hits_a: int, total_a: int, hits_b: int, total_b: int) -> float:
+    """
+    Return the two-sided p-value of whether two proportions (such as the error rates of two URLs) differ.
+
+    Uses the pooled normal approximation with Yates' continuity correction (the same as a chi-squared test
+    of the 2x2 table with the correction), which errs on the side of finding no difference for small counts.
+
+    Arguments:
+        hits_a (int): The number of hits (such as failed samples) in the first sample.
+        total_a (int): The size of the first sample.
+        hits_b (int): The number of hits in the second sample.
+        total_b (int): The size of the second sample.
+
+    Returns:
+        float: The p-value (1.0 if either sample is empty or the proportions are both 0 or both 1).
+    """
+    if total_a <= 0 or total_b <= 0:
+        return 1.0
+
+    pooled: float = (hits_a + hits_b) / (total_a + total_b)
+    variance: float = pooled * (1 - pooled) * (1 / total_a + 1 / total_b)
+    if variance <= 0:
+        return 1.0
+    difference: float = abs(hits_b / total_b - hits_a / total_a)
+    z: float = max(difference - (1 / total_a + 1 / total_b) / 2, 0.0) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
@@ -0,0 +1,267 @@
+"""
+This module records how long the program's own stages take, so its overhead can be told apart from the network.
+
+With --trace FILE each stage of a run (parsing the arguments, checking the prerequisites, validating the URL,
+building the curl command, spawning curl or connecting, reading the response and rendering the results) is
+recorded as a span, and the spans are written to FILE in the Chrome trace event format, which chrome://tracing,
+Perfetto (ui.perfetto.dev) and speedscope can open. A short summary of the time spent in each stage and of the
+tool overhead (the wall time less the time the samples spent on the network) is displayed at the end of the run.
+
+Recording a span costs two clock reads and a list append, and when tracing is off span returns a shared context
+manager which does nothing, so the instrumented code paths cost next to nothing in normal runs.
+
+Classes:
+- Tracer: Records the spans of a run and the time the samples spent on the network.
+
+Functions:
+- start_tracing: Starts recording spans.
+- stop_tracing: Stops recording spans and returns the tracer.
+- active_tracer: Returns the tracer which is recording spans, if any.
+- span: Returns a context manager which records a span while tracing is on.
+- record_span: Records a span which started earlier and ends now, while tracing is on.
+- format_trace_summary: Formats the time spent in each stage and the tool overhead.
+- write_trace: Writes the spans in the Chrome trace event format.
+
+Modules:
+- contextlib: Used for the span context managers.
+- json: Used to write the trace file, imported when the trace is written.
+- os: Used for the process id of the trace events.
+- threading: Used for the thread id of each span and to lock the network time.
+- time: Used to time the spans with perf_counter_ns.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+from typing import Any, ContextManager, Iterator, Optional
+
+_NULL_SPAN: ContextManager[None] = contextlib.nullcontext()
+
+
+class Tracer:
+    """
+    Record the spans of a run and the time the samples spent on the network.
+
+    Each span is kept as a (name, category, start, end, thread) tuple, with the start and end in perf_counter_ns
+    nanoseconds. Spans can be recorded from several threads at once (list.append is atomic), and the network time
+    is added under a lock.
+
+    Attributes:
+        started (int): When the run started (perf_counter_ns).
+        stopped (int): When the run stopped (perf_counter_ns), or 0 while it is running.
+        spans (list[tuple[str, str, int, int, int]]): The recorded spans.
+        network (float): The sum of the total times of the samples, in seconds.
+    """
+
+    __slots__ = ('started', 'stopped', 'spans', 'network', '_lock')
+
+    def __init__(self, started: Optional[int] = None) -> None:
+        """
+        Initialize the tracer.
+
+        Arguments:
+            started (Optional[int]): When the run started (perf_counter_ns), or None for now.
+        """
+        self.started: int = time.perf_counter_ns() if started is None else started
+        self.stopped: int = 0
+        self.spans: list[tuple[str, str, int, int, int]] = []
+        self.network: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str) -> Iterator[None]:
+        """
+        Record a span covering the body of the with statement (whether or not it raises).
+
+        Arguments:
+            name (str): The name of the stage.
+            category (str): The category of the stage (setup, engine or output).
+
+        Yields:
+            None: Control to the body of the with statement.
+        """
+        start: int = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter_ns())
+
+    def add(self, name: str, category: str, start: int, end: int) -> None:
+        """
+        Record a span which has already ended.
+
+        Arguments:
+            name (str): The name of the stage.
+            category (str): The category of the stage (setup, engine or output).
+            start (int): When the span started (perf_counter_ns).
+            end (int): When the span ended (perf_counter_ns).
+        """
+        self.spans.append((name, category, start, end, threading.get_ident()))
+
+    def add_network_time(self, seconds: float) -> None:
+        """
+        Add the total time of a sample to the network time.
+
+        Arguments:
+            seconds (float): The total time of the sample, in seconds.
+        """
+        with self._lock:
+            self.network += seconds
+
+    @property
+    def wall(self) -> float:
+        """
+        Get the wall time of the run, up to now if it is still running.
+
+        Returns:
+            float: The wall time in seconds.
+        """
+        return ((self.stopped or time.perf_counter_ns()) - self.started) / 1e9
+
+    def stages(self) -> dict[str, tuple[int, float]]:
+        """
+        Get the number of spans and the total time of each stage, in the order the stages were first recorded.
+
+        Returns:
+            dict[str, tuple[int, float]]: The number of spans and their total time in seconds, keyed by the name of the stage.
+        """
+        stages: dict[str, tuple[int, float]] = {}
+        for name, _category, start, end, _thread in self.spans:
+            count, total = stages.get(name, (0, 0.0))
+            stages[name] = (count + 1, total + (end - start) / 1e9)
+        return stages
+
+
+_state: dict[str, Tracer] = {}
+
+
+def start_tracing(started: Optional[int] = None) -> Tracer:
+    """
+    Start recording spans.
+
+    Arguments:
+        started (Optional[int]): When the run started (perf_counter_ns), or None for now.
+
+    Returns:
+        Tracer: The tracer which records the spans.
+    """
+    tracer: Tracer = Tracer(started)
+    _state['tracer'] = tracer
+    return tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """
+    Stop recording spans.
+
+    Returns:
+        Optional[Tracer]: The tracer which recorded the spans, or None if tracing was not on.
+    """
+    tracer: Optional[Tracer] = _state.pop('tracer', None)
+    if tracer is not None:
+        tracer.stopped = time.perf_counter_ns()
+    return tracer
+
+
+def active_tracer() -> Optional[Tracer]:
+    """
+    Get the tracer which is recording spans.
+
+    Returns:
+        Optional[Tracer]: The tracer, or None if tracing is off.
+    """
+    return _state.get('tracer')
+
+
+def span(name: str, category: str) -> ContextManager[None]:
+    """
+    Get a context manager which records a span covering the body of the with statement while tracing is on.
+
+    Arguments:
+        name (str): The name of the stage.
+        category (str): The category of the stage (setup, engine or output).
+
+    Returns:
+        ContextManager[None]: The context manager, which does nothing when tracing is off.
+    """
+    tracer: Optional[Tracer] = _state.get('tracer')
+    return _NULL_SPAN if tracer is None else tracer.span(name, category)
+
+
+def record_span(name: str, category: str, start: int) -> None:
+    """
+    Record a span which started earlier and ends now while tracing is on.
+
+    This is used where a with statement does not fit, such as around the marks the native engine already takes.
+
+    Arguments:
+        name (str): The name of the stage.
+        category (str): The category of the stage (setup, engine or output).
+        start (int): When the span started (perf_counter_ns).
+    """
+    tracer: Optional[Tracer] = _state.get('tracer')
+    if tracer is not None:
+        tracer.add(name, category, start, time.perf_counter_ns())
+
+
+def format_trace_summary(tracer: Tracer) -> list[str]:
+    """
+    Format the time spent in each stage and the tool overhead.
+
+    The tool overhead is the wall time less the network time (the sum of the total times of the samples). When the
+    samples run concurrently (--url-file, --rate and --per-address) they overlap, so the network time can be more
+    than the wall time and the overhead is then shown as 0. Stages can be nested (rendering happens while samples
+    are taken) and run on several threads, so their shares of the wall time do not add up to 100%.
+
+    Arguments:
+        tracer (Tracer): The tracer which recorded the spans.
+
+    Returns:
+        list[str]: The formatted lines, a header line followed by one line per stage and a line with the overhead.
+    """
+    wall: float = tracer.wall
+    lines: list[str] = [f"  {'Stage':<16}   {'Spans':>7}   {'Total':>10}   {'Mean':>10}   {'Wall %':>7}"]
+    for name, (count, total) in tracer.stages().items():
+        lines.append(f"  {name:<16}   {count:>7}   {total:>10.6f}   {total / count:>10.6f}   {100 * total / wall if wall else 0.0:>6.1f}%")
+    overhead: float = max(wall - tracer.network, 0.0)
+    lines.append(f"  Wall Time: {wall:.6f}   Network Time: {tracer.network:.6f}   "
+                 f"Tool Overhead: {overhead:.6f} ({100 * overhead / wall if wall else 0.0:.1f}%)")
+    return lines
+
+
+def write_trace(tracer: Tracer, path: str) -> None:
+    """
+    Write the spans in the Chrome trace event format.
+
+    Each span is written as a complete event (ph X) with its start and duration in microseconds from the start of the
+    run, and the thread ids are numbered from 1 in the order the threads were first seen. A span covering the whole run
+    is added on the first thread, and the wall and network times are written in the metadata.
+
+    Arguments:
+        tracer (Tracer): The tracer which recorded the spans.
+        path (str): The path of the file to write.
+
+    Raises:
+        OSError: If the file can not be written.
+    """
+    import json  # pylint: disable=import-outside-toplevel
+
+    pid: int = os.getpid()
+    threads: dict[int, int] = {}
+    events: list[dict[str, Any]] = [{
+        'name': 'run', 'cat': 'run', 'ph': 'X', 'ts': 0.0, 'dur': tracer.wall * 1e6, 'pid': pid, 'tid': 1,
+    }]
+    for name, category, start, end, thread in sorted(tracer.spans, key=lambda item: item[2]):
+        events.append({
+            'name': name, 'cat': category, 'ph': 'X', 'ts': (start - tracer.started) / 1e3, 'dur': (end - start) / 1e3,
+            'pid': pid, 'tid': threads.setdefault(thread, len(threads) + 1),
+        })
+
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'wall_seconds': tracer.wall, 'network_seconds': tracer.network},
+        }, handle)
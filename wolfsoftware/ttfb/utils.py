@@ -2,29 +2,49 @@
 This module handles prerequisite checks and URL validation for the URL timing analysis program.
 
 The main purpose of this module is to ensure that all necessary commands are available
-and to validate the format and reachability of the specified URL.
+(the resolved paths are cached between runs) and to validate the format of the specified URL. The reachability of the URL is checked by
+the first real measurement rather than by a separate request. It also provides the URL and response helpers of the cache-split mode,
+and the parsing of durations and rates shared by the command line and the monitor's target list.
 
 Functions:
 - check_prerequisite: Verifies the presence of prerequisite commands and returns their paths.
-- validate_url: Validates that a URL is well-formed and reachable.
+- is_well_formed_url: Checks that a URL is a string starting with http:// or https://.
+- validate_url: Validates that a URL is well-formed.
+- cache_bust_url: Returns a URL with a unique cache-busting token added to its query string.
+- cache_status: Classifies a response as a cache hit or miss from its cache status headers.
+- check_duration: Validates a duration (such as 90s, 10m or 1h) and converts it to seconds.
+- check_rate: Validates a request rate (such as 50/s or 600/m) and converts it to requests per second.
 
 Modules:
-- shutil: Used to check for the presence of commands.
+- argparse: Provides ArgumentTypeError, which the duration and rate parsing raise so they can be used as argument types.
+- math: Used to reject durations and rates which are not finite.
+- os: Used to generate the random cache-busting tokens.
+- re: Used to split the values of the cache status headers into words.
 - sys: Provides access to system-specific parameters and functions.
-- subprocess: Used to run curl commands to validate URL reachability (with security warning disabled).
+- urllib.parse: Used to add the cache-busting token to the query string of a URL.
+- wolfsoftware.prereqs: Used to check for the presence of commands (only imported when the cached paths are stale).
+- cache: Imports load_command_paths and save_command_paths to cache the resolved command paths.
+- display: Imports error_message for displaying error messages.
 - globals: Imports global constants like prerequisite_commands.
-- notify: Imports utility functions like error for displaying error messages.
+- tracing: Imports span to record the validation of the URL with --trace.
 """
 # pylint: disable=relative-beyond-top-level
 
+import argparse
+import math
+import os
+import re
 import sys
 
-import subprocess  # nosec B404
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
 
-from wolfsoftware.notify import error_message
-from wolfsoftware.prereqs import check_prerequisite, PrerequisiteCheckError
+from .cache import load_command_paths, save_command_paths
+from .display import error_message
+from .globals import CACHE_BUST_PARAMETER, CACHE_HIT_VALUES, CACHE_MISS_VALUES, CACHE_STATUS_HEADERS, prerequisite_commands
+from .tracing import span
 
-from .globals import prerequisite_commands
+CACHE_STATUS_WORD: re.Pattern = re.compile(r'[a-z]+')
 
 
 def check_prereqs() -> dict:
@@ -35,53 +55,163 @@ def check_prereqs() -> dict:
     using `shutil.which`. It collects the full paths of the installed commands into a dictionary.
     If any commands are not found, it prints the errors and exits the program with a status code of 1.
 
+    The paths are cached (see cache.load_command_paths), so later runs with the same PATH only need to
+    check that the cached paths are still executable rather than searching the PATH again.
+
     Returns:
         dict: A dictionary mapping each prerequisite command to its full path.
 
     Exits:
         If any prerequisite commands are not installed, prints the errors and exits the program.
     """
+    cached: Optional[dict[str, str]] = load_command_paths(prerequisite_commands)
+    if cached is not None:
+        return cached
+
+    from wolfsoftware.prereqs import check_prerequisite, PrerequisiteCheckError  # pylint: disable=import-outside-toplevel
+
     try:
         command_paths: dict = check_prerequisite(prerequisite_commands)
-        return command_paths
     except PrerequisiteCheckError as errors:
         print(error_message("Prerequisite check failed:"))
         for err in errors.errors:
             print(err)
         sys.exit(1)
 
+    save_command_paths(command_paths)
+    return command_paths
+
+
+def is_well_formed_url(url) -> bool:
+    """
+    Check that the given URL is a string starting with 'http://' or 'https://'.
+
+    Arguments:
+        url (str): The URL to be checked.
+
+    Returns:
+        bool: True if the URL is well-formed, otherwise False.
+    """
+    return isinstance(url, str) and url.startswith(('http://', 'https://'))
+
 
 def validate_url(url) -> None:
     """
-    Validate the given URL to ensure it is well-formed and reachable.
+    Validate the given URL to ensure it is well-formed.
 
-    This function checks that the URL is a string and starts with 'http://' or 'https://'.
-    It then uses a curl command to verify that the URL exists and is reachable. If the URL is invalid
-    or unreachable, it prints an error message and exits the program with a status code of 1.
+    This function checks that the URL is a string and starts with 'http://' or 'https://'. If the URL
+    is invalid, it prints an error message and exits the program with a status code of 1.
+
+    Reachability is not checked here, doing so would cost an extra process, DNS lookup and TLS handshake
+    for every run. Instead the first measurement of each URL acts as the reachability check.
 
     Arguments:
         url (str): The URL to be validated.
 
     Exits:
-        If the URL does not exist or is unreachable, prints an error message and exits the program.
+        If the URL is not well-formed, prints an error message and exits the program.
     """
-    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+    with span('validate_url', 'setup'):
+        valid: bool = is_well_formed_url(url)
+    if not valid:
         print(error_message("Invalid URL - must start with http:// or https://"))
         sys.exit(1)
 
-    command: list[str] = ['curl', '-o', '/dev/null', '--silent', '--head', '--fail', '--connect-timeout', '1', url]
+
+def cache_bust_url(url: str) -> str:
+    """
+    Return the URL with a unique cache-busting token added to its query string.
+
+    Arguments:
+        url (str): The URL.
+
+    Returns:
+        str: The URL with CACHE_BUST_PARAMETER set to a random token, after any existing query string.
+    """
+    parts = urlsplit(url)
+    token: str = f"{CACHE_BUST_PARAMETER}={os.urandom(8).hex()}"
+    return urlunsplit(parts._replace(query=f"{parts.query}&{token}" if parts.query else token))
+
+
+def cache_status(headers: dict[str, str]) -> str:
+    """
+    Classify a response as a cache hit or miss from its cache status headers.
+
+    The headers of CACHE_STATUS_HEADERS are checked in order and the first one that says decides: a hit if any of
+    its words is one of CACHE_HIT_VALUES (a hit in any layer of the CDN means the origin was not asked), otherwise a
+    miss if any is one of CACHE_MISS_VALUES. Without a cache status header that says, a response with an Age over 0
+    was served from a cache.
+
+    Arguments:
+        headers (dict[str, str]): The response headers keyed by lower case name.
+
+    Returns:
+        str: 'hit', 'miss', or 'unknown' if the headers do not say.
+    """
+    for name in CACHE_STATUS_HEADERS:
+        if name in headers:
+            words: set[str] = set(CACHE_STATUS_WORD.findall(headers[name].lower()))
+            if words & CACHE_HIT_VALUES:
+                return 'hit'
+            if words & CACHE_MISS_VALUES:
+                return 'miss'
+    age: str = headers.get('age', '').strip()
+    return 'hit' if age.isdigit() and int(age) > 0 else 'unknown'
+
+
+def check_duration(value) -> float:
+    """
+    Validate a duration and convert it to seconds.
+
+    The duration is a number optionally followed by a unit of s (seconds), m (minutes), h (hours) or d (days),
+    a number without a unit is treated as seconds.
+
+    Arguments:
+        value (str): The input value to be validated.
+
+    Returns:
+        float: The duration in seconds.
+
+    Raises:
+        argparse.ArgumentTypeError: If the input value is not a valid duration.
+        argparse.ArgumentTypeError: If the duration is not greater than zero, or is not finite (nan or inf).
+    """
+    multipliers: dict[str, int] = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    number: str = value[:-1] if value[-1:].lower() in multipliers else value
+    multiplier: int = multipliers.get(value[-1:].lower(), 1)
     try:
-        result: subprocess.CompletedProcess[str] = subprocess.run(  # nosec B603
-            command, text=True, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds = float(number) * multiplier
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid duration: {value}") from exc
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise argparse.ArgumentTypeError(f"Duration must be a finite number greater than 0: {value}")
+    return seconds
 
-        if result.returncode != 0:
-            print(error_message(f"{url} does not exist - aborting"))
-            sys.exit(1)
 
-    except subprocess.CalledProcessError:
-        print(error_message(f"{url} does not exist - aborting"))
-        sys.exit(1)
+def check_rate(value) -> float:
+    """
+    Validate a request rate and convert it to requests per second.
 
-    except Exception:
-        print(error_message(f"An unexpected error occurred while checking {url}"))
-        sys.exit(1)
+    The rate is a number optionally followed by /s (per second) or /m (per minute), a number without
+    a unit is treated as requests per second.
+
+    Arguments:
+        value (str): The input value to be validated.
+
+    Returns:
+        float: The rate in requests per second.
+
+    Raises:
+        argparse.ArgumentTypeError: If the input value is not a valid rate.
+        argparse.ArgumentTypeError: If the rate is not greater than zero, or is not finite (nan or inf).
+    """
+    divisors: dict[str, int] = {'/s': 1, '/m': 60}
+    number: str = value[:-2] if value[-2:].lower() in divisors else value
+    divisor: int = divisors.get(value[-2:].lower(), 1)
+    try:
+        rate = float(number) / divisor
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid rate: {value}") from exc
+    if not math.isfinite(rate) or rate <= 0:
+        raise argparse.ArgumentTypeError(f"Rate must be a finite number greater than 0: {value}")
+    return rate